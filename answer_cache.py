@@ -0,0 +1,117 @@
+import os, re, hashlib, math, threading
+from array import array
+from datetime import datetime, timedelta
+
+from database import session_scope, AnswerCache, Document, Message
+from providers import get_embeddings
+#Aynı belgeye sorulan aynı (veya çok benzer) sorular için Gemini'yi tekrar çağırmadan kayıtlı cevabı döndürür.
+
+
+SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+TTL                  = timedelta(seconds=int(os.getenv("ANSWER_CACHE_TTL", 7 * 24 * 3600)))
+MAX_ENTRIES_PER_DOC  = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 200))
+#Eşik: kosinüs benzerliği bu değerin üzerindeyse soru "aynı" sayılır.
+#TTL: bu süreden eski kayıtlar kullanılmaz. Belge başına en fazla MAX_ENTRIES_PER_DOC kayıt tutulur (LRU).
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+
+# --Keys--
+def normalize_question(q: str) -> str:
+    q = q.replace("I", "ı").replace("İ", "i").lower()
+    #Türkçe büyük/küçük harf dönüşümü: I → ı, İ → i
+    q = re.sub(r"[^\w\s]", " ", q)
+    return " ".join(q.split())
+
+
+def doc_key_for_chat(cid):
+    with session_scope() as db:
+        paths = [p for (p,) in db.query(Document.file_path).filter(Document.chat_id == cid)]
+    hashes = sorted({os.path.splitext(os.path.basename(p))[0] for p in paths if p})
+    #Dosyalar uploaded_files/<sha1><uzantı> olarak saklandığı için dosya adı içeriğin hash'idir.
+    return hashlib.sha1("|".join(hashes).encode()).hexdigest() if hashes else None
+
+
+def _to_bytes(vec):
+    return array("f", vec).tobytes()
+
+def _from_bytes(blob):
+    vec = array("f")
+    vec.frombytes(blob)
+    return vec
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+# --Cache--
+def lookup(doc_key, question):
+    #(cevap, soru vektörü) döndürür. Cevap None ise önbellekte yoktur; vektör store() için tekrar kullanılır.
+    vec = get_embeddings().embed_query(normalize_question(question))
+    best, best_sim = None, SIMILARITY_THRESHOLD
+    with session_scope() as db:
+        fresh_after = datetime.utcnow() - TTL
+        for entry in db.query(AnswerCache).filter(
+            AnswerCache.doc_key == doc_key, AnswerCache.created_at >= fresh_after
+        ):
+            sim = _cosine(vec, _from_bytes(entry.embedding))
+            if sim >= best_sim:
+                best, best_sim = entry, sim
+        if best is not None:
+            best.hits = (best.hits or 0) + 1
+            best.last_used_at = datetime.utcnow()
+            answer = best.answer
+    with _lock:
+        _stats["hits" if best is not None else "misses"] += 1
+    return (answer if best is not None else None), vec
+
+
+def store(doc_key, question, vec, answer):
+    with session_scope() as db:
+        db.add(AnswerCache(
+            doc_key=doc_key, question=question, embedding=_to_bytes(vec), answer=answer,
+        ))
+        db.query(AnswerCache).filter(
+            AnswerCache.created_at < datetime.utcnow() - TTL
+        ).delete(synchronize_session=False)
+        #Süresi dolan kayıtlar yazma sırasında temizlenir.
+        db.flush()
+        stale = (
+            db.query(AnswerCache.id)
+            .filter(AnswerCache.doc_key == doc_key)
+            .order_by(AnswerCache.last_used_at.desc())
+            .offset(MAX_ENTRIES_PER_DOC)
+            .all()
+        )
+        if stale:
+            db.query(AnswerCache).filter(
+                AnswerCache.id.in_([i for (i,) in stale])
+            ).delete(synchronize_session=False)
+        #Belge başına limit aşılırsa en uzun süredir kullanılmayan kayıtlar silinir (LRU).
+    with _lock:
+        _stats["stores"] += 1
+
+
+def invalidate_message(mid):
+    #👎 geri bildirim alan cevap önbellekten silinir; aynı soru bir daha sorulduğunda model yeniden çağrılır.
+    with session_scope() as db:
+        msg = db.query(Message).filter(Message.id == mid).first()
+        if not msg or not msg.content:
+            return 0
+        n = db.query(AnswerCache).filter(
+            AnswerCache.doc_key == doc_key_for_chat(msg.chat_id),
+            AnswerCache.answer == msg.content,
+        ).delete(synchronize_session=False)
+    with _lock:
+        _stats["invalidations"] += n
+    return n
+
+
+def stats() -> dict:
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {**_stats, "hit_rate": _stats["hits"] / lookups if lookups else 0.0}
@@ -0,0 +1,175 @@
+#Kullanım: python -m api [--host 127.0.0.1] [--port 8000] [--workers 4]
+#RAG çekirdeğinin (belge alma, arama, cevap, kayıt) asyncio HTTP servisi. Streamlit arayüzü RAG_API_URL ile buna bağlanır.
+#Her işçi ayrı bir süreçtir; hepsi aynı SQLite (WAL) veritabanını ve chroma_db klasörünü paylaşır:
+#iş kuyruğu atomik sahiplenme, Chroma yazmaları sohbet başına dosya kilidi ile korunur.
+#Kimlik: Authorization: Bearer <oturum token'ı> (auth.create_session). Kullanıcı token'dan bulunur; /chats/{cid}/...
+#yollarında sohbetin o kullanıcıya ait olduğu kontrol edilir.
+import argparse, asyncio, json, os, secrets, sys, tempfile
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+load_dotenv()
+#Servis de .env'i yerel modüllerden (modül seviyesindeki os.getenv ayarlarından) önce yükler.
+from database import init_db
+import auth, ingest, ingest_worker, library, rag_service, storage_gc, telemetry
+
+
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+SPOOL_BYTES = 8 * 1024 * 1024
+#Yüklenen dosya 8 MB'a kadar bellekte, üstü geçici dosyada tutulur.
+ADMIN_TOKEN = os.getenv("API_ADMIN_TOKEN", "")
+#Yönetim uçları (/admin/...) için ayrı token; boşsa bu uçlar kapalıdır.
+
+
+@asynccontextmanager
+async def lifespan(app):
+    init_db()
+    ingest_worker.start()
+    storage_gc.start()
+    telemetry.register_collector("rag_storage_gc", storage_gc.stats)
+    yield
+
+app = FastAPI(title="Document Chat RAG API", lifespan=lifespan)
+
+
+class AskRequest(BaseModel):
+    question: str
+
+
+# --Auth--
+def _bearer(request: Request):
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" else ""
+
+
+async def current_user(request: Request) -> int:
+    user_id = await asyncio.to_thread(auth.resume_session, _bearer(request))
+    if user_id is None:
+        raise HTTPException(401, "Invalid or expired session", headers={"WWW-Authenticate": "Bearer"})
+    return user_id
+
+
+async def chat_owner(cid: int, user_id: int = Depends(current_user)) -> int:
+    if not await asyncio.to_thread(library.owns_chat, cid, user_id):
+        raise HTTPException(404, "Chat not found")
+    return user_id
+#Başkasının sohbeti ile var olmayan sohbet ayırt edilmez (404): sohbet id'lerinin varlığı sızdırılmaz.
+
+
+async def admin(request: Request):
+    if not ADMIN_TOKEN or not secrets.compare_digest(_bearer(request), ADMIN_TOKEN):
+        raise HTTPException(403, "Forbidden")
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "pid": os.getpid()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return telemetry.render()
+#Her işçi kendi sayaçlarını raporlar (METRICS_ENABLED=1).
+
+
+@app.post("/chats/{cid}/ask")
+async def ask(cid: int, req: AskRequest, user_id: int = Depends(chat_owner)):
+    return await rag_service.aanswer(cid, req.question)
+
+
+@app.post("/chats/{cid}/ask/stream")
+async def ask_stream(cid: int, req: AskRequest, user_id: int = Depends(chat_owner)):
+    async def body():
+        async for event in rag_service.astream_answer(cid, req.question):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+#Her satır bir olay: question / token / done (rag_service.astream_answer).
+
+
+@app.post("/chats/{cid}/documents")
+async def upload(cid: int, name: str, request: Request, user_id: int = Depends(chat_owner)):
+    if ingest.loader_for(name) is None:
+        raise HTTPException(415, "Unsupported format")
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            spool.close()
+            raise HTTPException(413, "Max 200 MB.")
+        spool.write(chunk)
+    spool.seek(0)
+    try:
+        job_id = await asyncio.to_thread(rag_service.add_document, cid, user_id, spool, name)
+    except PermissionError:
+        raise HTTPException(403, "Chat does not belong to this user")
+    finally:
+        spool.close()
+    return {"job_id": job_id}
+#job_id: Dosya kütüphanede zaten varsa indeksi kuran (bitmiş ya da süren) işin id'si; yeni iş açılmaz.
+
+
+@app.post("/chats/{cid}/warm", status_code=202)
+async def warm(cid: int, user_id: int = Depends(chat_owner)):
+    rag_service.warm(cid)
+    return {"scheduled": True}
+#Arayüz sohbeti açtığında çağırır; ısıtma bu işçinin arka plan thread'inde yapılır. Önceden hesaplanan cevaplar
+#veritabanındaki cevap önbelleğine yazıldığı için tüm işçiler tarafından kullanılır.
+
+
+@app.get("/chats/{cid}/suggestions")
+async def suggestions(cid: int, user_id: int = Depends(chat_owner)):
+    return await asyncio.to_thread(rag_service.suggestions, cid)
+
+
+@app.get("/library")
+async def library_list(user_id: int = Depends(current_user)):
+    docs = await asyncio.to_thread(library.visible, user_id)
+    return [{"id": d.id, "file_name": d.file_name, "shared": d.shared, "owner": d.owner_id == user_id} for d in docs]
+
+
+@app.post("/chats/{cid}/library/{library_id}")
+async def library_attach(cid: int, library_id: int, user_id: int = Depends(chat_owner)):
+    doc_id = await asyncio.to_thread(library.attach_by_id, cid, user_id, library_id)
+    if doc_id is None:
+        raise HTTPException(404, "Document not found")
+    return {"document_id": doc_id}
+#Belge kullanıcıya ait/paylaşılmış değilse 404 (var olup olmadığı da sızdırılmaz).
+
+
+@app.post("/admin/gc", dependencies=[Depends(admin)])
+async def gc():
+    report = await asyncio.to_thread(storage_gc.run)
+    return report or {"skipped": "another process is collecting"}
+#Temizliği elle tetikler (thread havuzunda; olay döngüsü ve diğer istekler beklemez).
+
+
+@app.get("/jobs/{job_id}")
+async def job(job_id: int, user_id: int = Depends(current_user)):
+    jobs = await asyncio.to_thread(ingest_worker.load_jobs, ids=[job_id], active_only=False)
+    j = jobs[0] if jobs else None
+    if j is None or (j.user_id != user_id and not await asyncio.to_thread(library.owns_chat, j.chat_id, user_id)):
+        raise HTTPException(404, "Job not found")
+    return {
+        "id": j.id, "chat_id": j.chat_id, "status": j.status, "progress": j.progress,
+        "chunks_done": j.chunks_done, "error": j.error,
+    }
+
+
+def main(argv=None):
+    import uvicorn
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", 1)))
+    args = ap.parse_args(argv)
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
+    #workers > 1: her işçi ayrı süreç → LLM dışındaki CPU işleri (embedding, BM25, JSON) çekirdeklere dağılır.
+
+
+if __name__ == "__main__":
+    sys.exit(main())
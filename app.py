@@ -1,12 +1,37 @@
+import os
+from http.cookies import SimpleCookie
 import streamlit as st
+import streamlit.components.v1 as components
 from dotenv import load_dotenv
 
+load_dotenv()          # .env dosyasındaki ayarları yükler.
+#Yerel modüllerden önce: modül seviyesindeki os.getenv ayarları (DATABASE_URL, MODEL_PROVIDER, INGEST_WORKERS, ...)
+#import sırasında okunur.
+
 from database import init_db
+import auth
 from auth import login, register
 from chat import chat_interface
-
-load_dotenv()          # .env dosyasındaki ayarları yükler.
+import ingest_worker
+import storage_gc
+import rag_client
+import telemetry
+import answer_cache
+from embedding_cache import cache_stats
+
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", 0))
+#Önünde kaç güvenilir ters proxy var. Varsayılan 0: proxy başlıklarına güvenilmez ve IP başına giriş sınırı
+#KAPALIDIR (_client_ip None döner, sadece kullanıcı adı başına sınır çalışır). Proxy arkasında çalışırken ayarlanmalı.
+SESSION_COOKIE = os.getenv("SESSION_COOKIE_NAME", "rag_session")
+#Sayfa yenilendiğinde oturumun sürmesi için token'ın tutulduğu çerez.
 init_db()              # SQLite + tablolar
+if not rag_client.RAG_API_URL:
+    ingest_worker.start()  # Arka plan belge işleme kuyruğu (yarım kalan işler devam eder); servis kullanılıyorsa işler orada çalışır
+    storage_gc.start()     # Yetim yüklemeler / vektör klasörleri için periyodik temizlik (GC_INTERVAL_SECONDS)
+telemetry.register_collector("rag_answer_cache", answer_cache.stats)
+telemetry.register_collector("rag_embedding_cache", cache_stats)
+telemetry.register_collector("rag_storage_gc", storage_gc.stats)
+telemetry.start_metrics_server()  # METRICS_ENABLED=1 ise http://127.0.0.1:9464/metrics
 
 
 def login_register_page():
@@ -39,11 +64,19 @@ def login_register_page():
         password = st.text_input("Password", type="password")
         if st.button("Login", use_container_width=True):
             if username and password:
-                user = login(username, password)
+                ip = _client_ip()
+                wait = auth.retry_after(username, ip)
+                user = None if wait else login(username, password, ip)
                 if user:
                     st.session_state.user_id = user.id
+                    st.session_state.session_token = auth.create_session(user.id)
+                    st.session_state.pending_cookie = st.session_state.session_token
+                    #Token adres çubuğuna yazılmaz (tarayıcı geçmişi, referrer ve proxy günlüklerinden sızmaz);
+                    #sayfa yenilemesinde yeniden giriş/bcrypt gerekmesin diye çereze yazılır (bkz. _set_session_cookie).
                     st.success("Login successful!")
                     st.rerun()
+                elif wait:
+                    st.error(f"Too many attempts. Try again in {wait} seconds.")
                 else:
                     st.error("Invalid username or password")
             else:
@@ -57,8 +90,11 @@ def login_register_page():
         if st.button("Register", use_container_width=True):
             if new_username and new_password and confirm_password:
                 if new_password == confirm_password:
-                    if register(new_username, new_password):
+                    created = register(new_username, new_password)
+                    if created:
                         st.success("Registration successful! Please log in.")
+                    elif created is None:
+                        st.error("Server is busy, please try again")
                     else:
                         st.error("Username already exists")
                 else:
@@ -69,6 +105,48 @@ def login_register_page():
 
 
 
+def _client_ip():
+    #İstemcinin gönderdiği X-Forwarded-For serbestçe değiştirilebilir: sadece TRUSTED_PROXY_HOPS > 0 iken (uygulama
+    #bilinen ters proxy(ler)in arkasındaysa) ve proxy'lerin eklediği en sağdaki adresler kullanılır.
+    if TRUSTED_PROXY_HOPS <= 0:
+        return None
+    try:
+        from streamlit.web.server.websocket_headers import _get_websocket_headers
+        headers = _get_websocket_headers() or {}
+    except Exception:
+        return None
+    hops = [h.strip() for h in (headers.get("X-Forwarded-For") or "").split(",") if h.strip()]
+    if len(hops) >= TRUSTED_PROXY_HOPS:
+        return hops[-TRUSTED_PROXY_HOPS]
+    return headers.get("X-Real-Ip") if TRUSTED_PROXY_HOPS == 1 else None
+#IP bulunamazsa sadece kullanıcı adı başına sınır uygulanır.
+
+
+def _set_session_cookie(token, max_age):
+    #Streamlit sunucudan çerez yazamaz: components.html aynı kökenli bir iframe açar, betik üst sayfanın çerezini yazar.
+    #Çerez JavaScript ile yazıldığı için httpOnly OLAMAZ; httpOnly isteniyorsa çerezi ters proxy koymalı
+    #(SESSION_COOKIE_NAME aynı ad), okuma tarafı (_session_cookie) ikisinde de aynı çalışır.
+    components.html(
+        "<script>"
+        f"var c='{SESSION_COOKIE}={token or ''}; Max-Age={max_age}; Path=/; SameSite=Strict';"
+        "if(window.parent.location.protocol==='https:'){c+='; Secure';}"
+        "window.parent.document.cookie=c;"
+        "</script>",
+        height=0,
+    )
+
+
+def _session_cookie():
+    #Çerezler websocket el sıkışmasında gelir: bağlantı (sayfa yüklemesi) başına bir kez okunur.
+    try:
+        from streamlit.web.server.websocket_headers import _get_websocket_headers
+        headers = _get_websocket_headers() or {}
+    except Exception:
+        return None
+    morsel = SimpleCookie(headers.get("Cookie") or "").get(SESSION_COOKIE)
+    return morsel.value if morsel else None
+
+
 def main():
     st.set_page_config(
         page_title="Document Chat Assistant",
@@ -78,7 +156,20 @@ def main():
 
     if "user_id" not in st.session_state:
         st.session_state.user_id = None
+        st.session_state.session_token = None
         #Kullanıcı oturumu başlatılmamışsa None olarak atanır.
+        token = _session_cookie()
+        user_id = auth.resume_session(token)
+        if user_id is not None:
+            st.session_state.user_id = user_id
+            st.session_state.session_token = token
+        #Yenilenen sayfa çerezdeki token ile devam eder: tek indeksli sorgu, bcrypt yok.
+        #Çıkıştan sonra aynı bağlantının eski başlıkları yeniden okunsa da token sunucuda silindiği için geçersizdir.
+
+    if "pending_cookie" in st.session_state:
+        token = st.session_state.pop("pending_cookie")
+        _set_session_cookie(token, max_age=int(auth.SESSION_TTL.total_seconds()) if token else 0)
+    #Çerez, st.rerun() sonrası çalıştırmada yazılır/silinir: rerun'dan hemen önce eklenen bileşen tarayıcıya ulaşmayabilir.
 
     if st.session_state.user_id is None:
         login_register_page()
@@ -87,7 +178,9 @@ def main():
     else:
         with st.sidebar:
             if st.button("Logout"):
+                auth.end_session(st.session_state.get("session_token"))
                 st.session_state.clear()
+                st.session_state.pending_cookie = ""
                 st.rerun()
         chat_interface()
         #Oturum varsa sohbet arayüzü (chat_interface) gösterilir. Yan menüde "Logout" ile çıkış yapılabilir.
@@ -1,38 +1,186 @@
+import os, hashlib, secrets, threading, time
+from collections import OrderedDict
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
 import bcrypt #Şifreleri güvenli şekilde hash'lemek (şifrelemek) ve doğrulamak için kullanılır.
-from database import get_db, User
+from sqlalchemy.exc import IntegrityError
+from database import session_scope, User, AuthSession
+import telemetry
+#bcrypt bilerek yavaştır: hesaplar sınırlı bir thread havuzunda yapılır (bcrypt hesap sırasında GIL'i bırakır).
+#Dönem başındaki giriş yığılmasında en fazla AUTH_WORKERS çekirdek meşgul olur, diğer oturumlar beklemez.
+
+
+BCRYPT_ROUNDS   = int(os.getenv("BCRYPT_ROUNDS", 12))
+AUTH_WORKERS    = int(os.getenv("AUTH_WORKERS", 2))
+AUTH_TIMEOUT    = float(os.getenv("AUTH_TIMEOUT", 10))
+SESSION_TTL     = timedelta(days=int(os.getenv("SESSION_TTL_DAYS", 7)))
+#BCRYPT_ROUNDS: İş faktörü (2^rounds tur). Sadece yeni hash'leri etkiler; eski hash'ler kendi turlarıyla doğrulanır.
+#AUTH_TIMEOUT: Havuz doluyken bir girişin en fazla bekleyeceği süre (sn); aşılırsa giriş reddedilir.
+
+USER_ATTEMPTS   = int(os.getenv("AUTH_USER_ATTEMPTS", 5))
+IP_ATTEMPTS     = int(os.getenv("AUTH_IP_ATTEMPTS", 20))
+ATTEMPT_WINDOW  = int(os.getenv("AUTH_ATTEMPT_WINDOW", 300))
+THROTTLE_SIZE   = 10_000
+#Kullanıcı adı başına USER_ATTEMPTS, IP başına IP_ATTEMPTS başarısız deneme / ATTEMPT_WINDOW sn. Aşılınca pencere bitene
+#kadar bcrypt hiç çalıştırılmaz. THROTTLE_SIZE: Bellekte tutulan en fazla anahtar (LRU; en eskiler atılır).
+
+_pool = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="bcrypt")
+_slots = threading.BoundedSemaphore(AUTH_WORKERS * 8)
+#Kuyruk da sınırlıdır: aynı anda en fazla AUTH_WORKERS * 8 hash işi bekler/çalışır.
+
+
+# --Worker pool--
+def _run(fn, *args):
+    if not _slots.acquire(timeout=AUTH_TIMEOUT):
+        telemetry.inc("rag_auth_rejected_total", reason="busy")
+        return None
+    fut = _pool.submit(fn, *args)
+    fut.add_done_callback(lambda _: _slots.release())
+    #Yer, bcrypt işi gerçekten bitince bırakılır: zaman aşımına uğrayan istekler havuz kuyruğunu sınırsız büyütemez.
+    try:
+        return fut.result(timeout=AUTH_TIMEOUT)
+    except concurrent.futures.TimeoutError:
+        telemetry.inc("rag_auth_rejected_total", reason="timeout")
+        return None
+#concurrent.futures.TimeoutError açıkça yakalanır (Python < 3.11'de yerleşik TimeoutError ile aynı sınıf değildir).
 
 
-def login(username: str, password: str):
-    db = get_db()
+def hash_password(password: str) -> str:
+    return _run(lambda: bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode())
+    #gensalt(), her kullanıcı için rastgele bir tuz oluşturur.
+    #Tuz (salt), bir şifreyi hash’lemeden önce o şifreye eklenen rastgele bir veri parçasıdır. Amacı, aynı şifreyi kullanan iki farklı kullanıcı için bile farklı hash’ler üretmektir.
+
+
+def _checkpw(password: str, hashed: str) -> bool:
     try:
+        return bcrypt.checkpw(password.encode(), hashed.encode())
+    except ValueError:
+        return False
+#Geçersiz hash (ör. şifresiz içe aktarılan kullanıcıların "!" değeri) hiçbir şifreyle eşleşmez.
+
+
+def check_password(password: str, hashed: str):
+    return _run(_checkpw, password, hashed)
+#True / False; havuz meşgulse None (deneme hakkından düşülmez).
+
+
+# --Throttling--
+class _Throttle:
+    #Anahtar başına (deneme sayısı, pencere başlangıcı); OrderedDict ile LRU.
+    def __init__(self, limit, window, size=THROTTLE_SIZE):
+        self.limit, self.window, self.size = limit, window, size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def retry_after(self, key, now) -> float:
+        with self._lock:
+            count, start = self._items.get(key, (0, now))
+            if now - start >= self.window:
+                self._items.pop(key, None)
+                return 0
+            return self.window - (now - start) if count >= self.limit else 0
+
+    def fail(self, key, now):
+        with self._lock:
+            count, start = self._items.pop(key, (0, now))
+            if now - start >= self.window:
+                count, start = 0, now
+            self._items[key] = (count + 1, start)
+            if len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def reset(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+
+_by_user = _Throttle(USER_ATTEMPTS, ATTEMPT_WINDOW)
+_by_ip = _Throttle(IP_ATTEMPTS, ATTEMPT_WINDOW)
+
+
+def retry_after(username: str, ip: str = None) -> int:
+    #0 → giriş denenebilir; aksi halde beklenmesi gereken saniye.
+    now = time.monotonic()
+    wait = _by_user.retry_after(username.lower(), now)
+    if ip:
+        wait = max(wait, _by_ip.retry_after(ip, now))
+    return int(wait + 0.999)
+
+
+# --Login / register--
+@telemetry.traced("auth.login")
+def login(username: str, password: str, ip: str = None):
+    if retry_after(username, ip):
+        telemetry.inc("rag_auth_rejected_total", reason="throttled")
+        return None
+    #Deneme sınırı aşıldıysa şifre hiç kontrol edilmez (bcrypt maliyeti yok).
+
+    with session_scope() as db:
         user = db.query(User).filter(User.username == username).first()
         #Veritabanından verilen kullanıcı adına sahip ilk kullanıcı sorgulanır.
 
-        if user and bcrypt.checkpw(password.encode(), user.password_hash.encode()):
-            return user
-        #Eğer kullanıcı varsa ve verilen şifre, veritabanındaki şifre hash’i ile uyuşuyorsa kullanıcı nesnesi döndürülür.
-
+    ok = check_password(password, user.password_hash) if user else False
+    if ok:
+        _by_user.reset(username.lower())
+        return user
+    #Eğer kullanıcı varsa ve verilen şifre, veritabanındaki şifre hash’i ile uyuşuyorsa kullanıcı nesnesi döndürülür.
+    #bcrypt kontrolü oturum kapandıktan sonra yapılır; yavaş hash hesabı sırasında bağlantı havuzda boşta kalır.
+    if ok is None:
         return None
-    finally:
-        db.close()
 
+    now = time.monotonic()
+    _by_user.fail(username.lower(), now)
+    if ip:
+        _by_ip.fail(ip, now)
+    return None
 
-def register(username: str, password: str) -> bool:
-    db = get_db()
+
+@telemetry.traced("auth.register")
+def register(username: str, password: str):
+    hashed = hash_password(password)
+    if hashed is None:
+        return None
+    #Havuz meşgulse None (kullanıcı adı çakışmasından ayırt edilir).
     try:
-        if db.query(User).filter(User.username == username).first():
-            return False
-        #Eğer bu kullanıcı adına sahip biri zaten varsa kayıt yapılmaz ve False döndürülür.
-
-        hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
-        #Verilen şifre hash’lenir (şifrelenir). gensalt(), her kullanıcı için rastgele bir tuz oluşturur.
-        #Tuz (salt), bir şifreyi hash’lemeden önce o şifreye eklenen rastgele bir veri parçasıdır. Amacı, aynı şifreyi kullanan iki farklı kullanıcı için bile farklı hash’ler üretmektir.
-
-        db.add(User(username=username, password_hash=hashed))
-        db.commit()
-        #Değişiklikler veritabanına kalıcı olarak kaydedilir.
-
-        return True
-    finally:
-        db.close()
-        
\ No newline at end of file
+        with session_scope() as db:
+            db.add(User(username=username, password_hash=hashed))
+            #Değişiklikler session_scope çıkışında veritabanına kalıcı olarak kaydedilir (commit).
+    except IntegrityError:
+        return False
+    #Ayrı bir "var mı?" sorgusu yapılmaz: kullanıcı adı zaten varsa UNIQUE kısıtı kaydı reddeder (yarış durumu da yok).
+
+    return True
+
+
+# --Session tokens--
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def create_session(user_id: int) -> str:
+    token = secrets.token_urlsafe(32)
+    with session_scope() as db:
+        db.add(AuthSession(token_hash=_digest(token), user_id=user_id, expires_at=datetime.utcnow() + SESSION_TTL))
+        db.query(AuthSession).filter(AuthSession.expires_at < datetime.utcnow()).delete()
+        #Süresi dolan oturumlar her yeni girişte temizlenir.
+    return token
+
+
+def resume_session(token: str):
+    #Token → kullanıcı id'si: tek bir indeksli sorgu, bcrypt yok. Geçersiz/süresi dolmuş token → None.
+    if not token:
+        return None
+    with session_scope() as db:
+        return (
+            db.query(AuthSession.user_id)
+            .filter(AuthSession.token_hash == _digest(token), AuthSession.expires_at > datetime.utcnow())
+            .scalar()
+        )
+
+
+def end_session(token: str):
+    if token:
+        with session_scope() as db:
+            db.query(AuthSession).filter(AuthSession.token_hash == _digest(token)).delete()
@@ -0,0 +1,66 @@
+#Kullanım: python -m benchmarks.bench_clients [--questions 500]
+#Her soruda istemci + prompt + zincir kurmak (eski _generate_answer) ile providers kaydını
+#karşılaştırır. Sahte (stub) model ve retriever kullanılır; ağ çağrısı yapılmaz.
+import argparse, os, sys, time
+
+os.environ.setdefault("MODEL_PROVIDER", "fake")
+os.environ.setdefault("GOOGLE_API_KEY", "bench-not-used")
+#Google istemcisi kurulurken anahtar sadece yapılandırılır, istek gönderilmez.
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain.chains import create_retrieval_chain
+from langchain.chains.combine_documents import create_stuff_documents_chain
+
+import providers
+
+
+class StubRetriever(BaseRetriever):
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return [Document(page_content="stub context")]
+
+
+def _legacy_build(retr, llm_cls):
+    #Değişiklikten önceki davranış: her soruda yeni istemci, yeni prompt, yeni zincir.
+    if llm_cls is FakeListChatModel:
+        llm = FakeListChatModel(responses=["ok"])
+    else:
+        llm = ChatGoogleGenerativeAI(
+            model=providers.LLM_MODEL, temperature=0.3, max_tokens=500,
+            convert_system_message_to_human=True,
+        )
+    prompt = ChatPromptTemplate.from_messages(
+        [("system", providers.SYSTEM_PROMPT), ("human", "Context: {context}\n\nQuestion: {input}")]
+    )
+    return create_retrieval_chain(retr, create_stuff_documents_chain(llm, prompt))
+
+
+def _time(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--questions", type=int, default=500)
+    args = ap.parse_args(argv)
+
+    retr = StubRetriever()
+    stub_llm = FakeListChatModel(responses=["ok"])
+    for name, llm_cls in [("stub", FakeListChatModel), ("gemini-client", ChatGoogleGenerativeAI)]:
+        before = _time(lambda: _legacy_build(retr, llm_cls), args.questions)
+        after = _time(lambda: providers.get_qa_chain(retr, stub_llm), args.questions)
+        print(f"{name:14s} build per question: before {before:8.1f} µs  after {after:6.1f} µs")
+
+    answer_before = _time(lambda: _legacy_build(retr, FakeListChatModel).invoke({"input": "q"}), args.questions)
+    answer_after = _time(lambda: providers.get_qa_chain(retr, stub_llm).invoke({"input": "q"}), args.questions)
+    print(f"end-to-end stub answer     : before {answer_before:8.1f} µs  after {answer_after:6.1f} µs")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
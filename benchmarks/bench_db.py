@@ -0,0 +1,78 @@
+#Kullanım: python -m benchmarks.bench_db [--threads 8] [--queries 200]
+#Eski yöntem (her sorguda create_engine + create_all) ile tek motor + bağlantı havuzunu
+#eşzamanlı oturumlar altında karşılaştırır ve saniyedeki sorgu sayısını (QPS) yazdırır.
+import argparse, os, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+
+_tmp = tempfile.mkdtemp(prefix="bench_db_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.db')}"
+#Benchmark gerçek chatbot.db'ye dokunmaz; geçici bir veritabanı kullanılır.
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import database
+from database import Base, Chat, Message, User, session_scope
+
+
+def _seed(users=20, chats_per_user=10, msgs_per_chat=20):
+    with session_scope() as db:
+        for u in range(users):
+            user = User(username=f"user{u}", password_hash="x")
+            db.add(user)
+            db.flush()
+            for c in range(chats_per_user):
+                chat = Chat(user_id=user.id, title=f"chat {c}")
+                db.add(chat)
+                db.flush()
+                db.add_all(
+                    Message(chat_id=chat.id, role="user", content="lorem ipsum " * 10)
+                    for _ in range(msgs_per_chat)
+                )
+
+
+def _legacy_query(uid):
+    #Değişiklikten önceki get_db(): her çağrıda yeni motor + şema kontrolü.
+    engine = create_engine(database.DATABASE_URL, echo=False)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        return db.query(Chat).filter(Chat.user_id == uid).order_by(Chat.created_at.desc()).all()
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def _pooled_query(uid):
+    with session_scope() as db:
+        return db.query(Chat).filter(Chat.user_id == uid).order_by(Chat.created_at.desc()).all()
+
+
+def _run(fn, threads, queries):
+    def worker(t):
+        for i in range(queries):
+            fn((t + i) % 20 + 1)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+    elapsed = time.perf_counter() - start
+    return threads * queries / elapsed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--queries", type=int, default=200)
+    args = ap.parse_args(argv)
+
+    database.init_db()
+    _seed()
+    before = _run(_legacy_query, args.threads, args.queries)
+    after  = _run(_pooled_query, args.threads, args.queries)
+    print(f"threads={args.threads} queries/thread={args.queries}")
+    print(f"before (engine per call): {before:10.1f} q/s")
+    print(f"after  (pooled engine)  : {after:10.1f} q/s  ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
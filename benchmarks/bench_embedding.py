@@ -0,0 +1,58 @@
+#Kullanım: python -m benchmarks.bench_embedding [--chunks 600] [--latency 0.05] [--error-rate 0.1]
+#Gecikme ve rastgele 429 hatası ekleyen yerel sahte embedding uç noktasına karşı
+#seri embedding ile ScheduledEmbeddings'i (gruplama + eşzamanlılık + hız sınırı + yeniden deneme) karşılaştırır.
+import argparse, sys, time
+
+from embedding_scheduler import ScheduledEmbeddings, is_rate_limit_error
+from providers import FakeEmbeddings
+
+
+def _serial(endpoint, texts, batch_size):
+    #Eski davranış: gruplar sırayla gönderilir; 429 gelirse sabit bekleyip tekrar denenir.
+    out = []
+    for i in range(0, len(texts), batch_size):
+        while True:
+            try:
+                out.extend(endpoint.embed_documents(texts[i:i + batch_size]))
+                break
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                time.sleep(0.1)
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=600)
+    ap.add_argument("--batch-size", type=int, default=16)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--rate", type=float, default=50)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--error-rate", type=float, default=0.1)
+    args = ap.parse_args(argv)
+
+    texts = [f"chunk {i} " + "lorem ipsum " * 50 for i in range(args.chunks)]
+
+    endpoint = FakeEmbeddings(latency=args.latency, error_rate=args.error_rate, seed=1)
+    start = time.perf_counter()
+    serial = _serial(endpoint, texts, args.batch_size)
+    t_serial = time.perf_counter() - start
+
+    endpoint = FakeEmbeddings(latency=args.latency, error_rate=args.error_rate, seed=1)
+    sched = ScheduledEmbeddings(
+        endpoint, batch_size=args.batch_size, max_concurrency=args.concurrency,
+        rate=args.rate, base_delay=0.05,
+    )
+    start = time.perf_counter()
+    scheduled = sched.embed_documents(texts)
+    t_sched = time.perf_counter() - start
+
+    assert serial == scheduled, "scheduler must preserve order and values"
+    print(f"chunks={args.chunks} batch={args.batch_size} latency={args.latency}s 429-rate={args.error_rate}")
+    print(f"serial   : {t_serial:6.2f}s  {args.chunks / t_serial:8.1f} chunks/s")
+    print(f"scheduled: {t_sched:6.2f}s  {args.chunks / t_sched:8.1f} chunks/s  {sched.stats()}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
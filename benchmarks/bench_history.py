@@ -0,0 +1,142 @@
+#Kullanım: python -m benchmarks.bench_history [--messages 1000000] [--users 200] [--repeat 30]
+#Sentetik (varsayılan 1M mesajlık) bir veritabanında sohbet geçmişi sorgularını karşılaştırır:
+#indekssiz + .all() (eski yöntem) ↔ migration ile eklenen indeksler + keyset sayfalama.
+import argparse, os, random, sqlite3, statistics, sys, tempfile, time
+from datetime import datetime, timedelta
+
+_tmp = tempfile.mkdtemp(prefix="bench_history_")
+_path = os.path.join(_tmp, "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_path}"
+#Benchmark gerçek chatbot.db'ye dokunmaz; geçici bir veritabanı kullanılır.
+
+from sqlalchemy import text
+
+import database
+from database import Base, Chat, Message, Feedback, session_scope
+from chat import load_previous_chats, load_chat_messages
+
+
+def _drop_indexes(engine):
+    #Migration öncesi şemayı taklit eder: modellerde tanımlı indeksler silinir, şema sürümü 1'e çekilir.
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        conn.execute(text("DELETE FROM schema_version WHERE version > 1"))
+
+
+def _seed(messages, users, heavy_chats, heavy_messages, seed=7):
+    #ORM yerine doğrudan executemany: 1M satır birkaç saniyede yazılır.
+    rng = random.Random(seed)
+    t0 = datetime(2024, 1, 1)
+    conn = sqlite3.connect(_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executemany(
+        "INSERT INTO users (id, username, password_hash) VALUES (?, ?, 'x')",
+        ((u, f"user{u}") for u in range(1, users + 1)),
+    )
+    #Kullanıcı 1 "ağır" kullanıcıdır: heavy_chats sohbet; ilk sohbetinde heavy_messages mesaj.
+    chats, cid = [], 0
+    for u in range(1, users + 1):
+        for _ in range(heavy_chats if u == 1 else rng.randint(5, 40)):
+            cid += 1
+            chats.append((cid, u, f"chat {cid}", t0 + timedelta(minutes=cid)))
+    conn.executemany("INSERT INTO chats (id, user_id, title, created_at) VALUES (?, ?, ?, ?)", chats)
+
+    def rows():
+        for i in range(messages):
+            chat_id = 1 if i < heavy_messages else rng.randint(2, cid)
+            yield (i + 1, chat_id, "user" if i % 2 == 0 else "assistant",
+                   "lorem ipsum dolor sit amet " * 4, t0 + timedelta(seconds=i))
+    conn.executemany(
+        "INSERT INTO messages (id, chat_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)", rows()
+    )
+    conn.executemany(
+        "INSERT INTO feedback (message_id, is_helpful, created_at) VALUES (?, ?, ?)",
+        ((m, rng.random() < 0.8, t0) for m in range(2, messages + 1, 20)),
+    )
+    conn.commit()
+    conn.close()
+    return cid
+
+
+# --Queries--
+def _legacy_chats(uid):
+    with session_scope() as db:
+        return db.query(Chat).filter(Chat.user_id == uid).order_by(Chat.created_at.desc()).all()
+
+
+def _legacy_messages(cid):
+    with session_scope() as db:
+        return db.query(Message).filter(Message.chat_id == cid).order_by(Message.created_at).all()
+
+
+def _feedback(mid):
+    with session_scope() as db:
+        return db.query(Feedback).filter(Feedback.message_id == mid).first()
+
+
+def _time(fn, repeat):
+    xs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        xs.append((time.perf_counter() - start) * 1000)
+    return statistics.median(xs)
+
+
+def _plan(sql):
+    conn = sqlite3.connect(_path)
+    try:
+        return " / ".join(r[-1] for r in conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=1_000_000)
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--heavy-chats", type=int, default=500)
+    ap.add_argument("--heavy-messages", type=int, default=20_000)
+    ap.add_argument("--repeat", type=int, default=30)
+    args = ap.parse_args(argv)
+
+    engine = database.init_db()
+    _drop_indexes(engine)
+    start = time.perf_counter()
+    chats = _seed(args.messages, args.users, args.heavy_chats, args.heavy_messages)
+    print(f"seeded {args.messages:,} messages in {chats:,} chats ({time.perf_counter() - start:.1f}s)")
+
+    mid = args.messages // 2 * 2
+    queries = {
+        "sidebar (heavy user)": (lambda: _legacy_chats(1), lambda: load_previous_chats(1)),
+        "open chat (heavy chat)": (lambda: _legacy_messages(1), lambda: load_chat_messages(1)),
+        "open chat (typical)": (lambda: _legacy_messages(chats // 2), lambda: load_chat_messages(chats // 2)),
+        "feedback lookup": (lambda: _feedback(mid), lambda: _feedback(mid)),
+    }
+    before = {name: _time(old, args.repeat) for name, (old, _) in queries.items()}
+    plan_before = _plan("SELECT * FROM messages WHERE chat_id = 1 ORDER BY id DESC LIMIT 51")
+
+    start = time.perf_counter()
+    database.migrate(engine)
+    print(f"migration (indexes + ANALYZE): {time.perf_counter() - start:.1f}s")
+
+    after = {name: _time(new, args.repeat) for name, (_, new) in queries.items()}
+    _, cursor = load_chat_messages(1)
+    for _ in range(args.heavy_messages // 2 // 50):
+        _, cursor = load_chat_messages(1, before_id=cursor)
+    deep = _time(lambda: load_chat_messages(1, before_id=cursor), args.repeat)
+    #Keyset sayfalamada derin bir sayfa da ilk sayfa kadar hızlıdır (OFFSET gibi atlanan satırları taramaz).
+    plan_after = _plan("SELECT * FROM messages WHERE chat_id = 1 ORDER BY id DESC LIMIT 51")
+
+    print(f"\n{'query':28s} {'before (ms)':>12s} {'after (ms)':>12s} {'speedup':>9s}")
+    for name in queries:
+        print(f"{name:28s} {before[name]:12.2f} {after[name]:12.2f} {before[name] / after[name]:8.1f}x")
+    print(f"{'open chat, page in middle':28s} {'':12s} {deep:12.2f}")
+    print(f"\nplan before: {plan_before}\nplan after : {plan_after}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+#Kullanım: python -m benchmarks.bench_retrieval [--chunks 2000] [--queries 50]
+#Eski k=10 benzerlik araması ile hibrit (BM25 + vektör + RRF + token bütçesi) aramayı karşılaştırır:
+#prompt'a giren bağlam boyutu (token), arama ve cevap gecikmesi, tam terim (ders kodu) sorgularında isabet.
+import argparse, os, random, shutil, statistics, sys, tempfile, time
+
+os.environ.setdefault("MODEL_PROVIDER", "fake")
+
+from langchain_core.documents import Document
+
+import ingest, retrieval
+from providers import get_embeddings, get_qa_chain, get_llm
+
+
+def _corpus(n, seed=7):
+    rng = random.Random(seed)
+    words = ("öğrenci ders sınav not kredi yönetmelik dönem başarı devam madde fakülte "
+             "bölüm program danışman kayıt mezuniyet staj proje laboratuvar").split()
+    docs = []
+    for i in range(n):
+        code = f"BIL{100 + i}"
+        body = " ".join(rng.choice(words) for _ in range(150))
+        docs.append(Document(
+            page_content=f"{code} dersi. {body}",
+            metadata={"document_id": 1, "page": i // 4, "file_hash": "bench"},
+        ))
+    return docs
+
+
+def _percentile(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))]
+
+
+def _measure(name, retr, queries, targets):
+    chain = get_qa_chain(retr, get_llm())
+    r_lat, a_lat, tokens, found = [], [], [], 0
+    for q, target in zip(queries, targets):
+        start = time.perf_counter()
+        docs = retr.invoke(q)
+        r_lat.append((time.perf_counter() - start) * 1000)
+        tokens.append(sum(retrieval.count_tokens(d.page_content) for d in docs))
+        found += any(target in d.page_content for d in docs)
+        start = time.perf_counter()
+        chain.invoke({"input": q})
+        a_lat.append((time.perf_counter() - start) * 1000)
+    print(
+        f"{name:8s} context tokens avg {statistics.mean(tokens):7.0f} | "
+        f"retrieval p50 {_percentile(r_lat, 50):6.1f} ms p95 {_percentile(r_lat, 95):6.1f} ms | "
+        f"answer p50 {_percentile(a_lat, 50):6.1f} ms | exact-term hit {found}/{len(queries)}"
+    )
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=2000)
+    ap.add_argument("--queries", type=int, default=50)
+    args = ap.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="bench_retrieval_")
+    try:
+        vs = ingest.open_vector_store(directory, get_embeddings())
+        for batch in ingest.iter_batches(_corpus(args.chunks)):
+            vs.add_documents(batch)
+        rng = random.Random(3)
+        targets = [f"BIL{100 + rng.randrange(args.chunks)}" for _ in range(args.queries)]
+        queries = [f"{t} dersinin kredisi nedir?" for t in targets]
+
+        _measure("k=10", vs.as_retriever(search_type="similarity", search_kwargs={"k": 10}), queries, targets)
+        _measure("hybrid", retrieval.HybridRetriever(vectorstore=vs), queries, targets)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+#Kullanım: python -m benchmarks.bench_service [--workers 1 2 4] [--clients 32] [--duration 15] [--pages 100]
+#api.py servisinin yük testi: sahte (stub) model ile aynı yük 1, 2, 4 ... işçi süreçle çalıştırılır;
+#saniyedeki cevap sayısı ve gecikme yüzdelikleri işçi sayısıyla karşılaştırılır (çok çekirdekli makinede ölçeklenme).
+import argparse, json, os, random, shutil, socket, statistics, subprocess, sys, tempfile, threading, time
+from http.client import HTTPConnection
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_tmp = tempfile.mkdtemp(prefix="bench_service_")
+ENV = {
+    "DATABASE_URL": f"sqlite:///{os.path.join(_tmp, 'bench.db')}",
+    "EMBEDDING_CACHE_PATH": os.path.join(_tmp, "embedding_cache.db"),
+    "MODEL_PROVIDER": "fake",
+    "FAKE_LLM_TOKEN_DELAY": os.getenv("FAKE_LLM_TOKEN_DELAY", "0.002"),
+    "ANSWER_CACHE_THRESHOLD": "2",
+}
+os.environ.update(ENV)
+os.chdir(_tmp)
+#Servis ve tohumlama aynı geçici klasörde çalışır (chroma_db/ ve uploaded_files/ göreli yollar).
+#ANSWER_CACHE_THRESHOLD=2: cevap önbelleği hiç isabet etmez, her istek tüm RAG yolunu çalıştırır.
+
+sys.path.insert(0, ROOT)
+from langchain_core.documents import Document as Page
+
+import auth, database, ingest
+from chunking import StructuredChunker
+from database import session_scope, Chat, Document, User
+
+WORDS = ("öğrenci ders sınav not kredi yönetmelik dönem başarı devam madde fakülte bölüm "
+         "program danışman kayıt mezuniyet staj proje laboratuvar ortalama").split()
+
+
+def _pages(n, seed=11):
+    rng = random.Random(seed)
+    for p in range(n):
+        text = " ".join(rng.choice(WORDS) for _ in range(300)).capitalize() + "."
+        yield Page(page_content=f"MADDE {p + 1} - BIL{100 + p}\n{text}", metadata={"page": p, "source": "bench"})
+
+
+def _question(rng, pages):
+    return f"BIL{100 + rng.randrange(pages)} dersinin {rng.choice(WORDS)} kuralı nedir?"
+
+
+def _stats(samples_ms):
+    xs = sorted(samples_ms)
+    pick = lambda q: xs[min(len(xs) - 1, int(round(q * (len(xs) - 1))))]
+    return {"p50_ms": round(pick(0.50), 3), "p95_ms": round(pick(0.95), 3), "mean_ms": round(statistics.mean(xs), 3)}
+
+
+def _seed(pages, chats):
+    database.init_db()
+    directory = ingest.chat_vector_dir("bench")
+    def chunk_iter():
+        for c in StructuredChunker().iter_chunks(_pages(pages)):
+            c.metadata["file_hash"] = "bench"
+            yield c
+    ingest.add_to_vector_store(chunk_iter(), directory, document_id=1)
+    with session_scope() as db:
+        user = User(username="bench", password_hash="x")
+        db.add(user)
+        db.flush()
+        ids = []
+        for i in range(chats):
+            chat = Chat(user_id=user.id, title=f"bench {i}", vector_dir=directory)
+            db.add(chat)
+            db.flush()
+            db.add(Document(chat_id=chat.id, file_name="bench.txt", file_path="uploaded_files/bench.txt"))
+            ids.append(chat.id)
+        user_id = user.id
+    return ids, auth.create_session(user_id)
+#Tüm sohbetler aynı koleksiyonu kullanır; her istemcinin kendi sohbeti (ve geçmişi) vardır.
+#Servis her istekte oturum token'ı ister (Authorization: Bearer).
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start(workers):
+    port = _free_port()
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "api", "--port", str(port), "--workers", str(workers)],
+        cwd=_tmp, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return proc, port
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("service did not start")
+
+
+def _load(port, chat_ids, token, clients, duration, pages):
+    lat, errors, lock = [], [0], threading.Lock()
+    stop = time.perf_counter() + duration
+
+    def client(i):
+        conn = HTTPConnection("127.0.0.1", port, timeout=60)
+        rng = random.Random(i)
+        cid = chat_ids[i % len(chat_ids)]
+        while time.perf_counter() < stop:
+            body = json.dumps({"question": _question(rng, pages)})
+            t = time.perf_counter()
+            try:
+                conn.request("POST", f"/chats/{cid}/ask", body=body, headers={"Content-Type": "application/json", "Authorization": f"Bearer {token}"})
+                resp = conn.getresponse()
+                resp.read()
+                ok = resp.status == 200
+            except OSError:
+                conn.close()
+                conn = HTTPConnection("127.0.0.1", port, timeout=60)
+                ok = False
+            with lock:
+                if ok:
+                    lat.append((time.perf_counter() - t) * 1000)
+                else:
+                    errors[0] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(lat),
+        "errors": errors[0],
+        "requests_per_s": round(len(lat) / elapsed, 2),
+        **(_stats(lat) if lat else {}),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--clients", type=int, default=32)
+    ap.add_argument("--duration", type=float, default=15)
+    ap.add_argument("--pages", type=int, default=100)
+    args = ap.parse_args(argv)
+
+    try:
+        chat_ids, token = _seed(args.pages, args.clients)
+        results = {}
+        for w in args.workers:
+            proc, port = _start(w)
+            try:
+                _load(port, chat_ids, token, args.clients, 2, args.pages)
+                #Isınma: her işçi koleksiyonu ve BM25 indeksini açar.
+                results[w] = _load(port, chat_ids, token, args.clients, args.duration, args.pages)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(_tmp, ignore_errors=True)
+
+    base = results[args.workers[0]]["requests_per_s"] or 1
+    print(f"cpus={os.cpu_count()} clients={args.clients} duration={args.duration}s provider=fake")
+    print(f"{'workers':>8s} {'req/s':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'errors':>7s} {'scaling':>8s}")
+    for w, r in results.items():
+        print(f"{w:8d} {r['requests_per_s']:9.1f} {r.get('p50_ms', 0):9.1f} {r.get('p95_ms', 0):9.1f} "
+              f"{r['errors']:7d} {r['requests_per_s'] / base:7.2f}x")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+#Kullanım: python -m benchmarks.bench_vectors [--vectors 100000] [--dim 768] [--queries 200] [--chats 4]
+#Chroma ↔ numpy_store (int8 ve float16) karşılaştırması, sentetik vektörlerle:
+#recall@10 (kesin float32 kaba kuvvet aramaya göre), sorgu gecikmesi ve aynı belgeyi açan `--chats` sohbetin RSS'i.
+#RSS her depo için ayrı bir alt süreçte ölçülür (Linux /proc/self/status).
+import argparse, json, os, shutil, statistics, subprocess, sys, tempfile, time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+
+class TableEmbeddings(Embeddings):
+    #Metin → önceden üretilmiş vektör ("doc-<i>" / "q-<i>"); model çağrısı olmadan depoların kendisi ölçülür.
+    def __init__(self, vectors, queries):
+        self.vectors, self.queries = vectors, queries
+
+    def embed_documents(self, texts):
+        return [self.vectors[int(t.split("-")[1])].tolist() for t in texts]
+
+    def embed_query(self, text):
+        return self.queries[int(text.split("-")[1])].tolist()
+
+
+def _data(n, dim, queries, seed=3):
+    #Kümelenmiş veri (gerçek embedding'lere benzer): 256 merkez etrafında gürültülü noktalar.
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((256, dim)).astype(np.float32)
+    x = centers[rng.integers(0, 256, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    q = centers[rng.integers(0, 256, queries)] + 0.6 * rng.standard_normal((queries, dim)).astype(np.float32)
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return x, q
+
+
+def _truth(x, q, k):
+    return [set(np.argpartition(-(x @ v), k)[:k].tolist()) for v in q]
+
+
+def _du(paths):
+    return sum(os.path.getsize(os.path.join(r, f)) for p in paths for r, _, fs in os.walk(p) for f in fs) / 1024 / 1024
+
+
+def _rss_mb():
+    with open("/proc/self/status") as f:
+        fields = dict(line.split(":", 1) for line in f)
+    return int(fields["VmRSS"].split()[0]) / 1024, int(fields["VmHWM"].split()[0]) / 1024
+
+
+# --Build--
+def _docs(lo, hi):
+    return [Document(page_content=f"doc-{i}", metadata={"row": i, "page": 0}) for i in range(lo, hi)]
+
+
+def _build_chroma(directory, emb, n, batch=5000):
+    from langchain_chroma import Chroma
+    vs = Chroma(persist_directory=directory, embedding_function=emb, collection_metadata={"hnsw:space": "cosine"})
+    for lo in range(0, n, batch):
+        vs.add_documents(_docs(lo, min(n, lo + batch)))
+
+
+def _build_numpy(directory, emb, n, dtype, batch=5000):
+    import numpy_store
+    numpy_store.SEGMENT_ROOT = os.path.join(os.path.dirname(directory), "segments")
+    if not numpy_store.segment_exists(f"bench-{dtype}"):
+        writer = numpy_store.SegmentWriter(f"bench-{dtype}", dtype=dtype)
+        for lo in range(0, n, batch):
+            docs = _docs(lo, min(n, lo + batch))
+            writer.add(emb.embed_documents([d.page_content for d in docs]), docs)
+        writer.commit()
+    numpy_store.NumpyVectorStore(directory, emb)._link(1, f"bench-{dtype}", replace=True)
+
+
+def _open(backend, directory, emb):
+    if backend == "chroma":
+        from langchain_chroma import Chroma
+        return Chroma(persist_directory=directory, embedding_function=emb)
+    import numpy_store
+    numpy_store.SEGMENT_ROOT = os.path.join(os.path.dirname(directory), "segments")
+    return numpy_store.NumpyVectorStore(directory, emb)
+
+
+# --Measure--
+def _measure(backend, dirs, q, truth, k):
+    emb = TableEmbeddings(None, q)
+    stores = [_open(backend, d, emb) for d in dirs]
+    lat, hits = [], 0
+    for i in range(len(q)):
+        vs = stores[i % len(stores)]
+        t = time.perf_counter()
+        docs = vs.similarity_search(f"q-{i}", k=k)
+        lat.append((time.perf_counter() - t) * 1000)
+        hits += len(truth[i] & {d.metadata["row"] for d in docs})
+    xs = sorted(lat)
+    rss, peak = _rss_mb()
+    return {
+        "recall": hits / (k * len(q)),
+        "p50_ms": xs[len(xs) // 2], "p95_ms": xs[int(0.95 * (len(xs) - 1))], "mean_ms": statistics.mean(xs),
+        "rss_mb": rss, "peak_rss_mb": peak,
+    }
+#Her sohbetin deposu sırayla sorgulanır: tüm sohbetlerin verisi bellekte tutulmak zorundadır.
+
+
+def _child(args):
+    data = np.load(args.truth)
+    truth = [set(row.tolist()) for row in data["truth"]]
+    print(json.dumps(_measure(args.child, json.loads(args.dirs), data["q"], truth, args.k)))
+#Alt süreç sadece sorguları ve doğru cevapları yükler; RSS'e veri kümesinin kendisi karışmaz.
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--vectors", type=int, default=100_000)
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--chats", type=int, default=4)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--child")
+    ap.add_argument("--dirs")
+    ap.add_argument("--truth")
+    args = ap.parse_args(argv)
+    if args.child:
+        return _child(args)
+
+    tmp = tempfile.mkdtemp(prefix="bench_vectors_")
+    try:
+        x, q = _data(args.vectors, args.dim, args.queries)
+        emb = TableEmbeddings(x, q)
+        truth_path = os.path.join(tmp, "truth.npz")
+        np.savez(truth_path, q=q, truth=np.array([sorted(t) for t in _truth(x, q, args.k)]))
+        backends, sizes = {}, {}
+        for name in ("chroma", "int8", "float16"):
+            dirs = [os.path.join(tmp, f"{name}_chat_{c}") for c in range(args.chats)]
+            t = time.perf_counter()
+            for d in dirs:
+                if name == "chroma":
+                    _build_chroma(d, emb, args.vectors)
+                    #Mevcut düzen: her sohbetin kendi koleksiyonu (aynı belge her sohbette tekrar saklanır).
+                else:
+                    _build_numpy(d, emb, args.vectors, name)
+                    #NumPy: segment bir kez yazılır, diğer sohbetler sadece manifest ile bağlanır.
+            build_s = time.perf_counter() - t
+            backends[name] = (dirs, build_s)
+            sizes[name] = _du(dirs + ([] if name == "chroma" else [os.path.join(tmp, "segments", f"bench-{name}")]))
+        del x, q, emb
+
+        print(f"vectors={args.vectors} dim={args.dim} queries={args.queries} chats={args.chats} k={args.k}")
+        print(f"{'backend':>9s} {'recall@k':>9s} {'p50 ms':>8s} {'p95 ms':>8s} {'RSS MB':>8s} {'peak MB':>8s} "
+              f"{'disk MB':>8s} {'build s':>8s}")
+        for name, (dirs, build_s) in backends.items():
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_vectors", "--child", "chroma" if name == "chroma" else "numpy",
+                 "--dirs", json.dumps(dirs), "--truth", truth_path, "--k", str(args.k)],
+                cwd=ROOT, capture_output=True, text=True, check=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{name:>9s} {r['recall']:9.3f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['rss_mb']:8.0f} "
+                  f"{r['peak_rss_mb']:8.0f} {sizes[name]:8.0f} {build_s:8.1f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
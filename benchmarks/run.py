@@ -0,0 +1,219 @@
+#Kullanım: python -m benchmarks.run [--pages 200] [--users 8] [--duration 10] [--out results.json]
+#Tam RAG yolunun çevrimdışı benchmark'ı: sahte (deterministik) embedding ve LLM ile
+#ingest hızı, arama gecikmesi, uçtan uca cevap gecikmesi, SQLite yazma hızı ve eşzamanlı kullanıcı yükü.
+#Cevaplar üretimdeki yoldan (rag_service: soru yeniden yazma, cevap önbelleği, hibrit arama, kayıt) alınır.
+#Sonuçlar JSON olarak yazılır; iki çalıştırmanın çıktısı karşılaştırılarak gerileme (regression) yakalanır.
+import argparse, json, os, platform, random, shutil, statistics, sys, tempfile, threading, time
+
+_tmp = tempfile.mkdtemp(prefix="bench_rag_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.db')}"
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(_tmp, "embedding_cache.db")
+os.environ.setdefault("MODEL_PROVIDER", "fake")
+os.environ.setdefault("FAKE_LLM_TOKEN_DELAY", "0")
+#Benchmark gerçek veritabanına ve önbelleğe dokunmaz.
+
+from langchain_core.documents import Document
+
+import database, ingest, providers, rag_service
+from chunking import StructuredChunker
+from database import session_scope, Chat, Document as DocumentRow, User
+from chat import save_chat_to_db
+
+WORDS = ("öğrenci ders sınav not kredi yönetmelik dönem başarı devam madde fakülte bölüm "
+         "program danışman kayıt mezuniyet staj proje laboratuvar ortalama").split()
+
+
+def _pages(n, seed=11):
+    rng = random.Random(seed)
+    for p in range(n):
+        paras = []
+        for a in range(3):
+            sentences = (" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+                         for _ in range(6))
+            paras.append(f"MADDE {p * 3 + a + 1} - BIL{100 + p}\n" + " ".join(sentences))
+        yield Document(page_content="\n\n".join(paras), metadata={"page": p, "source": "bench"})
+
+
+def _stats(samples_ms):
+    xs = sorted(samples_ms)
+    pick = lambda q: xs[min(len(xs) - 1, int(round(q * (len(xs) - 1))))]
+    return {
+        "n": len(xs),
+        "mean_ms": round(statistics.mean(xs), 3),
+        "p50_ms": round(pick(0.50), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+    }
+
+
+INGEST_DIR = os.path.join(_tmp, "chroma_ingest")
+
+
+def bench_ingest(pages):
+    directory = INGEST_DIR
+    counted = {"pages": 0}
+
+    def page_iter():
+        for p in _pages(pages):
+            counted["pages"] += 1
+            yield p
+
+    def chunk_iter():
+        for c in StructuredChunker().iter_chunks(page_iter()):
+            c.metadata["file_hash"] = "bench"
+            yield c
+
+    done = {"chunks": 0}
+    start = time.perf_counter()
+    vs = ingest.add_to_vector_store(
+        chunk_iter(), directory, document_id=1,
+        on_progress=lambda b, n, p: done.update(chunks=n),
+    )
+    elapsed = time.perf_counter() - start
+    return vs, {
+        "pages": counted["pages"],
+        "chunks": done["chunks"],
+        "seconds": round(elapsed, 3),
+        "pages_per_s": round(counted["pages"] / elapsed, 2),
+        "chunks_per_s": round(done["chunks"] / elapsed, 2),
+    }
+
+
+def _queries(n, pages, seed=5):
+    rng = random.Random(seed)
+    return [f"BIL{100 + rng.randrange(pages)} dersinin {rng.choice(WORDS)} kuralı nedir?" for _ in range(n)]
+
+
+def bench_retrieval(retr, queries):
+    lat = []
+    for q in queries:
+        start = time.perf_counter()
+        retr.invoke(q)
+        lat.append((time.perf_counter() - start) * 1000)
+    return _stats(lat)
+
+
+def _ask(cid, q):
+    for event in rag_service.iter_answer(cid, q):
+        if event["type"] == "done":
+            return event
+#Arayüzün kullandığı olay akışı; cevap ve mesajlar servis tarafından kaydedilir.
+
+
+def bench_answer(queries):
+    cid = _chat_id(INGEST_DIR)
+    lat, cached = [], 0
+    for q in queries:
+        start = time.perf_counter()
+        cached += _ask(cid, q)["cached"]
+        lat.append((time.perf_counter() - start) * 1000)
+    return {"cached": cached, **_stats(lat)}
+#Tekrarlanan sorular üretimde olduğu gibi cevap önbelleğinden gelir (cached: önbellekten dönen cevap sayısı).
+
+
+def _chat_id(directory=None):
+    with session_scope() as db:
+        user = User(username=f"bench{random.random()}", password_hash="x")
+        db.add(user)
+        db.flush()
+        chat = Chat(user_id=user.id, title="bench", vector_dir=directory)
+        db.add(chat)
+        db.flush()
+        if directory:
+            db.add(DocumentRow(chat_id=chat.id, file_name="bench.txt", file_path="uploaded_files/bench.txt",
+                               vector_dir=directory))
+        return chat.id
+#directory verilirse sohbet benchmark koleksiyonunu kullanır (belge kaydı cevap önbelleğinin anahtarını belirler).
+
+
+def bench_sqlite_writes(n):
+    cid = _chat_id()
+    lat = []
+    start = time.perf_counter()
+    for i in range(n):
+        t = time.perf_counter()
+        save_chat_to_db(f"question {i}", f"answer {i}", cid=cid)
+        lat.append((time.perf_counter() - t) * 1000)
+    elapsed = time.perf_counter() - start
+    return {"writes": n, "writes_per_s": round(n / elapsed, 2), **_stats(lat)}
+
+
+def load_test(users, duration, pages):
+    #Tarayıcı olmadan eşzamanlı kullanıcı: her kullanıcı kendi sohbetinde soru sorar (servis cevabı kaydeder).
+    lat, errors, lock = [], [0], threading.Lock()
+    stop = time.perf_counter() + duration
+
+    def user(u):
+        cid = _chat_id(INGEST_DIR)
+        rng = random.Random(u)
+        while time.perf_counter() < stop:
+            q = _queries(1, pages, seed=rng.random())[0]
+            t = time.perf_counter()
+            try:
+                _ask(cid, q)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                lat.append((time.perf_counter() - t) * 1000)
+
+    threads = [threading.Thread(target=user, args=(u,)) for u in range(users)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return {
+        "users": users,
+        "seconds": round(elapsed, 3),
+        "requests": len(lat),
+        "errors": errors[0],
+        "requests_per_s": round(len(lat) / elapsed, 2),
+        **(_stats(lat) if lat else {}),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=200)
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--writes", type=int, default=500)
+    ap.add_argument("--users", type=int, default=8)
+    ap.add_argument("--duration", type=float, default=10)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args(argv)
+
+    try:
+        database.init_db()
+        vs, ingest_res = bench_ingest(args.pages)
+        retr = rag_service.get_retriever(_chat_id(INGEST_DIR))
+        queries = _queries(args.queries, args.pages)
+        results = {
+            "meta": {
+                "provider": providers.MODEL_PROVIDER,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+                "args": vars(args),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "ingest": ingest_res,
+            "retrieval": bench_retrieval(retr, queries),
+            "answer": bench_answer(queries),
+            "sqlite_writes": bench_sqlite_writes(args.writes),
+            "load": load_test(args.users, args.duration, args.pages),
+        }
+    finally:
+        shutil.rmtree(_tmp, ignore_errors=True)
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
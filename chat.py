@@ -1,27 +1,35 @@
-import os, uuid, hashlib, shutil, time
-from datetime import datetime
+import os, time
 import streamlit as st
-#uuid benzersiz ID üretme, hashlib veri hash’leme (şifre gibi), shutil	kopyalama & silme gibi dosya işlemleri.
-
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain_chroma import Chroma
-from langchain.chains import create_retrieval_chain
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.chains.combine_documents import create_stuff_documents_chain
-#Langchain: Belgeyi bölme, vektörleştirme, ve LLM ile etkileşim kurma için.
-
-from database import get_db, Chat, Message, Feedback, Document
-#Veritabanı işlemleri için modeller ve bağlantı fonksiyonu.
-
 
-UPLOAD_DIR = "uploaded_files"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-#Belgelerin yükleneceği klasör. Yoksa oluşturur.
+from sqlalchemy import and_, or_
+from database import session_scope, Chat, Message, Feedback, Document
+#Veritabanı işlemleri için modeller ve bağlantı fonksiyonu.
+from embedding_cache import cache_stats
+#Aynı belge tekrar yüklendiğinde embedding'leri yeniden hesaplamamak için kalıcı önbellek.
+import answer_cache
+#Aynı belgeye tekrar sorulan sorular için anlamsal cevap önbelleği.
+import ingest, ingest_worker
+#Dosya kaydetme, sayfa sayfa okuma, chunk'lama ve grup grup embedding (arka plan iş kuyruğunda).
+import library, storage_gc, write_buffer
+#library: Aynı dosya tüm kullanıcılar için tek kez işlenir; sohbetler ortak indekse referansla bağlanır.
+#write_buffer: Mesaj ve geri bildirim yazmalarını toplu transaction'larda birleştirir.
+#Yüklenen dosyalar ve vektör klasörleri için referans sayımı (son referans gidince silinir).
+import rag_service, rag_client
+#RAG çekirdeği (soru yeniden yazma, hibrit arama, cevap, kayıt). RAG_API_URL tanımlıysa api.py servisine gider.
+import telemetry
+#Gecikme ölçümü (span'ler), token sayaçları ve mesaj başına hata ayıklama paneli.
+
+JOB_POLL_INTERVAL = 1.0
+#Arka planda işlenen belge varken arayüzün durumu yenileme aralığı (saniye).
+CHAT_PAGE_SIZE    = 30
+MESSAGE_PAGE_SIZE = 50
+MESSAGE_WINDOW    = 40
+#Kenar çubuğu ve mesaj geçmişi sayfa sayfa yüklenir; ekranda en fazla MESSAGE_WINDOW (ve katları) mesaj çizilir.
+#Böylece bir rerun'ın maliyeti geçmişin toplam boyutuna bağlı değildir.
 
 
 # --Chat Interface--
+@telemetry.traced("streamlit.rerun")
 def chat_interface():
     for k, v in [
         ("current_chat", None),
@@ -29,8 +37,11 @@ def chat_interface():
         ("editing_chat", None),
         ("show_comment_form", False),
         ("feedback_message_id", None),
-        ("chat_retrievers", {}),
         ("processed_file_id", None),
+        ("pending_jobs", {}),
+        ("chat_pages", 1),
+        ("message_window", MESSAGE_WINDOW),
+        ("read_cache", {}),
     ]:
         st.session_state.setdefault(k, v)
 
@@ -41,8 +52,11 @@ def chat_interface():
         editing_chat	        Kullanıcının başlığını düzenlediği sohbetin ID’si
         show_comment_form	    Geri bildirim formu gösterilsin mi? (True/False)
         feedback_message_id	    Geri bildirim verilecek mesajın ID’si
-        chat_retrievers	        Her sohbet için vektör tabanlı bilgi alma objesi (retriever)
-        processed_file_id	    İşlenmiş belgeyi tanımlamak için benzersiz anahtar (aynı dosya tekrar yüklenmesin diye)'''
+        processed_file_id	    İşlenmiş belgeyi tanımlamak için benzersiz anahtar (aynı dosya tekrar yüklenmesin diye)
+        pending_jobs	        Bu oturumda başlatılan arka plan belge işleme işleri {job_id: chat_id}
+        chat_pages	            Kenar çubuğunda yüklenmiş sohbet sayfası sayısı ("Load more")
+        message_window	        Ekranda çizilen son mesaj sayısı
+        read_cache	            Oturuma özel okuma önbelleği (sohbet listesi, mesaj geçmişi, belgeler, geri bildirimler)'''
     #setdefault():
     '''
     Eğer k oturum değişkenlerinde yoksa, ona v değerini atar.
@@ -57,8 +71,13 @@ def chat_interface():
         if st.button("+ New Chat"):
             _reset_chat_state()
 
-        for chat in load_previous_chats(st.session_state.user_id):
-            #Kullanıcının daha önce yaptığı tüm sohbetleri veritabanından alır ve döngüyle listeler.
+        chats, cursor = _cached(
+            ("chats", st.session_state.user_id, st.session_state.chat_pages),
+            lambda: _load_chat_pages(st.session_state.user_id, st.session_state.chat_pages),
+        )
+        #Sohbet listesi veritabanından sadece listeyi değiştiren bir işlemden sonra tekrar okunur; diğer rerun'lar önbellekten çizer.
+
+        for chat in chats:
 
             #Her sohbet satırı 3 parçaya ayrılır
             col1, col2, col3 = st.columns([3, 1, 1])
@@ -82,6 +101,10 @@ def chat_interface():
                         _reset_chat_state()
                     st.rerun()
 
+        if cursor is not None and st.button("Load more", key="more_chats"):
+            st.session_state.chat_pages += 1
+            st.rerun()
+
     # --Main--
     st.title("Chat with your document")
 
@@ -94,127 +117,290 @@ def chat_interface():
     )
 
     if file:
-        file_hash = hashlib.sha1(file.getvalue()).hexdigest()
-        file_key  = f"{file.name}_{file.size}_{file_hash}"
+        file_key = f"{file.name}_{file.size}_{file.file_id}"
         #Dosyanın Eşsiz Anahtarını Üret -- Aynı dosya tekrar tekrar işlenmesin.
+        #file_id Streamlit tarafından her yüklemeye verilir; her rerun'da içeriği yeniden hash'lemeye gerek kalmaz.
+
+        if st.session_state.processed_file_id != file_key:
+            if not st.session_state.current_chat:
+                st.session_state.current_chat = _create_empty_chat()
+                #Eğer henüz sohbet başlatılmadıysa, bir sohbet oluşturulur (belge kaydı bu sohbete bağlanır).
+
+            job_id = process_uploaded_file(file)
+            #Yüklenen belge diske kaydedilir; okuma, chunk'lama ve embedding arka plandaki işçide yapılır.
+            #Aynı dosya kütüphanede zaten varsa sohbet mevcut indekse bağlanır (iş id'si indeksi kuran iştir).
+            if job_id is not False:
+                if job_id:
+                    st.session_state.pending_jobs[job_id] = st.session_state.current_chat
+                _warm(st.session_state.current_chat)
+                st.session_state.processed_file_id = file_key
+                #İşlenen dosyanın anahtarı oturuma kaydedilir.
 
-        already_done = (
-            st.session_state.processed_file_id == file_key
-            and st.session_state.current_chat in st.session_state.chat_retrievers
+    if st.session_state.current_chat:
+        docs = _cached(
+            ("documents", st.session_state.current_chat),
+            lambda: load_chat_documents(st.session_state.current_chat),
         )
+        lib = _cached(("library", st.session_state.current_chat), lambda: _load_library(docs))
+        if docs:
+            with st.expander(f"📚 Documents in this chat ({len(docs)})"):
+                for d in docs:
+                    col1, col2, col3 = st.columns([4, 1, 1])
+                    col1.write(f"📄 {d.file_name}")
+                    if d.library_id in lib["owned"]:
+                        shared = col2.checkbox("Share", value=lib["owned"][d.library_id], key=f"share_{d.id}")
+                        if shared != lib["owned"][d.library_id] and library.set_shared(
+                            d.library_id, st.session_state.user_id, shared
+                        ):
+                            _invalidate("library")
+                            st.rerun()
+                    #Belgenin sahibi onu kütüphanede diğer kullanıcılarla paylaşabilir.
+                    if col3.button("🗑️", key=f"rm_doc_{d.id}") and remove_document(d.id):
+                        st.session_state.processed_file_id = None
+                        st.rerun()
+        if lib["visible"]:
+            with st.expander(f"📖 Library ({len(lib['visible'])})"):
+                choice = st.selectbox(
+                    "Add a document you or others have shared",
+                    lib["visible"], format_func=lambda l: l.file_name, key="library_choice",
+                )
+                if st.button("➕ Add to chat") and library.attach_by_id(
+                    st.session_state.current_chat, st.session_state.user_id, choice.id
+                ):
+                    _invalidate("documents", st.session_state.current_chat)
+                    _invalidate("library")
+                    _warm(st.session_state.current_chat)
+                    st.rerun()
+        #Kütüphanedeki hazır bir belge yükleme ve işleme olmadan, mevcut indeksine referansla sohbete eklenir.
+    #Sohbette birden fazla belge olabilir; soru sorulduğunda hepsinin içinde arama yapılır.
 
-        if not already_done:
-            with st.spinner("Processing document..."):
-                docs = process_uploaded_file(file)
-                #Yüklenen belgeyi oku, içeriği parçala (chunk'lara böl).
-                if docs:
-                    if not st.session_state.current_chat:
-                        st.session_state.current_chat = _create_empty_chat()
-                        #Eğer henüz sohbet başlatılmadıysa, bir sohbet oluşturulur.
-
-                    #Vektör Veritabanı Kurulumu
-                    retr = (
-                        setup_vector_store(docs, st.session_state.current_chat)
-                        .as_retriever(search_type="similarity", search_kwargs={"k": 10})
-                    )
-                    #Belgelerden embedding (vektör) çıkarılır.
-                    #Chroma veritabanı oluşturulur.
-                    #Bu veritabanı "retriever" haline getirilir (LLM’in belgeye dayalı cevap verebilmesi için).
-
-                    st.session_state.chat_retrievers[st.session_state.current_chat] = retr
-                    st.session_state.processed_file_id = file_key
-                    #Bu sohbete ait retriever saklanır.
-                    #İşlenen dosyanın anahtarı oturuma kaydedilir.
-                    st.success("Document processed successfully!")
+    polling = _job_status_ui()
+    #Arka plan işlerinin durumu gösterilir; iş bitince sohbetin retriever'ı diskteki yeni koleksiyondan açılır.
 
 #retriever, belgeler arasından soruya en uygun bilgileri seçen yapıdır.
 #chunk = Belgenin küçük parçalara bölünmüş hali. Bir belgeyi doğrudan LLM'e veremezsin çünkü çok uzun olabilir.
 
     # Geçmiş mesajlar
-    for i, m in enumerate(st.session_state.messages):
+    messages = st.session_state.messages
+    window = st.session_state.message_window
+    hist = _history(st.session_state.current_chat)
+    if (len(messages) > window or (hist and hist["cursor"] is not None)) and st.button("⬆️ Load earlier messages"):
+        st.session_state.message_window += MESSAGE_WINDOW
+        if st.session_state.message_window > len(messages) and hist and hist["cursor"] is not None:
+            _load_earlier_messages()
+        st.rerun()
+    #Uzun geçmişlerde sadece son `window` mesaj çizilir; daha eskiler istenince (gerekirse veritabanından) eklenir.
+
+    rated = _cached(
+        ("feedback", st.session_state.current_chat),
+        lambda: load_chat_feedback(st.session_state.current_chat),
+    ) if st.session_state.current_chat else {}
+    start = max(0, len(messages) - window)
+    for i, m in enumerate(messages[start:], start):
         #st.session_state.messages: Kullanıcının şu ana kadar gönderdiği ve aldığı tüm mesajları tutan bir liste.
         #enumerate() → Hem mesajın içeriğini (m), hem de dizideki sırasını (i) verir.
         with st.chat_message(m["role"]):
             #Her mesajı sohbet kutusunda gösterir.
             st.write(m["content"])
             #Mesaj balonunun içine mesaj içeriğini (content) yazdırır.
+            if m.get("trace"):
+                with st.expander("🔍 Debug"):
+                    st.table([
+                        {"span": name, "ms": round(ms, 1) if ms is not None else None, "tokens": n}
+                        for name, ms, n in m["trace"]
+                    ])
+                #DEBUG_PANEL=1 ise cevabın hangi aşamada ne kadar sürdüğü gösterilir.
             if m["role"] == "assistant" and "message_id" in m:
-                _feedback_ui(i, m["message_id"])
+                if m["message_id"] in rated:
+                    st.caption("👍 Doğru" if rated[m["message_id"]] else "👎 Yanlış")
+                else:
+                    _feedback_ui(i, m["message_id"])
+                #Geri bildirimi verilmiş mesajlarda buton satırı yerine sadece sonuç gösterilir.
                 #i: Bu mesajın kaçıncı sırada olduğunu belirtir (butonlar için key olarak kullanılır).
                 #m["message_id"]: Bu mesaja ait veritabanı ID'si, geri bildirimle ilişkilendirmek için kullanılır.
 
+    picked = _suggestions_ui() if not messages and st.session_state.current_chat else None
+    #Boş sohbette belgeden üretilmiş önerilen sorular gösterilir; cevapları önceden hesaplandığı için anında gelir.
+
     # Kullanıcı sorusu
-    if prompt := st.chat_input("What would you like to know?"):
+    if prompt := st.chat_input("What would you like to know?") or picked:
         #st.chat_input(...): Sayfanın altına bir sohbet kutusu yerleştirir.
 
         st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.write(prompt)
 
-        with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                retr = st.session_state.chat_retrievers.get(st.session_state.current_chat)
-            #Şu anki sohbet ID’sine ait retriever varsa onu alır.Yani: Hangi belge yüklüyse, onun vektör verisini bul.
-                answer = (
-                    _generate_answer(prompt, retr)
-                    if retr
-                    else "Please upload a document first."
-                )
-            st.write(answer)
-            mid = save_chat_to_db(prompt, answer)
-            #Kullanıcının sorusu ve asistanın cevabı veritabanına kaydedilir.
-            #mid → Asistan mesajına ait veritabanı ID’si (geri bildirimde kullanılacak).
+        with st.chat_message("assistant"), telemetry.trace() as spans:
+            if not st.session_state.current_chat:
+                st.session_state.current_chat = _create_empty_chat()
+            result = {}
+
+            def tokens():
+                for event in _backend().iter_answer(st.session_state.current_chat, prompt):
+                    if event["type"] == "token":
+                        yield event["text"]
+                    else:
+                        result[event["type"]] = event
+            #Olaylar: question (yeniden yazılmış soru), token (cevap parçası), done (kayıt bilgisi).
+
+            st.write_stream(tokens())
+            #Cevap token token ekrana yazılır. Retriever ilk soruda açılır ve süreç genelinde paylaşılır.
+            done = result["done"]
+            if "question" in result:
+                st.caption(f"🔎 {result['question']['question']}")
+            #Takip sorusu ("peki ikincisi?") geçmişe göre bağımsız bir soruya çevrildiyse arama bu soruyla yapılmıştır.
+            if done["cached"]:
+                st.caption("⚡ cached answer")
+            #Aynı belgeye daha önce benzer bir soru sorulduysa kayıtlı cevap gösterilir.
+            #Soru ve cevap servis tarafından kaydedilir; message_id geri bildirimde kullanılır.
             st.session_state.messages.append(
-                {"role": "assistant", "content": answer, "message_id": mid}
+                {"role": "assistant", "content": done["answer"], "message_id": done["message_id"],
+                 "trace": list(spans) if telemetry.DEBUG_PANEL else None}
             )
             st.rerun()
 
+    if polling:
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
+    #Belge arka planda işlenirken sayfa kısa aralıklarla yenilenir; kullanıcı bu sırada soru sorabilir veya sohbet değiştirebilir.
+
 # ───────────────────────── Helper Functions ───────────────────────
 def _reset_chat_state():
     st.session_state.current_chat      = None
     st.session_state.messages          = []
     st.session_state.editing_chat      = None
-    st.session_state.chat_retrievers   = {}
     st.session_state.processed_file_id = None
+    st.session_state.message_window    = MESSAGE_WINDOW
 
 def _load_chat(cid):
     _reset_chat_state()
     st.session_state.current_chat = cid
-    for m in load_chat_messages(cid):
-        st.session_state.messages.append(
-            {"role": m.role, "content": m.content, "message_id": m.id}
-        )
+    for job in ingest_worker.load_jobs(chat_id=cid):
+        st.session_state.pending_jobs[job.id] = cid
+    #Bu sohbet için hâlâ süren bir belge işleme işi varsa ilerlemesi takip edilir.
+    hist = _history(cid)
+    if hist is None:
+        page, cursor = load_chat_messages(cid)
+        hist = st.session_state.read_cache[("messages", cid)] = {
+            "items": [_as_message(m) for m in page], "cursor": cursor,
+        }
+    #Sohbet ilk açılışta sadece son MESSAGE_PAGE_SIZE mesajla yüklenir; tekrar açıldığında önbellekten gelir.
+    st.session_state.messages = hist["items"]
+    #Aynı liste nesnesi: yeni mesajlar hem ekrana hem önbelleğe eklenmiş olur.
+    _warm(cid)
     st.rerun()
 
-def _create_empty_chat():
-    db = get_db()
+def _load_earlier_messages():
+    hist = _history(st.session_state.current_chat)
+    page, hist["cursor"] = load_chat_messages(st.session_state.current_chat, before_id=hist["cursor"])
+    hist["items"][:0] = [_as_message(m) for m in page]
+    #Daha eski mesajlar listenin başına eklenir.
+
+def _as_message(m):
+    return {"role": m.role, "content": m.content, "message_id": m.id}
+
+def _history(cid):
+    return st.session_state.read_cache.get(("messages", cid)) if cid else None
+
+# --Session read cache--
+def _cached(key, loader):
+    cache = st.session_state.read_cache
+    if key not in cache:
+        cache[key] = loader()
+    return cache[key]
+#Anahtar: (tür, ...) → ("chats", uid, sayfa), ("messages", cid), ("documents", cid), ("feedback", cid), ("library", cid),
+#("suggestions", cid).
+
+def _invalidate(kind, cid=None):
+    cache = st.session_state.get("read_cache")
+    if cache is None:
+        return
+    #Streamlit oturumu dışında (benchmark / yük testi) önbellek yoktur.
+    for key in [k for k in cache if k[0] == kind and (cid is None or k[1] == cid)]:
+        del cache[key]
+#Veriyi değiştiren yardımcılar ilgili önbellek kayıtlarını açıkça siler; bir sonraki rerun veritabanından okur.
+
+def _load_library(docs):
+    return {
+        "visible": library.visible(st.session_state.user_id, exclude_chat=st.session_state.current_chat),
+        "owned": library.owned(st.session_state.user_id, [d.library_id for d in docs]),
+    }
+#Kütüphaneden eklenebilecek belgeler ve kullanıcının bu sohbetteki kendi belgelerinin paylaşım durumu.
+
+def _backend():
+    if rag_client.RAG_API_URL:
+        return rag_client.Client(st.session_state.session_token)
+    return rag_service
+#İki arka uç aynı arayüze sahiptir: iter_answer(cid, soru), add_document(cid, kullanıcı, dosya, ad), warm(cid), suggestions(cid).
+
+def _warm(cid):
+    _invalidate("suggestions", cid)
     try:
+        _backend().warm(cid)
+    except (OSError, RuntimeError):
+        pass
+    #Isıtma sadece hızlandırır: servis o an ulaşılamazsa sohbet normal şekilde açılır.
+#Sohbet açılınca / belge eklenince: depo, BM25, istemciler ve önerilen soruların cevapları arka planda hazırlanır.
+
+def _suggestions_ui():
+    cid = st.session_state.current_chat
+    questions = st.session_state.read_cache.get(("suggestions", cid))
+    if questions is None:
+        try:
+            questions = _backend().suggestions(cid)
+        except (OSError, RuntimeError):
+            questions = []
+        if questions:
+            st.session_state.read_cache[("suggestions", cid)] = questions
+    #Boş liste önbelleğe alınmaz: sorular arka planda üretilirken sonraki rerun'lar tekrar bakar.
+    for i, q in enumerate(questions):
+        if st.button(f"💡 {q}", key=f"suggest_{cid}_{i}"):
+            return q
+    return None
+
+def _job_status_ui():
+    #Bu oturumun bekleyen işlerini kontrol eder; en az biri sürüyorsa True döner (sayfa yenilemeye devam eder).
+    pending = st.session_state.pending_jobs
+    if not pending:
+        return False
+    active = False
+    for job in ingest_worker.load_jobs(ids=pending.keys(), active_only=False):
+        if job.status in ingest_worker.ACTIVE:
+            active = True
+            if pending[job.id] == st.session_state.current_chat:
+                st.progress(
+                    job.progress or 0.0,
+                    text=f"Processing {job.file_name}: {job.chunks_done or 0} chunks embedded",
+                )
+            continue
+        cid = pending.pop(job.id, None)
+        _invalidate("library")
+        if job.status == "done":
+            #Retriever, koleksiyonun sürümü değiştiği için bir sonraki soruda diskten yeniden açılır.
+            if cid == st.session_state.current_chat:
+                _warm(cid)
+            #Yeni indeks ilk sorudan önce açılır; önerilen sorular üretilip cevaplanır.
+            stats = cache_stats()
+            st.toast(
+                f"{job.file_name} processed successfully! "
+                f"(embedding cache: {stats['hits']} hits / {stats['misses']} misses)",
+                icon="✅",
+            )
+        else:
+            st.toast(f"{job.file_name} could not be processed: {job.error}", icon="⚠️")
+    return active
+
+@telemetry.traced("db.create_empty_chat")
+def _create_empty_chat():
+    with session_scope() as db:
         chat = Chat(user_id=st.session_state.user_id, title="Untitled chat")
         db.add(chat)
-        db.commit()
-        return chat.id
-    finally:
-        db.close()
-
-def _generate_answer(q, retr):
-    llm = ChatGoogleGenerativeAI(
-        model="models/gemini-2.5-flash-preview-04-17",
-        temperature=0.3,
-        max_tokens=500,
-        convert_system_message_to_human=True,
-    )
-    sys_prompt = (
-        "You are an assistant for question‑answering tasks. "
-        "Answer in at most three sentences using the provided context."
-    )
-    prompt = ChatPromptTemplate.from_messages(
-        [("system", sys_prompt), ("human", "Context: {context}\n\nQuestion: {input}")]
-    )
-    chain = create_retrieval_chain(retr, create_stuff_documents_chain(llm, prompt))
-    #LangChain zinciri kurulur
-    #Retriever → bağlamı bulur
-    #Prompt + LLM → cevabı üretir
-    return chain.invoke({"input": q})["answer"]
+        db.flush()
+        cid = chat.id
+    _invalidate("chats")
+    st.session_state.read_cache[("messages", cid)] = {"items": st.session_state.messages, "cursor": None}
+    #Yeni sohbetin (boş) geçmişi ekrandaki listeyle aynı nesne olarak önbelleğe alınır.
+    return cid
 
 def _feedback_ui(idx, mid):
     col1, col2, col3 = st.columns([1, 1, 3])
@@ -239,151 +425,160 @@ def _feedback_ui(idx, mid):
 
 
 # ───────────────────── DB Helpers ───────────────────────
-def save_chat_to_db(umsg, amsg):
-    db = get_db()
-    try:
+#Tüm yardımcılar session_scope kullanır: havuzdan bağlantı alınır, çıkışta commit/rollback yapılır ve bağlantı geri verilir.
+@telemetry.traced("db.save_chat_to_db")
+def save_chat_to_db(umsg, amsg, cid=None):
+    if cid is None:
         if not st.session_state.current_chat:
             st.session_state.current_chat = _create_empty_chat()
         cid = st.session_state.current_chat
-        db.add(Message(chat_id=cid, role="user", content=umsg))
-        assistant = Message(chat_id=cid, role="assistant", content=amsg)
-        db.add(assistant)
-        db.commit()
-        return assistant.id
-    finally:
-        db.close()
-
+    #cid verilirse oturum durumuna dokunulmaz (benchmark / yük testi Streamlit olmadan çağırabilir).
+    mid = write_buffer.add_messages(cid, [("user", umsg), ("assistant", amsg)]).result()[-1]
+    #Diğer oturumların yazmalarıyla aynı transaction'da (write_buffer) yazılır; id commit sonrası döner.
+    if cid != st.session_state.get("current_chat"):
+        _invalidate("messages", cid)
+    #Açık sohbetin geçmişine mesajları arayüz ekler (aynı liste önbellekte); başka bir sohbete yazıldıysa o geçmiş yeniden okunur.
+    return mid
+
+@telemetry.traced("db.save_feedback")
 def save_feedback(mid, ok, comment=None):
-    db = get_db()
-    try:
-        fb = db.query(Feedback).filter(Feedback.message_id == mid).first()
-        #Daha önce bu mesaja geri bildirim verildi mi kontrol
-        if fb:
-            fb.is_helpful = ok
-            fb.comment = comment or fb.comment
-            #Eğer geri bildirim varsa güncellenir
-        else:
-            db.add(Feedback(message_id=mid, is_helpful=ok, comment=comment))
-        db.commit()
-        return True
-    finally:
-        db.close()
+    write_buffer.add_feedback(mid, ok, comment)
+    #Beklenmez: geri bildirim arka planda toplu yazılır (varsa güncellenir, yoksa eklenir).
+    rated = st.session_state.get("read_cache", {}).get(("feedback", st.session_state.get("current_chat")))
+    if rated is not None:
+        rated[mid] = ok
+    #Önbellek yeniden okunmaz, yerinde güncellenir: yazma henüz diske inmemiş olsa da arayüz oyu hemen gösterir.
+    if not ok:
+        answer_cache.invalidate_message(mid)
+        #Yanlış olarak işaretlenen cevap önbellekten çıkarılır.
+    return True
 
+@telemetry.traced("db.delete_chat")
 def delete_chat(cid):
-    db = get_db()
-    try:
+    with session_scope() as db:
         # SQL verileri silinir
         db.query(Message).filter(Message.chat_id == cid).delete()
         docs = db.query(Document).filter(Document.chat_id == cid).all()
-        for d in docs:
-            try:
-                os.remove(d.file_path)
-            except FileNotFoundError:
-                pass
+        paths = {d.file_path for d in docs}
+        dirs = {d.vector_dir for d in docs} | {db.query(Chat.vector_dir).filter(Chat.id == cid).scalar()}
         db.query(Document).filter(Document.chat_id == cid).delete()
         db.query(Chat).filter(Chat.id == cid).delete()
-        db.commit()
-    finally:
-        db.close()
-
-    # Chroma klasörlerini temizle
-    for d in os.listdir("./chroma_db"):
-        if d.startswith(f"chat_{cid}_"):
-            shutil.rmtree(os.path.join("./chroma_db", d), ignore_errors=True)
-    st.session_state.chat_retrievers.pop(cid, None)
+
+    # Dosyalar referans sayımıyla temizlenir: başka sohbetin de kullandığı yükleme silinmez
+    for path in paths:
+        storage_gc.release_file(path)
+    if not ingest_worker.load_jobs(chat_id=cid):
+        for directory in dirs | {ingest.chat_vector_dir(cid)}:
+            storage_gc.release_vector_dir(cid, directory)
+    #Sohbete o an belge işleniyorsa klasör beklenmeden bırakılır; iş bitince arka plan temizliği (storage_gc) toplar.
+    _invalidate("chats")
+    for kind in ("messages", "documents", "feedback", "library", "suggestions"):
+        _invalidate(kind, cid)
+    return True
+
+@telemetry.traced("db.load_chat_documents")
+def load_chat_documents(cid):
+    with session_scope() as db:
+        return db.query(Document).filter(Document.chat_id == cid).order_by(Document.uploaded_at).all()
+
+@telemetry.traced("db.remove_document")
+def remove_document(doc_id):
+    with session_scope() as db:
+        doc = db.query(Document).filter(Document.id == doc_id).first()
+        if not doc:
+            return False
+        cid, path, directory, library_id = doc.chat_id, doc.file_path, doc.vector_dir, doc.library_id
+        db.delete(doc)
+    if directory and not library_id and os.path.isdir(directory):
+        with ingest_worker.chat_write_lock(cid, directory):
+            ingest.delete_document_vectors(ingest.open_vector_store(directory), doc_id)
+        #Koleksiyondan sadece bu belgenin vektörleri silinir; diğer belgeler yeniden işlenmez.
+        #Aynı koleksiyona o sırada yazan bir işçi (başka süreçte olsa da) bitene kadar beklenir.
+    storage_gc.release_file(path)
+    #Aynı dosya başka bir sohbette (veya bekleyen bir işte) kullanılıyorsa diskten silinmez.
+    #Kütüphane belgesinde sadece referans kalkar; indeks başka sohbetler için kalır (kimse kullanmıyorsa storage_gc toplar).
+    _invalidate("documents", cid)
+    _invalidate("library", cid)
+    _invalidate("suggestions", cid)
     return True
 
+@telemetry.traced("db.update_chat_title")
 def update_chat_title(cid, title):
-    db = get_db()
-    try:
+    with session_scope() as db:
         chat = db.query(Chat).filter(Chat.id == cid).first()
         if chat:
             chat.title = title
-            db.commit()
-            return True
-        return False
-    finally:
-        db.close()
-
-def load_previous_chats(uid):
-    db = get_db()
-    try:
-        return (
-            db.query(Chat)
-            .filter(Chat.user_id == uid)
-            .order_by(Chat.created_at.desc())
+    _invalidate("chats")
+    return chat is not None
+
+@telemetry.traced("db.load_previous_chats")
+def load_previous_chats(uid, before=None, limit=CHAT_PAGE_SIZE):
+    #Keyset sayfalama: before = önceki sayfanın son sohbetinin (created_at, id) değeri.
+    #Dönüş: (sohbetler, sonraki sayfanın imleci | daha fazla yoksa None).
+    with session_scope() as db:
+        q = db.query(Chat).filter(Chat.user_id == uid)
+        if before is not None:
+            created_at, cid = before
+            q = q.filter(or_(
+                Chat.created_at < created_at,
+                and_(Chat.created_at == created_at, Chat.id < cid),
+            ))
+        rows = q.order_by(Chat.created_at.desc(), Chat.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1].created_at, rows[-1].id)
+
+def _load_chat_pages(uid, pages):
+    chats, cursor = [], None
+    for _ in range(pages):
+        page, cursor = load_previous_chats(uid, before=cursor)
+        chats.extend(page)
+        if cursor is None:
+            break
+    return chats, cursor
+#Kullanıcının sohbetleri en yeniden başlayarak sayfa sayfa alınır (her sayfa indeksten okunur).
+
+@telemetry.traced("db.load_chat_feedback")
+def load_chat_feedback(cid):
+    with session_scope() as db:
+        rows = (
+            db.query(Feedback.message_id, Feedback.is_helpful)
+            .join(Message, Message.id == Feedback.message_id)
+            .filter(Message.chat_id == cid)
             .all()
         )
-    finally:
-        db.close()
-
-def load_chat_messages(cid):
-    db = get_db()
-    try:
-        return db.query(Message).filter(Message.chat_id == cid).order_by(
-            Message.created_at
-        ).all()
-    finally:
-        db.close()
+    return {mid: ok for mid, ok in rows}
+#{mesaj id: doğru mu} → tek sorguda sohbetin tüm geri bildirimleri.
+
+@telemetry.traced("db.load_chat_messages")
+def load_chat_messages(cid, before_id=None, limit=MESSAGE_PAGE_SIZE):
+    #Keyset sayfalama: before_id'den daha eski son `limit` mesaj, eskiden yeniye sıralı döner.
+    #Dönüş: (mesajlar, daha eski mesajlar için imleç | yoksa None).
+    with session_scope() as db:
+        q = db.query(Message).filter(Message.chat_id == cid)
+        if before_id is not None:
+            q = q.filter(Message.id < before_id)
+        rows = q.order_by(Message.id.desc()).limit(limit + 1).all()
+    more = len(rows) > limit
+    rows = rows[:limit][::-1]
+    return rows, (rows[0].id if more else None)
 
 # ───────────────────── File → Vector store ────────────────────
+@telemetry.traced("process_uploaded_file")
 def process_uploaded_file(file):
     if file.size > 200 * 1024 * 1024:
-        st.error("Max 200 MB."); return None
-
-    ext = os.path.splitext(file.name)[1].lower()
-    #Dosyanın uzantısı alınır (.pdf, .docx, .txt gibi)
-    file_hash = hashlib.sha1(file.getvalue()).hexdigest()
-    #Dosyanın içeriğinden SHA1 hash üretilir → eşsiz kimlik
-    permanent_path = os.path.join(UPLOAD_DIR, f"{file_hash}{ext}")
-    #Kalıcı dosya yolu oluşturulur
-
-    if not os.path.exists(permanent_path):
-        with open(permanent_path, "wb") as f:
-            f.write(file.getvalue())
-            #Aynı dosya daha önce yüklenmediyse, diske yazılır.
-
-    if st.session_state.current_chat:
-        db = get_db()
-        try:
-            if not db.query(Document).filter(
-                Document.chat_id == st.session_state.current_chat,
-                Document.file_path == permanent_path
-                #Aynı belge daha önce eklenmiş mi kontrol edilir.
-            ).first():
-                db.add(Document(
-                    chat_id=st.session_state.current_chat,
-                    file_name=file.name,
-                    file_path=permanent_path,
-                    #Eklenmemişse belge bilgisi veritabanına kaydedilir.
-                ))
-                db.commit()
-        finally:
-            db.close()
-
-    loader = (
-        PyPDFLoader(permanent_path) if ext == ".pdf"
-        else Docx2txtLoader(permanent_path) if ext == ".docx"
-        else TextLoader(permanent_path, encoding="utf-8") if ext == ".txt"
-        else None
-        #Dosya uzantısına göre uygun Loader seç
-    )
-    if loader is None:
-        st.error("Unsupported format"); return None
-
-    docs = loader.load()
-    return RecursiveCharacterTextSplitter(chunk_size=1000).split_documents(docs)
-    #Metin, 1000 karakterlik parçalara (chunk) bölünür ve döndürülür.
-
-
-#Bu fonksiyon, yukarıda parçalanmış belgelerden bir vektör veri tabanı (vector store) oluşturur.Retriever sistemi için hazırlanır.
-def setup_vector_store(docs, cid):
-    directory = f"./chroma_db/chat_{cid}_{uuid.uuid4().hex[:8]}"
-    os.makedirs(directory, exist_ok=True)
-    #Her sohbete özel klasör açılır (benzersiz UUID ile)
-    emb = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    #Her chunk için embedding (vektör) üretmek üzere Gemini embedding modeli çağrılır.
-    return Chroma.from_documents(docs, emb, persist_directory=directory)
-#Tüm belge parçaları embedding'e dönüştürülür.
-#Bu embedding’ler Chroma’ya kaydedilir.
-#Geriye bir Chroma nesnesi döner (retriever gibi kullanılacak).
\ No newline at end of file
+        st.error("Max 200 MB."); return False
+
+    if ingest.loader_for(file.name) is None:
+        st.error("Unsupported format"); return False
+    #Dosya uzantısına göre uygun Loader seçilebiliyor mu kontrol edilir.
+
+    job_id = _backend().add_document(st.session_state.current_chat, st.session_state.user_id, file, file.name)
+    #Dosyanın içeriğinden SHA1 hash üretilir → eşsiz kimlik. Hash ve diske yazma tek geçişte, 1 MB'lık parçalarla yapılır.
+    #Aynı dosya daha önce yüklendiyse tekrar yazılmaz; sohbete daha önce eklenmemişse belge kaydı oluşturulur.
+    _invalidate("documents", st.session_state.current_chat)
+    _invalidate("library", st.session_state.current_chat)
+    return job_id
+    #Hata varsa False; dosya kütüphanede zaten işlenmişse kuran işin id'si (veya None) döner.
+    #Metin burada okunmaz; ingest_worker sayfaları tek tek okuyup chunk'lara böler ve vektör veritabanını kurar.
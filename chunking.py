@@ -0,0 +1,189 @@
+import os, re, math, hashlib
+from collections import Counter, deque
+from typing import Iterable, Iterator, List, Tuple
+
+from langchain_core.documents import Document
+#Yapıya duyarlı, token tabanlı chunk'lama: sayfa ve başlık sınırlarını aşmaz, cümleleri ve tabloları bölmez,
+#tekrarlayan üst/alt bilgi (header/footer) satırlarını ve birebir aynı chunk'ları embedding'den önce ayıklar.
+
+
+CHUNK_TOKENS         = int(os.getenv("CHUNK_TOKENS", 300))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 40))
+BOILERPLATE_MIN_PAGES = 2
+#Bir sayfanın ilk/son iki satırı en az bu kadar başka sayfada da aynıysa üst/alt bilgi sayılır. Sayfalar bu kadar
+#sayfa ileriden okunur: ilk sayfaların üst/alt bilgileri de sonraki sayfalarla karşılaştırılıp ayıklanır.
+
+
+# --Tokens--
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+def count_tokens(text: str) -> int:
+    #Yaklaşık token sayısı: her kelime/noktalama en az 1 token, uzun (eklemeli Türkçe) kelimeler ~4 karakterde 1 token.
+    return sum(max(1, math.ceil(len(t) / 4)) for t in _TOKEN_RE.findall(text))
+
+
+# --Structure--
+_HEADING_RE = re.compile(
+    r"^\s*(?:#{1,6}\s+\S.*"                                   # Markdown başlığı
+    r"|(?:MADDE|Madde|BÖLÜM|Bölüm|KISIM|Kısım)\s+\d+.*"       # Yönetmelik maddeleri / bölümler
+    r"|\d+(?:\.\d+)*\.?\s+[A-ZÇĞİÖŞÜ].{0,80}"                 # 1. Giriş, 2.3 Yöntem
+    r"|(?=[^A-ZÇĞİÖŞÜ]*[A-ZÇĞİÖŞÜ])[A-ZÇĞİÖŞÜ0-9][A-ZÇĞİÖŞÜ0-9 ,:;()\-/]{2,80})\s*$"   # TAMAMI BÜYÜK HARF KISA SATIR
+)
+#Büyük harf satırında en az bir harf aranır: sadece rakamdan oluşan satırlar ("2024", sayfa numarası) başlık değildir.
+_TABLE_LINE_RE = re.compile(r"\t|\|| {2,}\S")
+_SENTENCE_RE = re.compile(r".*?(?:[.!?…]+(?=\s|$)|\n|$)", re.S)
+#Cümle sonu: noktalama + boşluk. "3.5" veya "BIL.304" gibi boşluksuz noktalar cümleyi bölmez.
+
+
+def _lines(text: str) -> Iterator[Tuple[int, int]]:
+    start = 0
+    for line in text.splitlines(keepends=True):
+        yield start, start + len(line.rstrip("\r\n"))
+        start += len(line)
+
+
+def _is_heading(line: str) -> bool:
+    line = line.strip()
+    return 0 < len(line) <= 100 and not _TABLE_LINE_RE.search(line) and bool(_HEADING_RE.match(line))
+#Tablo satırları ("BIL304   4") büyük harfli olsa da başlık sayılmaz.
+
+
+def _sections(text: str) -> Iterator[Tuple[str, int, int]]:
+    #(başlık, başlangıç, bitiş) → başlık satırları yeni bir bölüm başlatır; chunk'lar bölüm sınırını aşmaz.
+    heading, start = "", 0
+    for s, e in _lines(text):
+        if _is_heading(text[s:e]) and text[start:s].strip():
+            yield heading, start, s
+            start = s
+        if _is_heading(text[s:e]):
+            heading = text[s:e].strip().lstrip("#").strip()
+    if text[start:].strip():
+        yield heading, start, len(text)
+
+
+def _units(text: str, start: int, end: int) -> Iterator[Tuple[int, int]]:
+    #Bölünmez birimler: tablo blokları bütün olarak, düz paragraflar cümle cümle.
+    for para in re.finditer(r"(?:[^\n]*\S[^\n]*(?:\n|$))+", text[start:end]):
+        ps, pe = start + para.start(), start + para.end()
+        lines = [l for l in text[ps:pe].splitlines() if l.strip()]
+        if len(lines) >= 2 and sum(bool(_TABLE_LINE_RE.search(l)) for l in lines) >= len(lines) / 2:
+            yield ps, pe
+            continue
+        for m in _SENTENCE_RE.finditer(text[ps:pe]):
+            if m.group().strip():
+                yield ps + m.start(), ps + m.end()
+
+
+def _split_long(text: str, start: int, end: int, max_tokens: int) -> Iterator[Tuple[int, int]]:
+    #Bütçeden uzun tek bir cümle/tablo kelime sınırlarından bölünür.
+    cur, used = start, 0
+    for m in re.finditer(r"\S+\s*", text[start:end]):
+        n = count_tokens(m.group())
+        if used and used + n > max_tokens:
+            yield cur, start + m.start()
+            cur, used = start + m.start(), 0
+        used += n
+    if cur < end:
+        yield cur, end
+
+
+# --Chunker--
+class StructuredChunker:
+    def __init__(self, chunk_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+        self.chunk_tokens, self.overlap_tokens = chunk_tokens, overlap_tokens
+        self._edge_lines = Counter()
+        self._seen = set()
+        self._index = 0
+        self.skipped_duplicates = 0
+        #Tek bir belge için kullanılır: üst/alt bilgi ve tekrar tespiti belge boyunca (sayfa sayfa) birikir.
+
+    def _edges(self, text: str) -> List[Tuple[int, int, str]]:
+        spans = [(s, e) for s, e in _lines(text) if text[s:e].strip()]
+        edges = [(s, e, False) for s, e in spans[:2]] + [(s, e, True) for s, e in spans[-2:]]
+        out = []
+        for s, e, footer in edges:
+            key = text[s:e].strip().lower()
+            if footer:
+                key = re.sub(r"\d+", "#", key)
+            #Alt bilgide rakamlar yok sayılır ("Sayfa 3" = "Sayfa 4"); üst bilgide birebir eşleşme aranır (MADDE 3 ≠ MADDE 4).
+            out.append((s, e, key))
+        return out
+
+    def _count_edges(self, edges):
+        self._edge_lines.update({key for _, _, key in edges})
+
+    def _strip_boilerplate(self, text: str, edges) -> str:
+        chars = list(text)
+        for s, e, key in edges:
+            if len(key) <= 100 and self._edge_lines[key] > BOILERPLATE_MIN_PAGES:
+                chars[s:e] = " " * (e - s)
+        #Satır silinmez, boşlukla doldurulur → chunk ofsetleri orijinal sayfa metnine göre doğru kalır.
+        return "".join(chars)
+    #Sayaç sayfanın kendisini de içerir: satır en az BOILERPLATE_MIN_PAGES + 1 sayfada görülmüşse ayıklanır.
+
+    def _emit(self, text, spans, page_meta, heading):
+        s, e = spans[0][0], spans[-1][1]
+        content = text[s:e].strip()
+        digest = hashlib.sha1(" ".join(content.lower().split()).encode()).hexdigest()
+        if not content or digest in self._seen:
+            self.skipped_duplicates += bool(content)
+            return None
+        self._seen.add(digest)
+        meta = {
+            **page_meta,
+            "heading": heading,
+            "start_offset": s,
+            "end_offset": e,
+            "token_count": count_tokens(content),
+            "chunk_index": self._index,
+        }
+        self._index += 1
+        return Document(page_content=content, metadata=meta)
+
+    def split_page(self, page: Document) -> List[Document]:
+        edges = self._edges(page.page_content)
+        self._count_edges(edges)
+        return self._split(page, edges)
+
+    def _split(self, page: Document, edges) -> List[Document]:
+        text = self._strip_boilerplate(page.page_content, edges)
+        meta = {k: v for k, v in page.metadata.items() if v is not None}
+        out = []
+        for heading, s0, e0 in _sections(text):
+            spans, used = [], 0
+            for us, ue in _units(text, s0, e0):
+                n = count_tokens(text[us:ue])
+                pieces = [(us, ue)] if n <= self.chunk_tokens else list(
+                    _split_long(text, us, ue, self.chunk_tokens)
+                )
+                for ps, pe in pieces:
+                    n = count_tokens(text[ps:pe])
+                    if spans and used + n > self.chunk_tokens:
+                        out.append(self._emit(text, spans, meta, heading))
+                        carry, carried = [], 0
+                        for cs, ce in reversed(spans):
+                            cn = count_tokens(text[cs:ce])
+                            if carried + cn > self.overlap_tokens:
+                                break
+                            carry.insert(0, (cs, ce))
+                            carried += cn
+                        spans, used = carry, carried
+                        #Bir önceki chunk'ın son cümleleri (overlap bütçesi kadar) bir sonrakine taşınır.
+                    spans.append((ps, pe))
+                    used += n
+            if spans:
+                out.append(self._emit(text, spans, meta, heading))
+        return [c for c in out if c is not None]
+
+    def iter_chunks(self, pages: Iterable[Document]) -> Iterator[Document]:
+        ahead = deque()
+        for page in pages:
+            edges = self._edges(page.page_content)
+            self._count_edges(edges)
+            ahead.append((page, edges))
+            if len(ahead) > BOILERPLATE_MIN_PAGES:
+                yield from self._split(*ahead.popleft())
+        while ahead:
+            yield from self._split(*ahead.popleft())
+    #Bir sayfa, kendisinden sonraki BOILERPLATE_MIN_PAGES sayfa okunduktan sonra bölünür (bellekte en fazla 3 sayfa):
+    #üst/alt bilgi 1. ve 2. sayfada da tanınır.
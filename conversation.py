@@ -0,0 +1,168 @@
+import os, re, threading, traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from database import session_scope, Chat, Message
+from chunking import count_tokens
+from providers import get_llm, rewrites_questions
+import telemetry
+#Sohbet bağlamı: takip soruları önceki konuşmaya göre bağımsız bir soruya çevrilir (query rewriting),
+#eski mesajlar Chat satırındaki kısa bir özete katlanır. Prompt'a giren geçmiş, sohbet ne kadar uzarsa uzasın sınırlıdır.
+
+
+HISTORY_TOKEN_CAP = int(os.getenv("HISTORY_TOKEN_CAP", 400))
+SUMMARY_TOKEN_CAP = int(os.getenv("SUMMARY_TOKEN_CAP", 250))
+RECENT_MESSAGES   = int(os.getenv("HISTORY_RECENT_MESSAGES", 4))
+FOLD_MAX_MESSAGES = 20
+FOLD_MIN_MESSAGES = int(os.getenv("HISTORY_FOLD_MIN_MESSAGES", 6))
+#HISTORY_TOKEN_CAP: Bir istekte prompt'a eklenen geçmişin (özet + son mesajlar) kesin üst sınırı.
+#RECENT_MESSAGES: Özetlenmeden olduğu gibi tutulan son mesaj sayısı; daha eskileri özete katlanır.
+#FOLD_MAX_MESSAGES: Tek seferde özete katlanan en fazla mesaj (özeti olmayan eski, uzun sohbetlerde).
+#FOLD_MIN_MESSAGES: Son mesajların dışında en az bu kadar özetlenmemiş mesaj birikince özet güncellenir (her turda değil:
+#varsayılanla üç soruda bir özet çağrısı). Bu arada biriken mesajlar prompt'a olduğu gibi girer (HISTORY_TOKEN_CAP içinde).
+
+REWRITE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "Rewrite the user's follow-up question as a single standalone question that can be understood "
+     "without the conversation. Keep the user's language. Return only the question."),
+    ("human", "Conversation:\n{history}\n\nFollow-up question: {input}"),
+])
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You maintain a running summary of a conversation about documents. Merge the new messages into "
+     "the summary. Keep names, numbers and topics the user may refer back to. At most {limit} words."),
+    ("human", "Current summary:\n{summary}\n\nNew messages:\n{messages}"),
+])
+
+_lock = threading.Lock()
+_chains = {}
+_summarizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+#Özet güncellemesi cevabı bekletmez; tek bir arka plan thread'i tüm sohbetleri sırayla işler (aynı sohbet iki kez katlanmaz).
+
+
+# --Tokens--
+def truncate_tokens(text: str, limit: int, keep="head") -> str:
+    if count_tokens(text) <= limit:
+        return text
+    pieces = re.findall(r"\S+\s*", text)
+    if keep == "tail":
+        pieces = pieces[::-1]
+    kept, used = [], 0
+    for piece in pieces:
+        used += count_tokens(piece)
+        if used > limit:
+            break
+        kept.append(piece)
+    if keep == "tail":
+        kept = kept[::-1]
+    return "".join(kept).strip()
+#Kelime sınırından kırpar, satır sonlarını korur. keep="tail": metnin sonu korunur (son mesajların en yeni kısmı).
+
+
+def _format(messages) -> str:
+    return "\n".join(f"{'User' if m.role == 'user' else 'Assistant'}: {m.content}" for m in messages)
+
+
+# --History--
+def load_history(cid):
+    #(özet, özetlenmemiş son mesajlar) → en fazla RECENT_MESSAGES + FOLD_MAX_MESSAGES satır okunur.
+    with session_scope() as db:
+        chat = db.query(Chat).filter(Chat.id == cid).first()
+        if chat is None:
+            return "", []
+        rows = (
+            db.query(Message)
+            .filter(Message.chat_id == cid, Message.id > (chat.summary_upto or 0))
+            .order_by(Message.id.desc())
+            .limit(RECENT_MESSAGES + FOLD_MAX_MESSAGES)
+            .all()
+        )
+        return chat.summary or "", rows[::-1]
+
+
+def build_history(summary, messages, cap=HISTORY_TOKEN_CAP) -> str:
+    recent = _format(messages[-(RECENT_MESSAGES + FOLD_MIN_MESSAGES):]) if messages and RECENT_MESSAGES else ""
+    budget = min(SUMMARY_TOKEN_CAP, cap // 2 if recent else cap) - count_tokens("Summary:")
+    summary = truncate_tokens(summary, max(0, budget))
+    head = f"Summary: {summary}\n" if summary else ""
+    #Özet (etiketiyle birlikte) bütçenin en fazla yarısını kullanır; kalan bütçe son mesajlarındır (en yeni kısım korunur).
+    recent = truncate_tokens(recent, max(0, cap - count_tokens(head)), keep="tail")
+    return (head + recent).strip()
+#Dönen metin hiçbir zaman cap token'ı aşmaz.
+
+
+def history_for_chat(cid, cap=HISTORY_TOKEN_CAP) -> str:
+    if not cid:
+        return ""
+    return build_history(*load_history(cid), cap=cap)
+
+
+# --Chains--
+def _chain(name, prompt, llm):
+    with _lock:
+        chain = _chains.get((name, id(llm)))
+        if chain is None:
+            chain = _chains[(name, id(llm))] = (llm, prompt | llm | StrOutputParser())
+        return chain[1]
+
+
+def rewrite_question(question, history, llm=None) -> str:
+    if not history or not (llm or rewrites_questions()):
+        return question
+    #İlk soruda (geçmiş yokken) ek LLM çağrısı yapılmaz; sahte sağlayıcıda soru yeniden yazılmaz.
+    llm = llm or get_llm(temperature=0.0, max_tokens=100)
+    with telemetry.span("rewrite"):
+        rewritten = _chain("rewrite", REWRITE_PROMPT, llm).invoke({"history": history, "input": question})
+    return " ".join(rewritten.split()) or question
+
+
+async def arewrite_question(question, history, llm=None) -> str:
+    if not history or not (llm or rewrites_questions()):
+        return question
+    llm = llm or get_llm(temperature=0.0, max_tokens=100)
+    with telemetry.span("rewrite"):
+        rewritten = await _chain("rewrite", REWRITE_PROMPT, llm).ainvoke({"history": history, "input": question})
+    return " ".join(rewritten.split()) or question
+#Asenkron servis (rag_service / api.py) için: LLM beklenirken olay döngüsü diğer istekleri işler.
+
+
+def summarize(summary, messages, llm=None) -> str:
+    llm = llm or get_llm(temperature=0.0, max_tokens=SUMMARY_TOKEN_CAP * 2)
+    text = "\n".join(truncate_tokens(line, 200) for line in _format(messages).splitlines())
+    with telemetry.span("summary"):
+        new = _chain("summary", SUMMARY_PROMPT, llm).invoke({
+            "summary": summary or "(empty)",
+            "messages": text,
+            "limit": SUMMARY_TOKEN_CAP // 2,
+        })
+    return truncate_tokens(re.sub(r"\s+", " ", new).strip(), SUMMARY_TOKEN_CAP)
+#Özet, model sınırı aşsa bile SUMMARY_TOKEN_CAP token'a kırpılarak saklanır.
+
+
+# --Rolling summary--
+def fold_history(cid, llm=None):
+    summary, messages = load_history(cid)
+    old = messages[:-RECENT_MESSAGES] if RECENT_MESSAGES else messages
+    if not old or len(old) < FOLD_MIN_MESSAGES:
+        return False
+    new = summarize(summary, old, llm)
+    with session_scope() as db:
+        db.query(Chat).filter(Chat.id == cid).update(
+            {Chat.summary: new, Chat.summary_upto: old[-1].id}
+        )
+    return True
+#Son RECENT_MESSAGES dışındaki mesajlar FOLD_MIN_MESSAGES'a ulaşınca özete eklenir ve summary_upto ilerletilir
+#(artımlı güncelleme). Eşiğin altında LLM çağrılmaz; sadece tek bir indeksli okuma yapılır.
+#RECENT_MESSAGES=0: tüm özetlenmemiş mesajlar katlanır (messages[:-0] boş liste olurdu).
+
+
+def schedule_fold(cid):
+    def run():
+        try:
+            fold_history(cid)
+        except Exception:
+            traceback.print_exc()
+            #Özet güncellenemezse sohbet etkilenmez; bir sonraki turda tekrar denenir.
+    _summarizer.submit(run)
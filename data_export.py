@@ -0,0 +1,227 @@
+#Kullanım:
+#  python -m data_export export OUT_DIR [--format jsonl|parquet] [--tables users chats ...] [--include-password-hashes]
+#  python -m data_export import IN_DIR
+#Kullanıcılar, sohbetler, kütüphane kayıtları, belge referansları (dosyaların kendisi değil), mesajlar ve geri
+#bildirimler tablo başına bir dosyaya yazılır: <tablo>.jsonl.gz veya <tablo>.parquet. Satırlar id sırasıyla sayfa sayfa
+#(keyset) okunur/yazılır; bellek kullanımı tablo boyutundan bağımsızdır (milyonlarca satır).
+#Bütün tablolar tek bir okuma transaction'ında okunur: dışa aktarma sırasında gelen yazmalar dosyalara karışmaz
+#(ör. sohbeti dosyada olmayan mesajlar), çıktı tutarlı bir anlık görüntüdür.
+#Şifre hash'leri varsayılan olarak dışa aktarılmaz (--include-password-hashes ile açıkça istenmeli).
+#İçe aktarma sadece boş bir veritabanına yapılır: id'ler korunur, tablolar arası referanslar olduğu gibi geçerli kalır.
+import argparse, gzip, json, os, sys, time
+from datetime import datetime
+
+from sqlalchemy import DateTime, create_engine, event, select
+from sqlalchemy.pool import NullPool
+
+from database import init_db, _sqlite_autocommit, User, Chat, Message, Feedback, Document, LibraryDocument
+
+
+PAGE = int(os.getenv("EXPORT_PAGE_SIZE", 10_000))
+TABLES = {
+    "users": User.__table__,
+    "chats": Chat.__table__,
+    "library_documents": LibraryDocument.__table__,
+    "documents": Document.__table__,
+    "messages": Message.__table__,
+    "feedback": Feedback.__table__,
+}
+#Sıra önemlidir: içe aktarmada üst kayıtlar (kullanıcı, sohbet, kütüphane) alt kayıtlardan (belge, mesaj, geri
+#bildirim) önce yazılır. Oturumlar, işler ve önbellekler dışa aktarılmaz (yeniden oluşturulabilir/geçici veriler).
+SECRET_COLUMNS = {"users": {"password_hash": "!"}}
+#Sadece include_password_hashes=True ile yazılan sütunlar ve içe aktarmada eksiklerse konan değer: "!" geçerli bir
+#bcrypt hash'i değildir, hiçbir şifreyle eşleşmez; bu kullanıcılar şifre sıfırlanana kadar giriş yapamaz.
+
+
+def _columns(name, include_password_hashes=False):
+    hidden = () if include_password_hashes else SECRET_COLUMNS.get(name, ())
+    return [c for c in TABLES[name].columns if c.name not in hidden]
+
+
+def _pages(conn, table, columns):
+    last = 0
+    while True:
+        rows = conn.execute(
+            select(*columns).where(table.c.id > last).order_by(table.c.id).limit(PAGE)
+        ).mappings().all()
+        if not rows:
+            return
+        yield [dict(r) for r in rows]
+        last = rows[-1]["id"]
+#OFFSET yerine "id > son id": her sayfa birincil anahtar üzerinden doğrudan bulunur, sayfa ilerledikçe yavaşlamaz.
+
+
+# --Writers--
+def _json_default(v):
+    if isinstance(v, datetime):
+        return v.isoformat()
+    raise TypeError(type(v).__name__)
+
+
+class _JsonlWriter:
+    ext = ".jsonl.gz"
+
+    def __init__(self, path, columns):
+        self.f = gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+
+    def write(self, rows):
+        for r in rows:
+            self.f.write(json.dumps(r, ensure_ascii=False, default=_json_default) + "\n")
+
+    def close(self):
+        self.f.close()
+
+
+class _ParquetWriter:
+    ext = ".parquet"
+
+    def __init__(self, path, columns):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet export requires pyarrow (pip install pyarrow); use --format jsonl instead.")
+        self.pa = pa
+        self.schema = pa.schema([(c.name, self._type(pa, c)) for c in columns])
+        self.w = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    @staticmethod
+    def _type(pa, column):
+        py = column.type.python_type
+        return (
+            pa.int64() if py is int
+            else pa.bool_() if py is bool
+            else pa.float64() if py is float
+            else pa.timestamp("us") if isinstance(column.type, DateTime)
+            else pa.string()
+        )
+
+    def write(self, rows):
+        self.w.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+        #Her sayfa ayrı bir row group: dosya sütun bazında ve parça parça okunabilir.
+
+    def close(self):
+        self.w.close()
+
+
+WRITERS = {"jsonl": _JsonlWriter, "parquet": _ParquetWriter}
+
+
+def _begin_deferred(conn):
+    conn.exec_driver_sql("BEGIN")
+
+
+def _snapshot_engine(engine):
+    if engine.dialect.name != "sqlite":
+        return engine.execution_options(isolation_level="REPEATABLE READ")
+    snap = create_engine(engine.url, poolclass=NullPool, connect_args={"timeout": 30})
+    event.listen(snap, "connect", _sqlite_autocommit)
+    event.listen(snap, "begin", _begin_deferred)
+    return snap
+#pysqlite SELECT için BEGIN göndermez: her sorgu ayrı bir anlık görüntü görürdü. _migration_engine'deki tarif gibi
+#sürücünün transaction yönetimi kapatılır ve açık BEGIN gönderilir (IMMEDIATE değil: yazma kilidi alınmaz, WAL'da
+#yazarlar dışa aktarma boyunca beklemez). İlk SELECT'te alınan anlık görüntü transaction bitene kadar korunur.
+
+
+def export(out_dir, fmt="jsonl", tables=None, include_password_hashes=False):
+    os.makedirs(out_dir, exist_ok=True)
+    engine = _snapshot_engine(init_db())
+    counts = {}
+    with engine.connect() as conn, conn.begin():
+        for name in tables or TABLES:
+            table, writer_cls = TABLES[name], WRITERS[fmt]
+            columns = _columns(name, include_password_hashes)
+            path = os.path.join(out_dir, name + writer_cls.ext)
+            writer = writer_cls(f"{path}.part", columns)
+            n = 0
+            for rows in _pages(conn, table, columns):
+                writer.write(rows)
+                n += len(rows)
+            writer.close()
+            os.replace(f"{path}.part", path)
+            #Yarım kalan dışa aktarma tam dosya gibi görünmez.
+            counts[name] = n
+    return counts
+
+
+# --Readers--
+def _read_jsonl(path, table):
+    dates = [c.name for c in table.columns if isinstance(c.type, DateTime)]
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        batch = []
+        for line in f:
+            row = json.loads(line)
+            for c in dates:
+                if row.get(c):
+                    row[c] = datetime.fromisoformat(row[c])
+            batch.append(row)
+            if len(batch) >= PAGE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _read_parquet(path, table):
+    import pyarrow.parquet as pq
+    for rb in pq.ParquetFile(path).iter_batches(batch_size=PAGE):
+        yield rb.to_pylist()
+
+
+def _non_empty(engine):
+    with engine.connect() as conn:
+        return [name for name, table in TABLES.items() if conn.execute(select(table.c.id).limit(1)).first()]
+
+
+def import_(in_dir):
+    engine = init_db()
+    busy = _non_empty(engine)
+    if busy:
+        raise SystemExit(f"Target database is not empty ({', '.join(busy)}); import requires an empty database.")
+    #Dolu bir veritabanında aynı id'ler başka kayıtlara ait olur: alt kayıtlar (mesajlar) yanlış sohbete bağlanırdı.
+    counts = {}
+    for name, table in TABLES.items():
+        for ext, reader in ((".jsonl.gz", _read_jsonl), (".parquet", _read_parquet)):
+            path = os.path.join(in_dir, name + ext)
+            if os.path.exists(path):
+                break
+        else:
+            continue
+        columns = {c.name for c in table.columns}
+        missing = SECRET_COLUMNS.get(name, {})
+        stmt = table.insert()
+        n = 0
+        for rows in reader(path, table):
+            with engine.begin() as conn:
+                conn.execute(stmt, [{**missing, **{k: v for k, v in r.items() if k in columns}} for r in rows])
+            n += len(rows)
+        #Sayfa başına bir transaction (executemany): tek büyük transaction gibi WAL'ı şişirmez.
+        counts[name] = n
+    return counts
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("export")
+    ex.add_argument("out_dir")
+    ex.add_argument("--format", choices=list(WRITERS), default="jsonl")
+    ex.add_argument("--tables", nargs="+", choices=list(TABLES))
+    ex.add_argument("--include-password-hashes", action="store_true",
+                    help="also export users.password_hash (treat the output as a secret)")
+    im = sub.add_parser("import")
+    im.add_argument("in_dir")
+    args = ap.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.cmd == "export":
+        counts = export(args.out_dir, args.format, args.tables, args.include_password_hashes)
+    else:
+        counts = import_(args.in_dir)
+    for name, n in counts.items():
+        print(f"{name:>10s} {n:>12,d} rows")
+    print(f"{args.cmd} finished in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
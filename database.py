@@ -1,9 +1,13 @@
+import os, re, threading
+from contextlib import contextmanager
 from datetime import datetime
 from sqlalchemy import (
-    create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+    create_engine, event, inspect, text, Column, Integer, String, Text, DateTime, ForeignKey, Boolean,
+    LargeBinary, Float, Index
 ) #SQLAlchemy’nin temel veritabanı araçları. Veritabanı motoru oluşturma, kolon türleri, ilişkiler vs.
 
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy.pool import NullPool
 #declarative_base: Model sınıflarının temeli
 #relationship: Tablolar arası ilişkiler
 #sessionmaker: Veritabanı oturumu oluşturma
@@ -26,11 +30,18 @@ class User(Base):
 
 class Chat(Base):
     __tablename__ = "chats"
+    __table_args__ = (Index("ix_chats_user_created", "user_id", "created_at", "id"),)
+    #Kenar çubuğu: kullanıcının sohbetleri en yeniden eskiye, sayfa sayfa (keyset) okunur.
     id         = Column(Integer, primary_key=True)
     user_id    = Column(Integer, ForeignKey("users.id"))
     #Her sohbet, bir kullanıcıya (user_id) bağlıdır.
     title      = Column(String(100))
     created_at = Column(DateTime, default=datetime.utcnow)
+    vector_dir = Column(String(500), nullable=True)
+    #Sohbetin kalıcı Chroma klasörü. Sohbet yeniden açıldığında belge tekrar yüklenmeden buradan okunur.
+    summary      = Column(Text, nullable=True)
+    summary_upto = Column(Integer, nullable=True)
+    #Konuşmanın kısa özeti ve özete katılan son mesajın id'si. Daha yeni mesajlar özetlenmeden prompt'a eklenir.
 
     user       = relationship("User", back_populates="chats")
     messages   = relationship("Message",  back_populates="chat", cascade="all, delete-orphan")
@@ -39,6 +50,8 @@ class Chat(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (Index("ix_messages_chat_id", "chat_id", "id"),)
+    #Sohbet geçmişi: bir sohbetin mesajları id sırasıyla, sondan başa sayfa sayfa okunur.
     id         = Column(Integer, primary_key=True)
     chat_id    = Column(Integer, ForeignKey("chats.id"))
     role       = Column(String(10))  # 'user' | 'assistant'
@@ -52,6 +65,7 @@ class Message(Base):
 
 class Feedback(Base):
     __tablename__ = "feedback"
+    __table_args__ = (Index("ix_feedback_message", "message_id"),)
     id          = Column(Integer, primary_key=True)
     message_id  = Column(Integer, ForeignKey("messages.id"))
     is_helpful  = Column(Boolean)
@@ -64,25 +78,321 @@ class Feedback(Base):
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        Index("ix_documents_chat", "chat_id", "uploaded_at"),
+        Index("ix_documents_library", "library_id"),
+    )
     id          = Column(Integer, primary_key=True)
     chat_id     = Column(Integer, ForeignKey("chats.id"))
     #Bir belge, bir sohbete (chat_id) bağlıdır.
     file_name   = Column(String(255))
     file_path   = Column(String(500))
+    vector_dir  = Column(String(500), nullable=True)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
+    library_id  = Column(Integer, ForeignKey("library_documents.id"), nullable=True)
+    #Ortak kütüphanedeki belgeye referans. Doluysa vektörler sohbete değil kütüphane indeksine aittir (vector_dir orayı gösterir).
 
     chat = relationship("Chat", back_populates="documents")
 
+
+class LibraryDocument(Base):
+    __tablename__ = "library_documents"
+    id          = Column(Integer, primary_key=True)
+    file_hash   = Column(String(64), unique=True, nullable=False)
+    #Aynı içerik (SHA1) tek kayıt → tek ayrıştırma, tek chunk'lama, tek embedding; kaç sohbete eklenirse eklensin.
+    file_name   = Column(String(255))
+    file_path   = Column(String(500))
+    owner_id    = Column(Integer, ForeignKey("users.id"))
+    shared      = Column(Boolean, default=False)
+    #shared: Diğer kullanıcılar kütüphaneden seçip sohbetlerine ekleyebilir. Aynı dosyayı yükleyen herkes
+    #(içeriğe zaten sahip olduğu için) paylaşım olmadan da aynı indeksi kullanır.
+    status      = Column(String(20), default="queued")
+    #status: 'queued' | 'running' | 'done' | 'failed' (indeksin durumu)
+    vector_dir  = Column(String(500), nullable=True)
+    job_id      = Column(Integer, nullable=True)
+    #İndeksi kuran (son) iş; aynı dosyayı yükleyen diğer sohbetler ilerlemeyi bu işten izler.
+    suggestions = Column(Text, nullable=True)
+    #Belgeden üretilen önerilen sorular (JSON liste). İçerik değişirse hash ve dolayısıyla kayıt da değişir.
+    prime_window = Column(DateTime, nullable=True)
+    prime_count  = Column(Integer, nullable=True)
+    #Önerilen soruların cevaplarını önceden üretme bütçesi: pencere başlangıcı ve penceredeki üretim sayısı.
+    created_at  = Column(DateTime, default=datetime.utcnow)
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_chat_status", "chat_id", "status"),
+        Index("ix_jobs_status", "status"),
+    )
+    id          = Column(Integer, primary_key=True)
+    chat_id     = Column(Integer, ForeignKey("chats.id"))
+    user_id     = Column(Integer, ForeignKey("users.id"))
+    file_name   = Column(String(255))
+    file_path   = Column(String(500))
+    file_hash   = Column(String(64))
+    library_id  = Column(Integer, ForeignKey("library_documents.id"), nullable=True)
+    #Doluysa iş, sohbet koleksiyonu yerine kütüphane indeksini kurar.
+    status      = Column(String(20), default="queued")
+    #status: 'queued' | 'running' | 'done' | 'failed'
+    progress    = Column(Float, default=0.0)
+    chunks_done = Column(Integer, default=0)
+    error       = Column(Text, nullable=True)
+    worker      = Column(String(100), nullable=True)
+    #İşi sahiplenen işçinin kirası (host:pid:rastgele). İşçi updated_at'i düzenli yeniler (heartbeat); yazmadan önce
+    #kiranın hâlâ kendisinde olduğunu kontrol eder.
+    created_at  = Column(DateTime, default=datetime.utcnow)
+    updated_at  = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    #Arka planda belge işleme (ingest) işleri. Arayüz ilerlemeyi bu tablodan okur.
+
+
+class AnswerCache(Base):
+    __tablename__ = "answer_cache"
+    id           = Column(Integer, primary_key=True)
+    doc_key      = Column(String(64), index=True, nullable=False)
+    #doc_key: Sohbetteki belgelerin hash'lerinden üretilen anahtar. Aynı belge(ler) → aynı önbellek.
+    question     = Column(Text)
+    embedding    = Column(LargeBinary)
+    #Normalize edilmiş sorunun embedding'i (float32 dizisi). Benzer sorular kosinüs benzerliği ile bulunur.
+    answer       = Column(Text)
+    hits         = Column(Integer, default=0)
+    created_at   = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AuthSession(Base):
+    __tablename__ = "auth_sessions"
+    id          = Column(Integer, primary_key=True)
+    token_hash  = Column(String(64), unique=True, nullable=False)
+    #Token'ın kendisi değil SHA-256 özeti saklanır; veritabanı sızsa da oturumlar ele geçirilemez.
+    user_id     = Column(Integer, ForeignKey("users.id"), index=True)
+    created_at  = Column(DateTime, default=datetime.utcnow)
+    expires_at  = Column(DateTime, nullable=False)
+    #Giriş sonrası verilen kalıcı oturum: sayfa yenilenince şifre (bcrypt) tekrar doğrulanmaz.
+
 # -- Helpers --
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///chatbot.db")
+
+_engine = None
+_engine_lock = threading.Lock()
+SessionLocal = sessionmaker(expire_on_commit=False)
+#Tek bir oturum fabrikası. expire_on_commit=False: commit sonrası nesneler oturum kapansa da okunabilir kalır.
+
+
+def _set_sqlite_pragmas(dbapi_conn, _record):
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")       # Okuyucular yazıcıyı beklemez
+    cur.execute("PRAGMA synchronous=NORMAL")     # WAL ile güvenli, her commit'te fsync yok
+    cur.execute("PRAGMA busy_timeout=5000")      # Kilitli veritabanında hata yerine 5 sn bekle
+    cur.execute("PRAGMA cache_size=-20000")      # ~20 MB sayfa önbelleği
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA mmap_size=268435456")    # 256 MB memory-mapped okuma
+    cur.close()
+#Her yeni bağlantı havuza girerken bir kez çalışır.
+
+
 def init_db():
-    engine = create_engine("sqlite:///chatbot.db", echo=False)
-    Base.metadata.create_all(engine)
-    #Yukarıda tanımlanan tüm tabloları veritabanında oluşturur.
-    return engine
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            engine = create_engine(
+                DATABASE_URL,
+                echo=False,
+                pool_size=10,
+                max_overflow=20,
+                pool_pre_ping=True,
+                connect_args={"check_same_thread": False, "timeout": 30},
+            )
+            if engine.dialect.name == "sqlite":
+                event.listen(engine, "connect", _set_sqlite_pragmas)
+            migrate(engine)
+            #Şema, sürüm numaralı migration'larla güncellenir (create_all yalnızca ilk migration'da kullanılır).
+            SessionLocal.configure(bind=engine)
+            _engine = engine
+    return _engine
+#Motor süreç başına bir kez oluşturulur; sonraki çağrılar aynı motoru ve bağlantı havuzunu döndürür.
+
+
+# -- Migrations --
+def _add_missing_columns(conn):
+    #create_all var olan tablolara yeni kolon eklemez; sürüm bilgisi olmayan eski veritabanlarında eksik kolonlar
+    #burada eklenir. Sadece ilk migration kullanır: sonraki migration'lar modellere değil kendi DDL'lerine dayanır.
+    insp = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in insp.get_columns(table.name)}
+        for col in table.columns:
+            if col.name not in existing:
+                conn.execute(text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(conn.dialect)}"
+                ))
+
+
+def _add_column(conn, table, column, ddl):
+    if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+#Kolon zaten varsa (boş veritabanında create_all güncel modellerle kurduysa) atlanır.
+
+
+def _m001_base_tables(conn):
+    Base.metadata.create_all(conn)
+    _add_missing_columns(conn)
+#Sürüm bilgisi olmayan (eski) veritabanları ve boş veritabanı bu adımla aynı başlangıç noktasına gelir.
+
+
+HISTORY_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_chats_user_created ON chats (user_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_messages_chat_id ON messages (chat_id, id)",
+    "CREATE INDEX IF NOT EXISTS ix_feedback_message ON feedback (message_id)",
+    "CREATE INDEX IF NOT EXISTS ix_documents_chat ON documents (chat_id, uploaded_at)",
+    "CREATE INDEX IF NOT EXISTS ix_jobs_chat_status ON jobs (chat_id, status)",
+    "CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status)",
+    "CREATE INDEX IF NOT EXISTS ix_answer_cache_doc_key ON answer_cache (doc_key)",
+]
+
+def _m002_history_indexes(conn):
+    for ddl in HISTORY_INDEXES:
+        conn.execute(text(ddl))
+    if conn.dialect.name == "sqlite":
+        conn.execute(text("ANALYZE"))
+        #Sorgu planlayıcısı yeni indekslerin istatistiklerini görür.
+
+
+def _m003_chat_summary(conn):
+    _add_column(conn, "chats", "summary", "TEXT")
+    _add_column(conn, "chats", "summary_upto", "INTEGER")
+
+
+def _m004_auth_sessions(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS auth_sessions ("
+        "id INTEGER NOT NULL PRIMARY KEY, token_hash VARCHAR(64) NOT NULL UNIQUE, "
+        "user_id INTEGER REFERENCES users (id), created_at DATETIME, expires_at DATETIME NOT NULL)"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_auth_sessions_user_id ON auth_sessions (user_id)"))
+
+
+def _m005_library(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS library_documents ("
+        "id INTEGER NOT NULL PRIMARY KEY, file_hash VARCHAR(64) NOT NULL UNIQUE, file_name VARCHAR(255), "
+        "file_path VARCHAR(500), owner_id INTEGER REFERENCES users (id), shared BOOLEAN, status VARCHAR(20), "
+        "vector_dir VARCHAR(500), job_id INTEGER, created_at DATETIME)"
+    ))
+    _add_column(conn, "documents", "library_id", "INTEGER REFERENCES library_documents (id)")
+    _add_column(conn, "jobs", "library_id", "INTEGER REFERENCES library_documents (id)")
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_documents_library ON documents (library_id)"))
+
+
+def _m006_suggestions(conn):
+    _add_column(conn, "library_documents", "suggestions", "TEXT")
+
+
+def _m007_job_lease(conn):
+    _add_column(conn, "jobs", "worker", "VARCHAR(100)")
+
+
+def _m008_prime_budget(conn):
+    _add_column(conn, "library_documents", "prime_window", "DATETIME")
+    _add_column(conn, "library_documents", "prime_count", "INTEGER")
+
+
+LEGACY_VECTOR_ROOT = "./chroma_db"
+_LEGACY_DIR_RE = re.compile(r"chat_(\d+)_[0-9a-f]+")
+
+def _m009_legacy_vector_dirs(conn):
+    newest = {}
+    if os.path.isdir(LEGACY_VECTOR_ROOT):
+        for entry in os.scandir(LEGACY_VECTOR_ROOT):
+            m = _LEGACY_DIR_RE.fullmatch(entry.name)
+            if m and entry.is_dir():
+                cid, mtime = int(m.group(1)), entry.stat().st_mtime
+                if cid not in newest or mtime > newest[cid][0]:
+                    newest[cid] = (mtime, os.path.join(LEGACY_VECTOR_ROOT, entry.name))
+    for cid, (_, directory) in newest.items():
+        conn.execute(
+            text("UPDATE chats SET vector_dir = :d WHERE id = :cid AND vector_dir IS NULL"), {"d": directory, "cid": cid}
+        )
+#İlk sürüm her yüklemede chroma_db/chat_<id>_<uuid> klasörü açıyor ama sohbete yazmıyordu. Bu sohbetler en yeni
+#klasörlerine bağlanır (belge tekrar yüklenmeden açılır, GC klasörü yetim saymaz). Kaydı olmayan sohbetlere dokunulmaz.
+
+
+MIGRATIONS = [
+    (1, "base tables", _m001_base_tables),
+    (2, "history indexes", _m002_history_indexes),
+    (3, "chat summary", _m003_chat_summary),
+    (4, "auth sessions", _m004_auth_sessions),
+    (5, "shared library", _m005_library),
+    (6, "suggested questions", _m006_suggestions),
+    (7, "job lease", _m007_job_lease),
+    (8, "answer priming budget", _m008_prime_budget),
+    (9, "legacy vector dirs", _m009_legacy_vector_dirs),
+]
+#Yeni şema değişikliği = listenin sonuna yeni (sürüm, ad, fonksiyon). Fonksiyon açık DDL yazar (modellerden türetmez):
+#modeller ileride değişse de eski bir veritabanı aynı adımlardan geçer. Her migration tek bir transaction içinde çalışır.
+
+
+def _sqlite_autocommit(dbapi_conn, _record):
+    dbapi_conn.isolation_level = None
+
+def _begin_immediate(conn):
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+#pysqlite SELECT ve DDL için BEGIN göndermez: sürüm kontrolü, DDL ve sürüm kaydı aynı transaction'da olmaz.
+#SQLAlchemy'nin pysqlite tarifi: sürücünün transaction yönetimi kapatılır, her begin() açıkça BEGIN IMMEDIATE gönderir
+#(yazma kilidi transaction başında alınır; aynı anda başlayan ikinci süreç ilki bitene kadar bekler).
+
+
+def _migration_engine(engine):
+    if engine.dialect.name != "sqlite" or engine.url.database in (None, "", ":memory:"):
+        return engine
+    mig = create_engine(engine.url, poolclass=NullPool, connect_args={"timeout": 600})
+    event.listen(mig, "connect", _sqlite_autocommit)
+    event.listen(mig, "begin", _begin_immediate)
+    return mig
+#Sadece migration'lar için ayrı motor: uygulamanın okuma transaction'ları yazma kilidi almaz.
+
+
+def schema_version(conn) -> int:
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+    row = conn.execute(text("SELECT MAX(version) FROM schema_version")).first()
+    return (row[0] if row else None) or 0
+
+
+def migrate(engine):
+    mig = _migration_engine(engine)
+    try:
+        with mig.begin() as conn:
+            current = schema_version(conn)
+        for version, name, fn in MIGRATIONS:
+            if version <= current:
+                continue
+            with mig.begin() as conn:
+                if schema_version(conn) >= version:
+                    continue
+                    #Başka bir süreç (ör. diğer API işçisi) aynı migration'ı bu arada uyguladıysa atlanır.
+                fn(conn)
+                conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": version})
+    finally:
+        if mig is not engine:
+            mig.dispose()
+    return max(v for v, _, _ in MIGRATIONS)
 
 
 def get_db():
-    engine = init_db()
-    Session = sessionmaker(bind=engine)
-    return Session()
-#Veritabanına bağlı bir SQLAlchemy oturumu (session) oluşturur. Veritabanı işlemlerinin yapılacağı bağlantıdır.
+    if _engine is None:
+        init_db()
+    return SessionLocal()
+#Havuzdan bağlantı kullanan bir SQLAlchemy oturumu (session) döndürür. Kapatılması çağıran tarafa aittir.
+
+
+@contextmanager
+def session_scope():
+    db = get_db()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+#with session_scope() as db: ... → hata yoksa commit, varsa rollback; her durumda bağlantı havuza geri döner.
@@ -0,0 +1,175 @@
+import os, sqlite3, threading, time
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain_core.stores import ByteStore
+#CacheBackedEmbeddings: Her chunk metninin hash'ini anahtar olarak kullanır, önbellekte olmayanları modele gönderir.
+
+
+CACHE_PATH      = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+#Önbellek dosyası ve diskte kaplayabileceği en fazla boyut (varsayılan 512 MB). Aşılırsa en eski kullanılanlar silinir (LRU).
+
+
+# --Store--
+TOUCH_BATCH = 1000
+TOUCH_FLUSH = 30.0
+#Okuma yolunda yazma yok: kullanılan anahtarların last_used zamanı bellekte toplanır ve TOUCH_BATCH anahtarda bir,
+#TOUCH_FLUSH sn'de bir ya da bir sonraki yazmada (mset / tahliye öncesi) tek bir UPDATE grubu ile yazılır.
+
+
+class SQLiteLRUByteStore(ByteStore):
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = self.misses = self.evictions = 0
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._touched_at = time.monotonic()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+            " size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_last_used ON entries(last_used)")
+        self._conn.commit()
+        #Aynı bağlantı Streamlit'in farklı thread'lerinden kullanılacağı için erişim kilitle korunur.
+        self._recount()
+        #Toplam boyut ve kayıt sayısı açılışta bir kez okunur, sonra yazmalarla birlikte güncel tutulur.
+
+    def _recount(self):
+        self._count, self._total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+
+    def _sizes(self, keys):
+        sizes = {}
+        for i in range(0, len(keys), 500):
+            part = keys[i:i + 500]
+            sizes.update(self._conn.execute(
+                f"SELECT key, size FROM entries WHERE key IN ({','.join('?' * len(part))})", part
+            ))
+        return sizes
+    #Birincil anahtar üzerinden arama: değiştirilen/silinen kayıtların eski boyutu (tablo taranmaz).
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?", [(t, k) for k, t in self._touched.items()]
+            )
+            self._conn.commit()
+            self._touched.clear()
+        self._touched_at = time.monotonic()
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        with self._lock:
+            found = {}
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._touched.update((k, now) for k in found)
+                if len(self._touched) >= TOUCH_BATCH or time.monotonic() - self._touched_at >= TOUCH_FLUSH:
+                    self._flush_touched()
+            self.hits   += len(found)
+            self.misses += len(keys) - len(found)
+        return [found.get(k) for k in keys]
+
+    def mset(self, key_value_pairs: Sequence[Tuple[str, bytes]]) -> None:
+        if not key_value_pairs:
+            return
+        now = time.time()
+        with self._lock:
+            old = self._sizes([k for k, _ in key_value_pairs])
+            rows = {k: (k, v, len(k) + len(v), now) for k, v in key_value_pairs}
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries(key, value, size, last_used) VALUES (?, ?, ?, ?)", rows.values(),
+            )
+            self._conn.commit()
+            self._total += sum(r[2] for r in rows.values()) - sum(old.values())
+            self._count += len(rows) - len(old)
+            self._evict()
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        with self._lock:
+            old = self._sizes(list(keys))
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in keys])
+            self._conn.commit()
+            self._total -= sum(old.values())
+            self._count -= len(old)
+
+    def yield_keys(self, prefix: Optional[str] = None) -> Iterator[str]:
+        with self._lock:
+            if prefix:
+                rows = self._conn.execute(
+                    "SELECT key FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+                ).fetchall()
+            else:
+                rows = self._conn.execute("SELECT key FROM entries").fetchall()
+        for (k,) in rows:
+            yield k
+
+    def _evict(self):
+        if self._total <= self.max_bytes:
+            return
+        self._recount()
+        if self._total <= self.max_bytes:
+            return
+        #Sayaç sınırı aştığını söylediğinde (nadir) gerçek toplam bir kez okunur: aynı dosyayı kullanan başka bir
+        #süreç kayıt silmiş/eklemiş olabilir. Ortak yolda (her mset) tablo taranmaz.
+        self._flush_touched()
+        #Son kullanım zamanları tahliyeden önce yazılır: yeni kullanılan kayıtlar silinmez.
+        stale, freed = [], 0
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            stale.append((key,))
+            freed += size
+            if self._total - freed <= self.max_bytes:
+                break
+        #En uzun süredir kullanılmayan kayıtlardan başlayarak limit altına inene kadar silinir.
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+        self._conn.commit()
+        self._total -= freed
+        self._count -= len(stale)
+        self.evictions += len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": self._count,
+                "bytes": self._total,
+            }
+
+
+# --Helpers--
+_store = None
+_store_lock = threading.Lock()
+
+def get_store() -> SQLiteLRUByteStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SQLiteLRUByteStore()
+        return _store
+#Süreç genelinde tek bir önbellek; tüm sohbetler ve kullanıcılar aynı kayıtları paylaşır.
+
+
+def cached_embeddings(underlying, model: str, file_hash: str, chunk_size: int, chunk_overlap: int):
+    namespace = f"{model}|{file_hash}|{chunk_size}|{chunk_overlap}|"
+    #Anahtar = model + dosya hash'i + chunk ayarları + (CacheBackedEmbeddings tarafından eklenen) chunk metninin hash'i
+    return CacheBackedEmbeddings.from_bytes_store(underlying, get_store(), namespace=namespace)
+
+
+def cache_stats() -> dict:
+    return get_store().stats()
@@ -0,0 +1,97 @@
+import os, random, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+#Embedding isteklerini gruplara böler, sınırlı sayıda eşzamanlı istekle gönderir ve kota hatalarında bekleyip tekrar dener.
+
+
+EMBED_BATCH_SIZE  = int(os.getenv("EMBED_BATCH_SIZE", 16))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", 4))
+EMBED_RATE        = float(os.getenv("EMBED_RATE", 20))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", 6))
+#EMBED_RATE: saniyedeki en fazla istek (token bucket). EMBED_CONCURRENCY: aynı anda havada olabilecek istek sayısı.
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        #Bir istek hakkı alınana kadar bekler; beklenen süreyi döndürür.
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    text = f"{type(exc).__name__} {exc}".lower()
+    return any(s in text for s in ("429", "resourceexhausted", "resource exhausted", "quota", "rate limit"))
+#google.api_core ResourceExhausted (HTTP 429) ve benzeri kota hataları; istemci kütüphanesini import etmeden tanınır.
+
+
+class ScheduledEmbeddings(Embeddings):
+    def __init__(
+        self,
+        underlying: Embeddings,
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_concurrency: int = EMBED_CONCURRENCY,
+        rate: float = EMBED_RATE,
+        max_retries: int = EMBED_MAX_RETRIES,
+        base_delay: float = 1.0,
+    ):
+        self.underlying = underlying
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.bucket = TokenBucket(rate)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embed")
+        self._lock = threading.Lock()
+        self.requests = self.retries = 0
+        self.throttled_seconds = 0.0
+
+    def _call(self, fn, arg):
+        for attempt in range(self.max_retries + 1):
+            waited = self.bucket.acquire()
+            with self._lock:
+                self.requests += 1
+                self.throttled_seconds += waited
+            try:
+                return fn(arg)
+            except Exception as e:
+                if attempt == self.max_retries or not is_rate_limit_error(e):
+                    raise
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self.base_delay * 2 ** attempt * (0.5 + random.random()))
+                #Üstel geri çekilme (exponential backoff) + rastgele sapma (jitter): istemciler aynı anda tekrar denemez.
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = self._pool.map(lambda b: self._call(self.underlying.embed_documents, b), batches)
+        return [vec for batch in results for vec in batch]
+        #map sırayı korur; vektörler metinlerle aynı sırada döner.
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call(self.underlying.embed_query, text)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "throttled_seconds": round(self.throttled_seconds, 3),
+            }
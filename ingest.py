@@ -0,0 +1,170 @@
+import os, hashlib, tempfile
+from itertools import chain, islice
+
+from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
+from langchain_chroma import Chroma
+from chromadb.api.client import SharedSystemClient
+
+from numpy_store import NumpyVectorStore, VECTOR_DTYPE, MANIFEST
+
+from chunking import StructuredChunker, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS
+from embedding_cache import cached_embeddings
+import telemetry
+from providers import EMBEDDING_MODEL, get_embeddings, get_scheduled_embeddings
+#Belge alma hattı (ingest): dosyayı diske yaz → sayfaları tek tek oku → chunk'la → sınırlı gruplar halinde embedding.
+#Hiçbir adım belgenin tamamını bellekte tutmaz; en yüksek bellek kullanımı belge boyutundan bağımsızdır.
+
+
+UPLOAD_DIR    = "uploaded_files"
+VECTOR_ROOT   = "./chroma_db"
+BATCH_SIZE    = int(os.getenv("INGEST_BATCH_SIZE", 128))
+READ_BLOCK    = 1024 * 1024
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+#VECTOR_BACKEND: Yeni sohbetlerin vektör deposu: 'chroma' veya 'numpy' (numpy_store, memory-mapped int8/float16).
+#BATCH_SIZE: Aynı anda embedding'e gönderilen chunk sayısı. READ_BLOCK: Yüklemenin diske yazılırken okunan parça boyutu (1 MB).
+
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+
+# --Upload--
+def save_upload(fileobj, name):
+    #Dosya tek geçişte hem hash'lenir hem diske yazılır. (hash, kalıcı yol) döndürür.
+    ext = os.path.splitext(name)[1].lower()
+    h = hashlib.sha1()
+    fileobj.seek(0)
+    with tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, suffix=".part", delete=False) as tmp:
+        while block := fileobj.read(READ_BLOCK):
+            h.update(block)
+            tmp.write(block)
+    file_hash = h.hexdigest()
+    permanent_path = os.path.join(UPLOAD_DIR, f"{file_hash}{ext}")
+    if os.path.exists(permanent_path):
+        os.remove(tmp.name)
+        #Aynı içerik daha önce yüklendiyse geçici dosya atılır.
+    else:
+        os.replace(tmp.name, permanent_path)
+        #Atomik taşıma: yarım yazılmış dosya asla kalıcı adla görünmez.
+    return file_hash, permanent_path
+
+
+def loader_for(path):
+    ext = os.path.splitext(path)[1].lower()
+    return (
+        PyPDFLoader(path) if ext == ".pdf"
+        else Docx2txtLoader(path) if ext == ".docx"
+        else TextLoader(path, encoding="utf-8") if ext == ".txt"
+        else None
+        #Dosya uzantısına göre uygun Loader seç
+    )
+
+
+def count_pages(path):
+    if path.lower().endswith(".pdf"):
+        from pypdf import PdfReader
+        return len(PdfReader(path).pages)
+        #Sayfa sayısı içerik ayrıştırılmadan (sadece xref tablosundan) okunur.
+    return None
+
+
+# --Pages → Chunks → Batches--
+def iter_pages(path):
+    loader = loader_for(path)
+    try:
+        yield from loader.lazy_load()
+    except NotImplementedError:
+        yield from loader.load()
+    #PDF sayfaları tek tek ayrıştırılır; lazy_load desteklemeyen yükleyiciler (DOCX) tek seferde okunur.
+
+
+def iter_chunks(path, file_hash):
+    for c in StructuredChunker().iter_chunks(iter_pages(path)):
+        c.metadata["file_hash"] = file_hash
+        #Her chunk hangi dosyadan geldiğini bilir → embedding önbelleği dosya hash'ine göre anahtarlanır.
+        yield c
+#Chunk'lar token sayısına göre boyutlanır, sayfa/başlık sınırlarını aşmaz; tekrarlayan üst/alt bilgiler embedding'e gitmez.
+
+
+def iter_batches(items, size=BATCH_SIZE):
+    it = iter(items)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def chat_vector_dir(cid):
+    return os.path.join(VECTOR_ROOT, f"chat_{cid}")
+#Her sohbetin tek ve sabit bir koleksiyonu vardır; sohbetteki tüm belgeler aynı koleksiyona eklenir.
+
+
+def open_vector_store(directory, embedding_function=None):
+    emb = embedding_function or get_embeddings()
+    if os.path.exists(os.path.join(directory, MANIFEST)):
+        return NumpyVectorStore(directory, emb)
+    if os.path.exists(os.path.join(directory, "chroma.sqlite3")) or VECTOR_BACKEND != "numpy":
+        return Chroma(persist_directory=directory, embedding_function=emb)
+    return NumpyVectorStore(directory, emb)
+#Mevcut klasörün biçimi önceliklidir: VECTOR_BACKEND değişse de eski sohbetler kendi depolarıyla açılır.
+
+
+def reopen_vector_store(directory):
+    SharedSystemClient._identifer_to_system.pop(directory, None)
+#Chroma aynı klasör için süreç içinde istemciyi önbellekler; başka süreçte yazılan vektörleri görmek için sadece bu
+#klasörün istemcisi atılır (clear_system_cache tüm sohbetlerin açık depolarını düşürürdü). Eski istemci durdurulmaz:
+#o an arama yapan istekler onu kullanmaya devam eder, referans kalmayınca toplanır. NumPy deposu her açılışta okunur.
+
+
+def segment_key(file_hash):
+    if not file_hash:
+        return None
+    raw = f"{file_hash}|{EMBEDDING_MODEL}|{CHUNK_TOKENS}|{CHUNK_OVERLAP_TOKENS}|{VECTOR_DTYPE}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+#Aynı dosya, aynı model ve chunk ayarlarıyla her zaman aynı vektörleri üretir → tüm sohbetlerde tek segment.
+
+
+@telemetry.traced("setup_vector_store")
+def add_to_vector_store(chunks, directory, document_id, on_progress=None):
+    #Chunk'ları gruplar halinde embedding'e gönderip sohbetin koleksiyonuna ekler. Belge boşsa None döner.
+    batches = iter_batches(chunks)
+    first = next(batches, None)
+    if first is None:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    emb = cached_embeddings(
+        get_scheduled_embeddings(),
+        model=EMBEDDING_MODEL,
+        file_hash=first[0].metadata.get("file_hash", ""),
+        chunk_size=CHUNK_TOKENS,
+        chunk_overlap=CHUNK_OVERLAP_TOKENS,
+    )
+    #Önbellekte bulunan chunk'lar için model hiç çağrılmaz; sadece eksik olanlar hesaplanır.
+    #Eksikler EMBED_BATCH_SIZE'lık gruplar halinde, hız sınırına uyarak eşzamanlı gönderilir.
+    #Her BATCH_SIZE'lık grup tamamlandığında vektörleri önbelleğe yazılır: yarıda kalan bir yükleme tekrarlandığında
+    #biten gruplar önbellekten gelir, embedding kaldığı yerden devam eder.
+    vs = open_vector_store(directory, emb)
+    if isinstance(vs, NumpyVectorStore) and segment_key(first[0].metadata.get("file_hash")):
+        key = segment_key(first[0].metadata.get("file_hash"))
+        return vs.add_document(chain([first], batches), document_id, key, on_progress)
+    #NumPy deposu: belge tek bir paylaşılan segmente yazılır (segment zaten varsa embedding yapılmaz),
+    #sohbetin manifest'i bu segmente bağlanır; yeniden çalışan işte eski bağlantı değiştirilir.
+    if document_id is not None:
+        delete_document_vectors(vs, document_id)
+    #Yarıda kalıp yeniden çalışan bir işte aynı belgenin eski parçaları önce temizlenir (çift kayıt olmaz).
+    done = 0
+    for i, batch in enumerate(chain([first], batches), start=1):
+        if document_id is not None:
+            for c in batch:
+                c.metadata["document_id"] = document_id
+        #document_id: Belge sohbetten çıkarıldığında sadece onun vektörlerini silmek için.
+        vs.add_documents(batch)
+        done += len(batch)
+        if on_progress:
+            on_progress(i, done, batch[-1].metadata.get("page"))
+        #Her grup eklendikten sonra ilerleme bildirilir (grup no, toplam chunk, son sayfa).
+    return vs
+
+
+def delete_document_vectors(vs, document_id):
+    ids = vs.get(where={"document_id": document_id}, include=[])["ids"]
+    if ids:
+        vs.delete(ids)
+    return len(ids)
+#Koleksiyon yeniden kurulmaz; sadece bu belgeye ait vektörler silinir.
@@ -0,0 +1,273 @@
+import os, multiprocessing, socket, threading, traceback, uuid
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+#Dosya kilidi (POSIX). Yoksa (Windows) sadece süreç içi kilit kullanılır.
+
+from database import session_scope, init_db, Job, Chat, Document, LibraryDocument
+import ingest, library
+import telemetry
+#Belge işleme Streamlit script thread'inde değil, arka plandaki bir iş kuyruğunda yapılır.
+#Kullanıcı belge işlenirken diğer sohbetlerde konuşmaya devam edebilir.
+
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+INGEST_BACKEND = os.getenv("INGEST_BACKEND", "thread")
+#INGEST_BACKEND: 'thread' (varsayılan, embedding ağ beklemesi ağırlıklı) veya 'process' (PDF ayrıştırma CPU'yu ayrı süreçte tutar).
+ACTIVE = ("queued", "running")
+STALE_AFTER = timedelta(seconds=int(os.getenv("INGEST_STALE_SECONDS", 120)))
+HEARTBEAT   = STALE_AFTER.total_seconds() / 4
+#Bu süre boyunca kirasını yenilemeyen 'running' iş, çalıştıran süreç ölmüş sayılıp yeniden kuyruğa alınır.
+#Kira, gruplardan bağımsız bir thread ile HEARTBEAT sn'de bir yenilenir: hız sınırı yüzünden dakikalarca bekleyen
+#bir embedding grubu işi "ölü" göstermez.
+
+_executor = None
+_lock = threading.Lock()
+_chat_locks = {}
+
+
+def _chat_lock(cid):
+    with _lock:
+        return _chat_locks.setdefault(cid, threading.Lock())
+
+
+@contextmanager
+def chat_write_lock(cid, directory):
+    #Bir sohbetin Chroma koleksiyonuna aynı anda tek yazıcı: süreç içinde thread kilidi, süreçler arasında dosya kilidi.
+    #Birden fazla servis işçisi (api.py --workers N) aynı chroma_db klasörünü paylaşır.
+    with _chat_lock(cid):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(directory)), exist_ok=True)
+        with open(f"{directory}.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            if INGEST_BACKEND == "process":
+                _executor = ProcessPoolExecutor(
+                    max_workers=INGEST_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                _executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+            _resume_interrupted()
+            threading.Thread(target=_sweep, daemon=True, name="ingest-sweeper").start()
+        return _executor
+
+
+class LeaseLost(Exception):
+    pass
+#İş bu işçiden alınmış (kira süresi dolup başka bir işçi sahiplendi): yazma bırakılır, işi yeni sahibi bitirir.
+
+
+def _update(job_id, owner, **fields):
+    #Sadece kira hâlâ bu işçideyse yazar (updated_at da yenilenir) → güncellenen satır sayısı.
+    with session_scope() as db:
+        return db.query(Job).filter(Job.id == job_id, Job.worker == owner, Job.status == "running").update(
+            {"updated_at": datetime.utcnow(), **fields}, synchronize_session=False
+        )
+
+
+def _heartbeat(job_id, owner, stop):
+    while not stop.wait(HEARTBEAT):
+        try:
+            if not _update(job_id, owner):
+                return
+        except Exception:
+            traceback.print_exc()
+
+
+# --Worker--
+def run_job(job_id):
+    #İşçi tarafında çalışır (thread veya ayrı süreç). Streamlit'e erişmez; tüm durum jobs tablosuna yazılır.
+    init_db()
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    with session_scope() as db:
+        claimed = db.query(Job).filter(Job.id == job_id, Job.status == "queued").update(
+            {Job.status: "running", Job.error: None, Job.worker: owner, Job.updated_at: datetime.utcnow()},
+            synchronize_session=False,
+        )
+        job = db.query(Job).filter(Job.id == job_id).first()
+    if not claimed or job is None:
+        return
+    #İş atomik olarak sahiplenilir (queued → running, kira bu işçide); aynı işi başka bir süreç/thread aldıysa burada çıkılır.
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, owner, stop), daemon=True, name=f"ingest-lease-{job_id}").start()
+    try:
+        total_pages = ingest.count_pages(job.file_path)
+
+        def on_progress(batch_no, chunks_done, page):
+            progress = min((page or 0) + 1, total_pages) / total_pages if total_pages else 0.0
+            if not _update(job_id, owner, progress=progress, chunks_done=chunks_done):
+                raise LeaseLost(job_id)
+        #Kira kaybedildiyse sonraki grup yazılmaz; yeni sahip aynı yazma kilidini bekler ve belgenin
+        #yarım kalan vektörlerini silip baştan (önbellekteki embedding'lerle) yazar.
+
+        if job.library_id:
+            if not _build_library_index(job, owner, on_progress):
+                return
+        elif not _build_chat_collection(job, owner, on_progress):
+            return
+        if _update(job_id, owner, status="done", progress=1.0):
+            telemetry.inc("rag_ingest_jobs_total", status="done")
+    except LeaseLost:
+        telemetry.inc("rag_ingest_jobs_total", status="lease_lost")
+    except Exception as e:
+        if _update(job_id, owner, status="failed", error=f"{type(e).__name__}: {e}") and job.library_id:
+            _update_library(job.library_id, status="failed")
+        telemetry.inc("rag_ingest_jobs_total", status="failed")
+        traceback.print_exc()
+    finally:
+        stop.set()
+
+
+def _update_library(library_id, **fields):
+    with session_scope() as db:
+        db.query(LibraryDocument).filter(LibraryDocument.id == library_id).update(fields)
+
+
+def _build_library_index(job, owner, on_progress):
+    #Kütüphane indeksi: dosya hash'i başına tek koleksiyon. Bu belgeye bağlı tüm sohbetler iş bitince onu kullanır.
+    with session_scope() as db:
+        directory = db.query(LibraryDocument.vector_dir).filter(LibraryDocument.id == job.library_id).scalar()
+    _update_library(job.library_id, status="running", job_id=job.id)
+    with chat_write_lock(f"lib-{job.library_id}", directory), telemetry.span("ingest.job"):
+        vs = ingest.add_to_vector_store(
+            ingest.iter_chunks(job.file_path, job.file_hash), directory, job.library_id, on_progress
+        )
+    if not _update(job.id, owner):
+        raise LeaseLost(job.id)
+    if vs is None:
+        _update(job.id, owner, status="failed", error="No text could be extracted from the document.")
+        _update_library(job.library_id, status="failed")
+        return False
+    if library.SUGGESTIONS_ENABLED:
+        try:
+            library.generate_suggestions(job.library_id, vs, job.file_name)
+        except Exception:
+            traceback.print_exc()
+        #Önerilen sorular indeks hazır olmadan önce üretilir: sohbet ısıtılırken sorular zaten vardır.
+        #Üretilemezse belge yine kullanılır (sadece öneri gösterilmez).
+    _update_library(job.library_id, status="done")
+    return True
+
+
+def _build_chat_collection(job, owner, on_progress):
+    #Kütüphane öncesi işler (yeniden başlatmada kuyrukta kalmış olabilir): sohbete özel koleksiyon.
+    with session_scope() as db:
+        chat = db.query(Chat).filter(Chat.id == job.chat_id).first()
+        doc = db.query(Document).filter(
+            Document.chat_id == job.chat_id, Document.file_path == job.file_path
+        ).first()
+        directory = (chat.vector_dir if chat else None) or ingest.chat_vector_dir(job.chat_id)
+        doc_id = doc.id if doc else None
+    #Sohbetin zaten bir koleksiyonu varsa yeni belge oraya eklenir; yoksa sohbete ait sabit klasör açılır.
+
+    with chat_write_lock(job.chat_id, directory), telemetry.span("ingest.job"):
+        vs = ingest.add_to_vector_store(
+            ingest.iter_chunks(job.file_path, job.file_hash), directory, doc_id, on_progress
+        )
+    #Aynı sohbete aynı anda iki belge yüklenirse (aynı veya farklı süreçte) koleksiyona sırayla yazılır.
+    if not _update(job.id, owner):
+        raise LeaseLost(job.id)
+    if vs is None:
+        _update(job.id, owner, status="failed", error="No text could be extracted from the document.")
+        return False
+    with session_scope() as db:
+        db.query(Chat).filter(Chat.id == job.chat_id).update({Chat.vector_dir: directory})
+        if doc_id:
+            db.query(Document).filter(Document.id == doc_id).update({Document.vector_dir: directory})
+        #Vektör klasörünün yeri hem sohbete hem de ilgili belge kaydına yazılır.
+    return True
+
+
+# --Queue--
+def submit(chat_id, user_id, file_name, file_path, file_hash, library_id=None):
+    executor = _get_executor()
+    #Havuz, yarım kalan işler kuyruğa alındıktan sonra yeni iş kaydı oluşturulur (aynı iş iki kez çalışmasın).
+    with session_scope() as db:
+        job = Job(
+            chat_id=chat_id, user_id=user_id, file_name=file_name,
+            file_path=file_path, file_hash=file_hash, status="queued", library_id=library_id,
+        )
+        db.add(job)
+        db.flush()
+        job_id = job.id
+        if library_id:
+            db.query(LibraryDocument).filter(LibraryDocument.id == library_id).update({LibraryDocument.job_id: job_id})
+        #Aynı dosyayı yükleyen diğer sohbetler ilerlemeyi bu işten izler.
+    executor.submit(run_job, job_id)
+    return job_id
+
+
+def _requeue_stale():
+    #Kirası STALE_AFTER boyunca yenilenmeyen 'running' işler kuyruğa geri alınır → bu çağrının geri aldığı iş id'leri.
+    cutoff = datetime.utcnow() - STALE_AFTER
+    with session_scope() as db:
+        stale = [i for (i,) in db.query(Job.id).filter(Job.status == "running", Job.updated_at < cutoff)]
+        return [
+            i for i in stale
+            if db.query(Job).filter(Job.id == i, Job.status == "running", Job.updated_at < cutoff).update(
+                {Job.status: "queued", Job.worker: None}, synchronize_session=False
+            )
+        ]
+    #Koşullu güncelleme: aynı işi aynı anda geri alan ikinci süreç onu kendi listesine eklemez.
+
+
+def _resume_interrupted():
+    #Sunucu yeniden başladığında yarım kalan işler kuyruğa geri alınır.
+    #Biten embedding grupları önbellekte olduğu için iş kaldığı yerden devam eder.
+    #Birden fazla süreç aynı kuyruğu paylaşabilir: sadece uzun süredir ilerlemeyen 'running' işler geri alınır,
+    #'queued' işleri hangi süreç önce sahiplenirse o çalıştırır.
+    _requeue_stale()
+    with session_scope() as db:
+        ids = [i for (i,) in db.query(Job.id).filter(Job.status == "queued")]
+    for job_id in ids:
+        _executor.submit(run_job, job_id)
+
+
+def _sweep_once():
+    for job_id in _requeue_stale():
+        _executor.submit(run_job, job_id)
+#Sadece bu turda geri alınan işler gönderilir: kuyrukta bekleyen işler havuzda zaten vardır (tekrar eklenmez).
+
+
+def _sweep():
+    while True:
+        threading.Event().wait(STALE_AFTER.total_seconds())
+        try:
+            _sweep_once()
+        except Exception:
+            traceback.print_exc()
+#Çalışırken ölen başka bir sürecin işleri de (kirası STALE_AFTER boyunca yenilenmeyince) devralınır.
+
+
+def start():
+    _get_executor()
+
+
+def load_jobs(chat_id=None, user_id=None, active_only=True, ids=None):
+    with session_scope() as db:
+        q = db.query(Job)
+        if ids is not None:
+            q = q.filter(Job.id.in_(list(ids)))
+        if chat_id is not None:
+            q = q.filter(Job.chat_id == chat_id)
+        if user_id is not None:
+            q = q.filter(Job.user_id == user_id)
+        if active_only:
+            q = q.filter(Job.status.in_(ACTIVE))
+        return q.order_by(Job.created_at).all()
@@ -0,0 +1,310 @@
+import os, re, json, threading
+from datetime import datetime, timedelta
+from collections import OrderedDict
+from typing import Any, List
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from langchain_core.documents import Document as Chunk
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.vectorstores import VectorStore
+
+from database import session_scope, Chat, Document, LibraryDocument
+from providers import get_llm
+from conversation import truncate_tokens
+import ingest, telemetry
+#Ortak belge kütüphanesi: her benzersiz dosya (SHA1) bir kez ayrıştırılır, chunk'lanır ve embedding'i çıkarılır.
+#Sohbetler bu indekse referansla bağlanır (documents.library_id); depolama ve işleme maliyeti yükleme sayısıyla değil
+#benzersiz belge sayısıyla büyür. Erişim: sohbetin sahibi olan kullanıcı; kütüphaneden seçerek eklemek için
+#belgenin sahibi olmak ya da belgenin paylaşılmış (shared) olması gerekir.
+
+
+LIBRARY_ROOT  = "./library_index"
+SHARE_DEFAULT = os.getenv("LIBRARY_SHARE_DEFAULT", "0") == "1"
+MAX_INDEXES   = int(os.getenv("MAX_LIBRARY_INDEXES", 64))
+STALE_AFTER   = timedelta(minutes=5)
+#SHARE_DEFAULT: Yeni yüklenen belgeler kütüphanede herkese görünür mü (sahibi sonradan değiştirebilir).
+#MAX_INDEXES: Süreç içinde açık tutulan en fazla kütüphane indeksi (LRU); tüm sohbetler aynı nesneyi paylaşır.
+
+SUGGESTIONS_ENABLED = os.getenv("SUGGESTED_QUESTIONS_ENABLED", "0") == "1"
+SUGGESTED_QUESTIONS = int(os.getenv("SUGGESTED_QUESTIONS", 3))
+SUGGEST_CHUNKS      = 6
+SUGGEST_TOKEN_CAP   = 1500
+PRIME_PER_WINDOW    = int(os.getenv("PRIME_ANSWERS_PER_WINDOW", 3))
+PRIME_WINDOW        = timedelta(seconds=int(os.getenv("PRIME_ANSWERS_WINDOW", 24 * 3600)))
+#Önerilen sorular ve önceden hesaplanan cevaplar ücretli LLM çağrısıdır: varsayılan kapalı (SUGGESTED_QUESTIONS_ENABLED=1).
+#Sorular belge işlenirken bir kez üretilir (SUGGEST_CHUNKS / SUGGEST_TOKEN_CAP: kullanılan belge başı).
+#Belge başına PRIME_WINDOW içinde en fazla PRIME_PER_WINDOW cevap önceden üretilir (tüm süreçler toplamı).
+
+SUGGEST_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You help students study a document. Given the beginning of the document, write the {n} questions a reader "
+     "is most likely to ask first. Use the document's language. One short question per line, no numbering."),
+    ("human", "Document: {name}\n\n{text}"),
+])
+
+_lock = threading.Lock()
+_indexes = OrderedDict()
+
+
+def library_vector_dir(file_hash):
+    return os.path.join(LIBRARY_ROOT, file_hash)
+
+
+# --Access control--
+def owns_chat(cid, user_id) -> bool:
+    with session_scope() as db:
+        return db.query(Chat.id).filter(Chat.id == cid, Chat.user_id == user_id).first() is not None
+
+
+def visible(user_id, exclude_chat=None):
+    #Kullanıcının kütüphaneden ekleyebileceği belgeler: kendi yükledikleri + paylaşılanlar (indeksi hazır olanlar).
+    with session_scope() as db:
+        q = db.query(LibraryDocument).filter(
+            LibraryDocument.status == "done",
+            or_(LibraryDocument.owner_id == user_id, LibraryDocument.shared.is_(True)),
+        )
+        if exclude_chat is not None:
+            attached = db.query(Document.library_id).filter(
+                Document.chat_id == exclude_chat, Document.library_id.isnot(None)
+            )
+            q = q.filter(LibraryDocument.id.notin_(attached))
+        return q.order_by(LibraryDocument.file_name).all()
+
+
+def owned(user_id, library_ids):
+    #{kütüphane id: paylaşılıyor mu} → sadece kullanıcının sahibi olduğu belgeler (paylaşım ayarını görebilir/değiştirebilir).
+    ids = [i for i in library_ids if i]
+    if not ids:
+        return {}
+    with session_scope() as db:
+        rows = db.query(LibraryDocument.id, LibraryDocument.shared).filter(
+            LibraryDocument.id.in_(ids), LibraryDocument.owner_id == user_id
+        )
+        return {i: bool(shared) for i, shared in rows}
+
+
+def set_shared(library_id, user_id, shared) -> bool:
+    with session_scope() as db:
+        n = db.query(LibraryDocument).filter(
+            LibraryDocument.id == library_id, LibraryDocument.owner_id == user_id
+        ).update({LibraryDocument.shared: bool(shared)})
+    return bool(n)
+#Sadece belgenin sahibi paylaşımı açıp kapatabilir.
+
+
+# --Register / attach--
+def get_or_create(file_hash, path, name, owner_id):
+    #(kütüphane kaydı, yeni mi) → aynı hash için eşzamanlı iki yükleme olsa da tek kayıt oluşur (UNIQUE kısıtı).
+    with session_scope() as db:
+        lib = db.query(LibraryDocument).filter(LibraryDocument.file_hash == file_hash).first()
+        if lib:
+            return lib, False
+    try:
+        with session_scope() as db:
+            lib = LibraryDocument(
+                file_hash=file_hash, file_name=name, file_path=path, owner_id=owner_id,
+                shared=SHARE_DEFAULT, status="queued", vector_dir=library_vector_dir(file_hash),
+            )
+            db.add(lib)
+            db.flush()
+        return lib, True
+    except IntegrityError:
+        with session_scope() as db:
+            return db.query(LibraryDocument).filter(LibraryDocument.file_hash == file_hash).first(), False
+
+
+def attach(cid, lib, name=None):
+    #Sohbete kütüphane belgesine referans veren bir belge kaydı ekler (zaten ekliyse dokunmaz).
+    with session_scope() as db:
+        exists = db.query(Document.id).filter(Document.chat_id == cid, Document.library_id == lib.id).first()
+        if exists:
+            return exists[0]
+        doc = Document(
+            chat_id=cid, file_name=name or lib.file_name, file_path=lib.file_path,
+            vector_dir=lib.vector_dir, library_id=lib.id,
+        )
+        db.add(doc)
+        db.flush()
+        return doc.id
+
+
+def attach_by_id(cid, user_id, library_id):
+    #Kütüphaneden seçerek ekleme: sohbet kullanıcının olmalı, belge onun ya da paylaşılmış olmalı.
+    if not owns_chat(cid, user_id):
+        return None
+    with session_scope() as db:
+        lib = db.query(LibraryDocument).filter(
+            LibraryDocument.id == library_id,
+            or_(LibraryDocument.owner_id == user_id, LibraryDocument.shared.is_(True)),
+        ).first()
+    return attach(cid, lib) if lib else None
+
+
+def claim_retry(library_id) -> bool:
+    #İndeksi kurulamamış (failed) ya da işi hiç kuyruğa alınamamış belge için yeni iş hakkı; tek bir yükleme kazanır.
+    stale = datetime.utcnow() - STALE_AFTER
+    with session_scope() as db:
+        return bool(db.query(LibraryDocument).filter(
+            LibraryDocument.id == library_id,
+            or_(
+                LibraryDocument.status == "failed",
+                and_(LibraryDocument.status == "queued", LibraryDocument.job_id.is_(None),
+                     LibraryDocument.created_at < stale),
+            ),
+        ).update({LibraryDocument.status: "queued"}, synchronize_session=False))
+
+
+def chat_libraries(cid):
+    #Sohbete bağlı kütüphane belgeleri → [(id, durum, vector_dir)]
+    with session_scope() as db:
+        return (
+            db.query(LibraryDocument.id, LibraryDocument.status, LibraryDocument.vector_dir)
+            .join(Document, Document.library_id == LibraryDocument.id)
+            .filter(Document.chat_id == cid)
+            .order_by(LibraryDocument.id)
+            .all()
+        )
+
+
+# --Suggested questions--
+def _parse(text):
+    lines = (re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line).strip() for line in text.splitlines())
+    return [q for q in lines if q.endswith("?")][:SUGGESTED_QUESTIONS]
+
+
+def generate_suggestions(library_id, vs, name):
+    #İngest işinde, indeks kurulduktan hemen sonra çalışır: belge başına tek LLM çağrısı, sohbet açılışında hiç.
+    data = vs.get(include=["documents"], limit=SUGGEST_CHUNKS)
+    text = truncate_tokens("\n\n".join(data["documents"][:SUGGEST_CHUNKS]), SUGGEST_TOKEN_CAP)
+    questions = []
+    if text:
+        chain = SUGGEST_PROMPT | get_llm(temperature=0.0, max_tokens=200) | StrOutputParser()
+        with telemetry.span("library.suggest"):
+            questions = _parse(chain.invoke({"n": SUGGESTED_QUESTIONS, "name": name, "text": text}))
+    set_suggestions(library_id, questions)
+    return questions
+#Metni olmayan belge için boş liste yazılır. Dosya içeriği değişirse hash (dolayısıyla kütüphane kaydı) da değişir.
+
+
+def set_suggestions(library_id, questions):
+    with session_scope() as db:
+        db.query(LibraryDocument).filter(
+            LibraryDocument.id == library_id, LibraryDocument.suggestions.is_(None)
+        ).update({LibraryDocument.suggestions: json.dumps(questions, ensure_ascii=False)}, synchronize_session=False)
+#İlk yazan kazanır: aynı belgeyi yeniden işleyen iki iş farklı listeler yazmaz.
+
+
+def chat_suggestions(cid):
+    #Sohbete bağlı, indeksi hazır belgelerin önerilen soruları → [(kütüphane id, [soru, ...])]
+    with session_scope() as db:
+        rows = (
+            db.query(LibraryDocument.id, LibraryDocument.suggestions)
+            .join(Document, Document.library_id == LibraryDocument.id)
+            .filter(Document.chat_id == cid, LibraryDocument.status == "done",
+                    LibraryDocument.suggestions.isnot(None))
+            .order_by(LibraryDocument.id)
+            .all()
+        )
+    return [(i, json.loads(raw)) for i, raw in rows]
+
+
+def suggestions(cid):
+    return list(dict.fromkeys(q for _, questions in chat_suggestions(cid) for q in questions))
+#Arayüzde gösterilen düz liste (belge sırasıyla, tekrarsız).
+
+
+def take_prime_budget(library_id) -> bool:
+    #Belgenin bu penceredeki önceden cevaplama hakkından bir tane düşer → hak kalmadıysa False.
+    now = datetime.utcnow()
+    with session_scope() as db:
+        if db.query(LibraryDocument).filter(
+            LibraryDocument.id == library_id,
+            or_(LibraryDocument.prime_window.is_(None), LibraryDocument.prime_window < now - PRIME_WINDOW),
+        ).update({LibraryDocument.prime_window: now, LibraryDocument.prime_count: 1}, synchronize_session=False):
+            return PRIME_PER_WINDOW > 0
+        return bool(db.query(LibraryDocument).filter(
+            LibraryDocument.id == library_id, LibraryDocument.prime_count < PRIME_PER_WINDOW,
+        ).update({LibraryDocument.prime_count: LibraryDocument.prime_count + 1}, synchronize_session=False))
+#Sayaç veritabanında: tüm süreçler (API işçileri, Streamlit) aynı bütçeyi paylaşır; koşullu UPDATE ile yarış yok.
+
+
+# --Indexes--
+def open_index(directory):
+    #Kütüphane indeksleri süreç genelinde paylaşılır: yüzlerce sohbet aynı belgeyi kullanıyorsa tek açık depo.
+    with _lock:
+        vs = _indexes.get(directory)
+        if vs is not None:
+            _indexes.move_to_end(directory)
+            return vs
+    vs = ingest.open_vector_store(directory)
+    with _lock:
+        _indexes[directory] = vs
+        if len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return vs
+
+
+def forget_index(directory):
+    with _lock:
+        _indexes.pop(directory, None)
+
+
+def _scored(vs, embedding, k):
+    #Depo türünden bağımsız (belge, alaka) listesi; alaka büyükse daha iyi.
+    if hasattr(vs, "similarity_search_by_vector_with_score"):
+        return vs.similarity_search_by_vector_with_score(embedding, k)
+    relevance = vs._select_relevance_score_fn()
+    return [(d, relevance(dist)) for d, dist in vs.similarity_search_by_vector_with_relevance_scores(embedding, k)]
+
+
+def _store_key(vs):
+    return vs.cache_key() if hasattr(vs, "cache_key") else (vs._persist_directory, vs._collection.count())
+
+
+class ChatIndex(VectorStore):
+    #Bir sohbetin birden fazla indeksi (kütüphane belgeleri + eski sohbet koleksiyonu) tek bir depo gibi görünür.
+    #Soru embedding'i bir kez hesaplanır; her indeksten en iyi k sonuç alınıp alakaya göre birleştirilir.
+    def __init__(self, stores: List[VectorStore]):
+        self.stores = stores
+
+    @property
+    def embeddings(self):
+        return self.stores[0].embeddings
+
+    def cache_key(self):
+        return ("chat-index",) + tuple(sorted((_store_key(vs) for vs in self.stores), key=repr))
+    #Aynı belge kümesini kullanan tüm sohbetler aynı anahtarı (dolayısıyla aynı BM25 indeksini) paylaşır.
+
+    def get(self, include=("documents", "metadatas"), **kwargs):
+        out = {"ids": [], "documents": [], "metadatas": []}
+        for vs in self.stores:
+            data = vs.get(include=list(include))
+            for k in out:
+                out[k].extend(data.get(k) or [])
+        return out
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Chunk]:
+        embedding = self.embeddings.embed_query(query)
+        hits = [h for vs in self.stores for h in _scored(vs, embedding, k)]
+        hits.sort(key=lambda h: -h[1])
+        return [d for d, _ in hits[:k]]
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError("ChatIndex is read-only; documents are added to library indexes")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("ChatIndex is read-only; documents are added to library indexes")
+
+
+def chat_store(cid, legacy_dir=None):
+    #Sohbetin aranabilir deposu: hazır kütüphane indeksleri + (varsa) eski, sohbete özel koleksiyon. Hiçbiri yoksa None.
+    stores = [open_index(d) for _, status, d in chat_libraries(cid) if status == "done" and d and os.path.isdir(d)]
+    if legacy_dir and os.path.isdir(legacy_dir):
+        stores.append(ingest.open_vector_store(legacy_dir))
+    if not stores:
+        return None
+    return stores[0] if len(stores) == 1 else ChatIndex(stores)
+#Tek indeks varsa doğrudan o döner: tek belgeli binlerce sohbet aynı depo ve BM25 nesnesini kullanır.
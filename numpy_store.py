@@ -0,0 +1,287 @@
+import os, json, shutil, tempfile, threading, uuid
+from typing import Any, Iterable, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+#Chroma'ya alternatif yerel vektör deposu: embedding'ler int8 (veya float16) NumPy dizisi olarak diske yazılır ve
+#memory-map ile okunur. Aynı belge (aynı dosya hash'i + model + chunk ayarları) tek bir "segment" olarak saklanır;
+#onu kullanan tüm sohbetler ve süreçler aynı dosyaları, dolayısıyla işletim sisteminin aynı sayfa önbelleğini paylaşır.
+
+
+SEGMENT_ROOT = os.getenv("VECTOR_SEGMENT_ROOT", "./vector_index")
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "int8")
+SEARCH_BLOCK = 65536
+MANIFEST     = "manifest.json"
+#VECTOR_DTYPE: 'int8' (satır başına ölçekli, 4x küçük) veya 'float16' (2x küçük, daha yüksek doğruluk).
+#SEARCH_BLOCK: Arama, segmenti bu kadar satırlık bloklarla tarar; geçici bellek segment boyundan bağımsızdır.
+
+
+def segment_path(key):
+    return os.path.join(SEGMENT_ROOT, key)
+
+
+# --Segments--
+class Segment:
+    #Salt okunur, memory-mapped tek belge: vectors.bin (n×dim), scales.bin (int8 için), records.jsonl + offsets.bin.
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "segment.json")) as f:
+            info = json.load(f)
+        self.n, self.dim, self.dtype = info["n"], info["dim"], np.dtype(info["dtype"])
+        self.vectors = self._map("vectors.bin", self.dtype, (self.n, self.dim))
+        self.scales = self._map("scales.bin", np.float32, (self.n,)) if self.dtype == np.int8 else None
+        self.offsets = self._map("offsets.bin", np.uint64, (self.n + 1,))
+        self._records = open(os.path.join(path, "records.jsonl"), "rb")
+        self._lock = threading.Lock()
+
+    def _map(self, name, dtype, shape):
+        if not shape[0]:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode="r", shape=shape)
+    #np.memmap: veri belleğe kopyalanmaz; sayfalar ihtiyaç oldukça (ve süreçler arasında paylaşılarak) okunur.
+
+    def scores(self, q: np.ndarray) -> np.ndarray:
+        out = np.empty(self.n, dtype=np.float32)
+        for s in range(0, self.n, SEARCH_BLOCK):
+            block = self.vectors[s:s + SEARCH_BLOCK].astype(np.float32)
+            out[s:s + SEARCH_BLOCK] = block @ q
+        if self.scales is not None:
+            out *= self.scales
+        return out
+    #Vektörler birim uzunlukta saklandığı için iç çarpım = kosinüs benzerliği.
+
+    def record(self, i: int) -> dict:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        with self._lock:
+            self._records.seek(start)
+            return json.loads(self._records.read(end - start))
+
+    def records(self):
+        with open(os.path.join(self.path, "records.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+
+_segments = {}
+_segments_lock = threading.Lock()
+
+def open_segment(key) -> Segment:
+    with _segments_lock:
+        seg = _segments.get(key)
+        if seg is None:
+            seg = _segments[key] = Segment(segment_path(key))
+        return seg
+#Süreç içinde de segment başına tek nesne: aynı belgeyi kullanan sohbetler aynı memory-map'i paylaşır.
+
+
+def forget_segment(key):
+    with _segments_lock:
+        _segments.pop(key, None)
+#Silinen segmentin memory-map'i bırakılır (storage_gc).
+
+
+def segment_exists(key) -> bool:
+    return os.path.exists(os.path.join(segment_path(key), "segment.json"))
+
+
+class SegmentWriter:
+    #Segment geçici bir klasöre yazılır, bitince atomik olarak yerine taşınır (yarım segment okunmaz).
+    def __init__(self, key, dtype=VECTOR_DTYPE):
+        self.key, self.dtype = key, np.dtype(dtype)
+        self.final = segment_path(key)
+        self.tmp = f"{self.final}.tmp-{uuid.uuid4().hex}"
+        os.makedirs(self.tmp)
+        self._vectors = open(os.path.join(self.tmp, "vectors.bin"), "wb")
+        self._scales = open(os.path.join(self.tmp, "scales.bin"), "wb")
+        self._records = open(os.path.join(self.tmp, "records.jsonl"), "wb")
+        self.offsets = [0]
+        self.n, self.dim = 0, None
+
+    def add(self, vectors, docs: List[Document]):
+        arr = np.asarray(vectors, dtype=np.float32)
+        arr /= np.maximum(np.linalg.norm(arr, axis=1, keepdims=True), 1e-12)
+        self.dim = arr.shape[1]
+        if self.dtype == np.int8:
+            scale = np.maximum(np.abs(arr).max(axis=1), 1e-12) / 127.0
+            self._vectors.write(np.rint(arr / scale[:, None]).astype(np.int8).tobytes())
+            self._scales.write(scale.astype(np.float32).tobytes())
+        else:
+            self._vectors.write(arr.astype(self.dtype).tobytes())
+        #int8: her satır kendi ölçeğiyle [-127, 127] aralığına sıkıştırılır (simetrik nicemleme).
+        for d in docs:
+            meta = {k: v for k, v in d.metadata.items() if k != "document_id"}
+            line = json.dumps({"text": d.page_content, "metadata": meta}, ensure_ascii=False).encode() + b"\n"
+            self._records.write(line)
+            self.offsets.append(self.offsets[-1] + len(line))
+        #document_id segmentte tutulmaz: aynı segment farklı sohbetlerde farklı belge kayıtlarına bağlıdır.
+        self.n += len(docs)
+
+    def commit(self):
+        for f in (self._vectors, self._scales, self._records):
+            f.close()
+        np.asarray(self.offsets, dtype=np.uint64).tofile(os.path.join(self.tmp, "offsets.bin"))
+        with open(os.path.join(self.tmp, "segment.json"), "w") as f:
+            json.dump({"n": self.n, "dim": self.dim or 0, "dtype": self.dtype.name}, f)
+        try:
+            os.replace(self.tmp, self.final)
+        except OSError:
+            shutil.rmtree(self.tmp, ignore_errors=True)
+            #Aynı belgeyi başka bir süreç aynı anda yazdıysa onunki kullanılır.
+
+    def abort(self):
+        for f in (self._vectors, self._scales, self._records):
+            f.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+# --Store--
+class NumpyVectorStore(VectorStore):
+    #Sohbet klasöründe sadece manifest.json bulunur: [{"document_id": .., "segment": ..}]. Açık bir sohbetin
+    #bellekteki maliyeti bu listedir; vektörler memory-map'ten okunur.
+    def __init__(self, directory: str, embedding_function: Embeddings):
+        self._directory = directory
+        self._embedding = embedding_function
+        self._entries = self._load_manifest()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self._directory, MANIFEST)) as f:
+                return json.load(f)["segments"]
+        except FileNotFoundError:
+            return []
+
+    def _save_manifest(self):
+        os.makedirs(self._directory, exist_ok=True)
+        path = os.path.join(self._directory, MANIFEST)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"segments": self._entries}, f)
+        os.replace(f"{path}.tmp", path)
+
+    def cache_key(self):
+        return self._directory, tuple((e["document_id"], e["segment"]) for e in self._entries)
+    #BM25 indeksi önbelleği için: belge eklenip silinince anahtar değişir.
+
+    def segments(self):
+        return [e["segment"] for e in self._entries]
+
+    # Yazma
+    def add_document(self, batches: Iterable[List[Document]], document_id, key, on_progress=None):
+        #Belgenin segmenti zaten varsa (aynı dosya başka bir sohbette işlendiyse) embedding hiç yapılmaz.
+        if segment_exists(key):
+            os.utime(segment_path(key))
+            #Yeniden kullanılan segment "yeni" işaretlenir: temizlik (storage_gc) onu bu arada yetim sanıp silmez.
+            seg = open_segment(key)
+            if on_progress and seg.n:
+                on_progress(1, seg.n, seg.record(seg.n - 1)["metadata"].get("page"))
+            #Kalan gruplar hiç okunmaz (PDF tekrar ayrıştırılıp chunk'lanmaz); tamamlanma bir kez bildirilir.
+        else:
+            writer = SegmentWriter(key)
+            try:
+                done = 0
+                for i, batch in enumerate(batches, start=1):
+                    writer.add(self._embedding.embed_documents([d.page_content for d in batch]), batch)
+                    done += len(batch)
+                    if on_progress:
+                        on_progress(i, done, batch[-1].metadata.get("page"))
+            except BaseException:
+                writer.abort()
+                raise
+            writer.commit()
+        self._link(document_id, key, replace=True)
+        return self
+
+    def _link(self, document_id, key, replace):
+        if replace:
+            self._entries = [e for e in self._entries if e["document_id"] != document_id]
+        self._entries.append({"document_id": document_id, "segment": key})
+        self._save_manifest()
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        document_id = metadatas[0].get("document_id") if metadatas else None
+        key = f"anon-{uuid.uuid4().hex}"
+        writer = SegmentWriter(key)
+        try:
+            docs = [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)]
+            writer.add(self._embedding.embed_documents(texts), docs)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.commit()
+        self._link(document_id, key, replace=False)
+        #Genel VectorStore arayüzü: her çağrı ayrı (paylaşılmayan) bir segment oluşturur.
+        return [f"{document_id}:{i}" for i in range(len(texts))]
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, directory=None, **kwargs):
+        store = cls(directory or tempfile.mkdtemp(prefix="numpy_store_"), embedding)
+        store.add_texts(texts, metadatas)
+        return store
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        drop = {i.rsplit(":", 1)[0] for i in ids or []}
+        self._entries = [e for e in self._entries if str(e["document_id"]) not in drop]
+        self._save_manifest()
+        return True
+    #Silme belge düzeyindedir: id'ler "<document_id>:<satır>" biçimindedir, belgenin segment bağlantısı kaldırılır.
+    #Segment dosyası başka sohbetler kullanıyor olabileceği için burada silinmez.
+
+    # Okuma
+    def get(self, where: Optional[dict] = None, include=("documents", "metadatas"), limit: Optional[int] = None):
+        out = {"ids": [], "documents": [], "metadatas": []}
+        want = (where or {}).get("document_id")
+        for e in self._entries:
+            if want is not None and e["document_id"] != want:
+                continue
+            seg = open_segment(e["segment"])
+            if "documents" in include or "metadatas" in include:
+                for i, r in enumerate(seg.records()):
+                    if limit is not None and len(out["ids"]) >= limit:
+                        break
+                    out["ids"].append(f"{e['document_id']}:{i}")
+                    out["documents"].append(r["text"])
+                    out["metadatas"].append({**r["metadata"], "document_id": e["document_id"]})
+            else:
+                out["ids"].extend(f"{e['document_id']}:{i}" for i in range(seg.n))
+        return out
+    #Chroma'nın get() biçimi: BM25 indeksi ve belge silme aynı kodla çalışır.
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4):
+        q = np.asarray(embedding, dtype=np.float32)
+        q /= max(float(np.linalg.norm(q)), 1e-12)
+        hits = []
+        for e in self._entries:
+            seg = open_segment(e["segment"])
+            if not seg.n:
+                continue
+            scores = seg.scores(q)
+            top = np.argpartition(-scores, min(k, seg.n) - 1)[:k] if seg.n > k else np.arange(seg.n)
+            hits.extend((float(scores[i]), e["document_id"], seg, int(i)) for i in top)
+        hits.sort(key=lambda h: -h[0])
+        docs = []
+        for score, document_id, seg, i in hits[:k]:
+            r = seg.record(i)
+            docs.append((Document(page_content=r["text"], metadata={**r["metadata"], "document_id": document_id}), score))
+        return docs
+    #Vektörel kaba kuvvet (brute-force) arama: her segmentte en iyi k aday, sonra birleştirilir.
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [d for d, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any):
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k)
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
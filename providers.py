@@ -0,0 +1,186 @@
+import os, hashlib, math, random, threading, time
+from collections import OrderedDict
+
+from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.prompts import ChatPromptTemplate
+from langchain.chains import create_retrieval_chain
+from langchain.chains.combine_documents import create_stuff_documents_chain
+
+from embedding_scheduler import ScheduledEmbeddings
+#Model istemcileri, prompt ve zincirler süreç başına bir kez kurulur ve tüm sorularda yeniden kullanılır.
+
+
+LLM_MODEL       = "models/gemini-2.5-flash-preview-04-17"
+EMBEDDING_MODEL = "models/embedding-001"
+MODEL_PROVIDER  = os.getenv("MODEL_PROVIDER", os.getenv("LLM_PROVIDER", "google"))
+#MODEL_PROVIDER=fake: İnternet/API anahtarı olmadan çalışan deterministik sahte LLM ve embedding (test ve benchmark için).
+
+SYSTEM_PROMPT = (
+    "You are an assistant for question‑answering tasks. "
+    "Answer in at most three sentences using the provided context."
+)
+QA_PROMPT = ChatPromptTemplate.from_messages(
+    [("system", SYSTEM_PROMPT), ("human", "{history}Context: {context}\n\nQuestion: {input}")]
+).partial(history="")
+#Prompt şablonu değişmediği için modül yüklenirken bir kez derlenir.
+#history: "Conversation so far: ...\n\n" (özet + son mesajlar) veya boş; verilmezse prompt eskisiyle aynıdır.
+
+_lock = threading.Lock()
+_llms, _embeddings, _scheduled, _doc_chains = {}, {}, {}, {}
+_qa_chains = OrderedDict()
+MAX_QA_CHAINS = 64
+#Sohbet başına zincir önbelleği sınırlıdır; en eski kullanılan zincir düşürülür.
+
+
+# --Providers--
+class FakeEmbeddings(Embeddings):
+    #Yerel sahte embedding uç noktası: metnin hash'inden belirli (deterministik) vektör üretir.
+    #latency ile gecikme, error_rate ile rastgele 429 (kota) hatası eklenebilir.
+    def __init__(self, size=768, latency=0.0, error_rate=0.0, seed=None):
+        self.size, self.latency, self.error_rate = size, latency, error_rate
+        self._rng = random.Random(seed)
+        self.calls = 0
+
+    def _vector(self, text):
+        digest = hashlib.sha256(text.encode()).digest()
+        rng = random.Random(digest)
+        vec = [rng.gauss(0, 1) for _ in range(self.size)]
+        norm = math.sqrt(sum(x * x for x in vec))
+        return [x / norm for x in vec]
+
+    def _request(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise RuntimeError("429 Resource has been exhausted (e.g. check quota).")
+
+    def embed_documents(self, texts):
+        self._request()
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        self._request()
+        return self._vector(text)
+
+
+class GoogleProvider:
+    rewrites_questions = True
+
+    def llm(self, model, temperature, max_tokens):
+        return ChatGoogleGenerativeAI(
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            convert_system_message_to_human=True,
+        )
+        #Aynı istemci nesnesi tekrar kullanıldığı için alttaki gRPC/HTTP bağlantısı da sorular arasında açık kalır.
+
+    def embeddings(self, model):
+        return GoogleGenerativeAIEmbeddings(model=model)
+
+
+class FakeProvider:
+    ANSWER = "This is an offline answer streamed by the fake model."
+    rewrites_questions = False
+    #Sabit cevap veren model takip sorusunu bu metinle değiştirirdi; çevrimdışı çalışmada soru olduğu gibi aranır.
+
+    def llm(self, model, temperature, max_tokens):
+        return FakeListChatModel(
+            responses=[self.ANSWER], sleep=float(os.getenv("FAKE_LLM_TOKEN_DELAY", 0.02))
+        )
+        #Cevabı karakter karakter yayınlar; FAKE_LLM_TOKEN_DELAY ile üretim gecikmesi taklit edilir.
+
+    def embeddings(self, model):
+        return FakeEmbeddings(
+            latency=float(os.getenv("FAKE_EMBED_LATENCY", 0)),
+            error_rate=float(os.getenv("FAKE_EMBED_ERROR_RATE", 0)),
+        )
+
+
+PROVIDERS = {"google": GoogleProvider, "fake": FakeProvider}
+_provider = None
+
+def register_provider(name, factory):
+    PROVIDERS[name] = factory
+#Yeni bir sağlayıcı (ör. yerel model sunucusu) llm() ve embeddings() metotları olan bir sınıfla eklenir.
+
+
+def set_provider(name):
+    global MODEL_PROVIDER, _provider
+    with _lock:
+        MODEL_PROVIDER, _provider = name, None
+        for cache in (_llms, _embeddings, _scheduled, _doc_chains, _qa_chains):
+            cache.clear()
+#Çalışma anında sağlayıcı değiştirilir (benchmark'lar için); önbelleğe alınmış istemci ve zincirler atılır.
+
+
+def _get_provider():
+    global _provider
+    if _provider is None:
+        _provider = PROVIDERS[MODEL_PROVIDER]()
+    return _provider
+
+
+def rewrites_questions() -> bool:
+    return getattr(_get_provider(), "rewrites_questions", True)
+#Sağlayıcının modeli takip sorularını yeniden yazmak için kullanılabilir mi (kayıtlı sağlayıcılarda varsayılan: evet).
+
+
+# --Clients--
+def get_llm(model=LLM_MODEL, temperature=0.3, max_tokens=500):
+    key = (MODEL_PROVIDER, model, temperature, max_tokens)
+    with _lock:
+        llm = _llms.get(key)
+        if llm is None:
+            llm = _llms[key] = _get_provider().llm(model, temperature, max_tokens)
+        return llm
+
+
+def get_embeddings(model=EMBEDDING_MODEL):
+    with _lock:
+        emb = _embeddings.get(model)
+        if emb is None:
+            emb = _embeddings[model] = _get_provider().embeddings(model)
+        return emb
+
+
+def get_scheduled_embeddings(model=EMBEDDING_MODEL):
+    emb = get_embeddings(model)
+    with _lock:
+        sched = _scheduled.get(model)
+        if sched is None:
+            sched = _scheduled[model] = ScheduledEmbeddings(emb)
+        return sched
+#Toplu embedding için: gruplama + eşzamanlılık + hız sınırı. Hız sınırı API anahtarı başına olduğu için süreçte tek örnek kullanılır.
+
+
+# --Chains--
+def get_documents_chain(llm=None):
+    llm = llm or get_llm()
+    with _lock:
+        chain = _doc_chains.get(id(llm))
+        if chain is None:
+            chain = _doc_chains[id(llm)] = (llm, create_stuff_documents_chain(llm, QA_PROMPT))
+        return chain[1]
+#Prompt + LLM kısmı (stuff documents chain) retriever'dan bağımsızdır; model başına bir kez kurulur.
+
+
+def get_qa_chain(retr, llm=None):
+    doc_chain = get_documents_chain(llm)
+    key = (id(retr), id(doc_chain))
+    with _lock:
+        entry = _qa_chains.get(key)
+        if entry is None:
+            entry = _qa_chains[key] = (retr, create_retrieval_chain(retr, doc_chain))
+            if len(_qa_chains) > MAX_QA_CHAINS:
+                _qa_chains.popitem(last=False)
+        else:
+            _qa_chains.move_to_end(key)
+        return entry[1]
+#LangChain zinciri kurulur
+#Retriever → bağlamı bulur
+#Prompt + LLM → cevabı üretir
+#Nesneler (retr, llm) kayıtta tutulduğu için id() değerleri başka bir nesneye geçmez.
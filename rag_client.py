@@ -0,0 +1,85 @@
+import os, json
+from http.client import HTTPConnection
+from urllib.parse import urlsplit, urlencode
+#api.py servisinin HTTP istemcisi (sadece standart kütüphane). RAG_API_URL tanımlıysa Streamlit arayüzü
+#soru cevaplama ve belge yüklemeyi süreç içinde yapmak yerine bu servise gönderir.
+#Her istek giriş yapan kullanıcının oturum token'ı ile (Authorization: Bearer) gönderilir; servis kullanıcıyı
+#token'dan bulur ve sohbetin o kullanıcıya ait olduğunu kontrol eder.
+
+
+RAG_API_URL = os.getenv("RAG_API_URL", "")
+#Örn. http://127.0.0.1:8000 (python -m api --workers 4). Boşsa her şey Streamlit sürecinde çalışır.
+TIMEOUT = float(os.getenv("RAG_API_TIMEOUT", 120))
+
+
+def _connection():
+    url = urlsplit(RAG_API_URL)
+    return HTTPConnection(url.hostname, url.port or 80, timeout=TIMEOUT)
+
+
+def _check(resp):
+    if resp.status >= 400:
+        raise RuntimeError(f"RAG API {resp.status}: {resp.read().decode(errors='replace')}")
+
+
+class Client:
+    #rag_service ile aynı arayüz (iter_answer, add_document, warm, suggestions); kimlik oturum token'ıdır.
+    def __init__(self, token):
+        self.token = token
+
+    def _headers(self, content_type=None):
+        headers = {"Authorization": f"Bearer {self.token}"}
+        if content_type:
+            headers["Content-Type"] = content_type
+        return headers
+
+    def iter_answer(self, cid, question):
+        #rag_service.iter_answer ile aynı olayları (dict) üretir; cevap servis tarafından NDJSON olarak akıtılır.
+        conn = _connection()
+        try:
+            conn.request(
+                "POST", f"/chats/{cid}/ask/stream",
+                body=json.dumps({"question": question}),
+                headers=self._headers("application/json"),
+            )
+            resp = conn.getresponse()
+            _check(resp)
+            for line in resp:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            conn.close()
+
+    def add_document(self, cid, user_id, fileobj, name):
+        #user_id gönderilmez: servis kullanıcıyı token'dan bulur (arayüz rag_service.add_document ile aynı kalır).
+        conn = _connection()
+        try:
+            conn.request(
+                "POST", f"/chats/{cid}/documents?{urlencode({'name': name})}",
+                body=fileobj,
+                headers=self._headers("application/octet-stream"),
+            )
+            resp = conn.getresponse()
+            _check(resp)
+            return json.loads(resp.read())["job_id"]
+        finally:
+            conn.close()
+    #Dosya gövdesi parça parça gönderilir (http.client dosya nesnelerini bloklar halinde okur).
+
+    def warm(self, cid):
+        conn = _connection()
+        try:
+            conn.request("POST", f"/chats/{cid}/warm", headers=self._headers())
+            _check(conn.getresponse())
+        finally:
+            conn.close()
+
+    def suggestions(self, cid):
+        conn = _connection()
+        try:
+            conn.request("GET", f"/chats/{cid}/suggestions", headers=self._headers())
+            resp = conn.getresponse()
+            _check(resp)
+            return json.loads(resp.read())
+        finally:
+            conn.close()
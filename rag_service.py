@@ -0,0 +1,211 @@
+import os, asyncio, threading
+from collections import OrderedDict
+
+from sqlalchemy import func
+
+from database import session_scope, Chat, Document, Job
+from chunking import count_tokens
+from providers import SYSTEM_PROMPT, get_documents_chain
+from retrieval import build_retriever
+import answer_cache, conversation, ingest, ingest_worker, library, telemetry, write_buffer
+#RAG çekirdeği (Streamlit'ten bağımsız): retriever → soru yeniden yazma → cevap önbelleği → arama → üretim → kayıt.
+#Aynı fonksiyonlar hem Streamlit arayüzünde (süreç içi) hem de asyncio HTTP servisinde (api.py) kullanılır.
+
+
+MAX_RETRIEVERS = int(os.getenv("MAX_RETRIEVERS", 32))
+NOT_READY  = "The document is still being processed, please try again in a moment."
+NO_DOCUMENT = "Please upload a document first."
+
+_lock = threading.Lock()
+_retrievers = OrderedDict()
+#Süreç genelinde sohbet başına retriever (LRU). Tüm oturumlar / istekler aynı nesneyi paylaşır.
+
+
+# --Retrievers--
+def _generation(cid):
+    with session_scope() as db:
+        vector_dir = db.query(Chat.vector_dir).filter(Chat.id == cid).scalar()
+        last_job = db.query(func.max(Job.id)).filter(Job.chat_id == cid, Job.status == "done").scalar()
+        documents = db.query(func.count(Document.id)).filter(Document.chat_id == cid).scalar()
+    libraries = tuple((i, status) for i, status, _ in library.chat_libraries(cid))
+    if not vector_dir and not any(status == "done" for _, status in libraries):
+        return None
+    return vector_dir, last_job, documents, libraries
+#Sohbetin aranabilir içeriğinin "sürümü": başka bir süreç (işçi) belge ekleyip silince veya bağlı bir kütüphane
+#indeksi hazır olunca değişir ve retriever yeniden açılır.
+
+
+def get_retriever(cid):
+    gen = _generation(cid) if cid else None
+    if gen is None:
+        return None
+    with _lock:
+        entry = _retrievers.get(cid)
+        if entry is not None and entry[0] == gen:
+            _retrievers.move_to_end(cid)
+            return entry[1]
+    if entry is not None and gen[0]:
+        ingest.reopen_vector_store(gen[0])
+        #Sohbete özel (eski) koleksiyon başka süreçte değişmiş olabilir: sadece bu klasörün istemcisi yeniden açılır.
+        #Kütüphane indeksleri "done" olduktan sonra değişmez; yeni hazır olanlar zaten ilk kez açılır.
+    vs = library.chat_store(cid, gen[0])
+    if vs is None:
+        return None
+    retr = build_retriever(vs)
+    #Kütüphane indeksleri (+ varsa eski sohbet koleksiyonu) tek bir depo olarak aranır.
+    with _lock:
+        _retrievers[cid] = (gen, retr)
+        _retrievers.move_to_end(cid)
+        if len(_retrievers) > MAX_RETRIEVERS:
+            _retrievers.popitem(last=False)
+    return retr
+
+
+def has_active_jobs(cid):
+    if ingest_worker.load_jobs(chat_id=cid):
+        return True
+    return any(status in ingest_worker.ACTIVE for _, status, _ in library.chat_libraries(cid))
+#Aynı dosyanın indeksi başka bir sohbetin işiyle kuruluyor olabilir.
+
+
+# --Ingest--
+def add_document(cid, user_id, fileobj, name):
+    #Dosyayı kalıcı klasöre yazar, sohbeti kütüphanedeki indekse bağlar → indeksi kuran (veya kurmuş olan) işin id'si.
+    #Dosya kütüphanede zaten varsa ayrıştırma ve embedding hiç yapılmaz; sohbet mevcut indekse referansla eklenir.
+    if not library.owns_chat(cid, user_id):
+        raise PermissionError(f"chat {cid} does not belong to user {user_id}")
+    file_hash, path = ingest.save_upload(fileobj, name)
+    lib, created = library.get_or_create(file_hash, path, name, user_id)
+    library.attach(cid, lib, name)
+    if created or library.claim_retry(lib.id):
+        return ingest_worker.submit(cid, user_id, name, path, file_hash, library_id=lib.id)
+    return lib.job_id
+
+
+# --Persist--
+def save_turn(cid, question, answer):
+    mid = write_buffer.add_messages(cid, [("user", question), ("assistant", answer)]).result()[-1]
+    #Soru-cevap çifti write-behind tamponuna gider; eşzamanlı cevaplar tek transaction'da yazılır (group commit).
+    conversation.schedule_fold(cid)
+    #Eski mesajlar arka planda sohbet özetine katlanır.
+    return mid
+
+
+# --Answer--
+def _qa_inputs(q, docs, history):
+    return {
+        "input": q,
+        "context": docs,
+        "history": f"Conversation so far:\n{history}\n\n" if history else "",
+    }
+#history: conversation.history_for_chat çıktısı (HISTORY_TOKEN_CAP ile sınırlı).
+
+
+def _record_prompt(q, docs, history):
+    telemetry.record_tokens(
+        "prompt",
+        count_tokens(SYSTEM_PROMPT) + count_tokens(history) + count_tokens(q)
+        + sum(count_tokens(d.page_content) for d in docs),
+    )
+
+
+async def astream_answer(cid, question, llm=None):
+    #Olay akışı (dict):
+    #  {"type": "question", "question": ...}  → takip sorusu bağımsız soruya çevrildiyse
+    #  {"type": "token", "text": ...}         → cevap parçaları
+    #  {"type": "done", "answer", "message_id", "question", "cached"}
+    #Engelleyen işler (SQLite, Chroma, BM25, embedding) thread havuzunda; LLM çağrıları asenkron yapılır.
+    retr = await asyncio.to_thread(get_retriever, cid)
+    if retr is None:
+        answer = NOT_READY if await asyncio.to_thread(has_active_jobs, cid) else NO_DOCUMENT
+        yield {"type": "token", "text": answer}
+        mid = await asyncio.to_thread(save_turn, cid, question, answer)
+        yield {"type": "done", "answer": answer, "message_id": mid, "question": question, "cached": False}
+        return
+
+    history = await asyncio.to_thread(conversation.history_for_chat, cid)
+    q = await conversation.arewrite_question(question, history)
+    if q != question:
+        yield {"type": "question", "question": q}
+    #Takip sorusu ("peki ikincisi?") geçmişe göre bağımsız bir soruya çevrilir; arama bu soruyla yapılır.
+
+    doc_key = await asyncio.to_thread(answer_cache.doc_key_for_chat, cid)
+    with telemetry.span("answer_cache.lookup"):
+        answer, qvec = (
+            await asyncio.to_thread(answer_cache.lookup, doc_key, q) if doc_key else (None, None)
+        )
+    telemetry.inc("rag_questions_total", cached=str(bool(answer)).lower())
+    cached = bool(answer)
+    if cached:
+        yield {"type": "token", "text": answer}
+    else:
+        with telemetry.span("retrieval"):
+            docs = await asyncio.to_thread(retr.invoke, q)
+        _record_prompt(q, docs, history)
+        parts = []
+        with telemetry.span("generation"):
+            start = asyncio.get_running_loop().time()
+            async for chunk in get_documents_chain(llm).astream(_qa_inputs(q, docs, history)):
+                if not parts:
+                    telemetry.observe("rag_time_to_first_token_seconds", asyncio.get_running_loop().time() - start)
+                parts.append(chunk)
+                yield {"type": "token", "text": chunk}
+        answer = "".join(parts)
+        telemetry.record_tokens("completion", count_tokens(answer))
+        if doc_key and not history:
+            await asyncio.to_thread(answer_cache.store, doc_key, q, qvec, answer)
+        #Önbellek anahtarı aynı dosyayı kullanan tüm kullanıcılarda ortaktır: sohbetin geçmişiyle (özet + son mesajlar)
+        #üretilen cevap başka birinin konuşmasından metin taşıyabilir, bu yüzden sadece geçmişsiz cevaplar saklanır.
+
+    mid = await asyncio.to_thread(save_turn, cid, question, answer)
+    yield {"type": "done", "answer": answer, "message_id": mid, "question": q, "cached": cached}
+
+
+def prime_answer(cid, retr, question, doc_key=None, budget=None):
+    #Soruyu sohbetin cevap önbelleğine önceden yazar (önerilen sorular) → önbellekte zaten varsa ya da
+    #budget() hak vermezse False. Bütçe sadece gerçekten üretim yapılacaksa (önbellekte yoksa) harcanır.
+    doc_key = doc_key or answer_cache.doc_key_for_chat(cid)
+    if not doc_key:
+        return False
+    answer, qvec = answer_cache.lookup(doc_key, question)
+    if answer or (budget and not budget()):
+        return False
+    with telemetry.span("retrieval"):
+        docs = retr.invoke(question)
+    with telemetry.span("generation"):
+        answer = get_documents_chain().invoke(_qa_inputs(question, docs, ""))
+    telemetry.record_tokens("completion", count_tokens(answer))
+    answer_cache.store(doc_key, question, qvec, answer)
+    return True
+#Geçmiş boş: önerilen sorular sohbetin ilk sorusu olarak sorulur (yeniden yazma yapılmaz).
+
+
+def suggestions(cid):
+    return library.suggestions(cid)
+
+
+def warm(cid):
+    import warmup
+    warmup.schedule(cid)
+#Sohbet açıldığında / belge hazır olduğunda çağrılır; iş arka planda yapılır, çağıran beklemez.
+
+
+async def aanswer(cid, question, llm=None):
+    async for event in astream_answer(cid, question, llm):
+        if event["type"] == "done":
+            return event
+
+
+def iter_answer(cid, question, llm=None):
+    #Senkron köprü (Streamlit script thread'i için): asenkron akışı kendi olay döngüsünde adım adım çalıştırır.
+    loop = asyncio.new_event_loop()
+    agen = astream_answer(cid, question, llm)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.close()
@@ -0,0 +1,148 @@
+import os, re, math, threading
+from collections import Counter, OrderedDict
+from typing import Any, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from chunking import count_tokens
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:
+    CrossEncoder = None
+#İsteğe bağlı yerel reranker. Kurulu değilse sıralama RRF ile kalır.
+#Hibrit arama: vektör benzerliği + anahtar kelime (BM25) sonuçları Reciprocal Rank Fusion ile birleştirilir,
+#ardından bağlam, prompt'a sığacak token bütçesine göre kırpılır.
+
+
+RETRIEVAL_MODE       = os.getenv("RETRIEVAL_MODE", "hybrid")
+VECTOR_K             = int(os.getenv("RETRIEVAL_VECTOR_K", 20))
+KEYWORD_K            = int(os.getenv("RETRIEVAL_KEYWORD_K", 20))
+RRF_K                = 60
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500))
+RERANKER_MODEL       = os.getenv("RERANKER_MODEL", "")
+#RETRIEVAL_MODE=vector: eski davranış (sadece benzerlik araması, k=10).
+#RERANKER_MODEL örn. "cross-encoder/ms-marco-MiniLM-L-6-v2" (sentence-transformers gerekir).
+
+
+# --Tokens--
+def tokenize(text: str) -> List[str]:
+    text = text.replace("I", "ı").replace("İ", "i").lower()
+    return re.findall(r"\w+", text, re.UNICODE)
+#BM25 için terimler: Türkçe küçük harf + kelimeler. "BIL304", "madde 12" gibi tam terimler korunur.
+
+
+# --BM25--
+class BM25Index:
+    def __init__(self, docs: List[Document], k1: float = 1.5, b: float = 0.75):
+        self.docs, self.k1, self.b = docs, k1, b
+        self.postings = {}
+        self.lengths = []
+        for i, d in enumerate(docs):
+            tf = Counter(tokenize(d.page_content))
+            self.lengths.append(sum(tf.values()))
+            for term, n in tf.items():
+                self.postings.setdefault(term, []).append((i, n))
+        self.avgdl = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        #Ters indeks (terim → [(chunk no, frekans)]): sorgu sadece sorgu terimlerini içeren chunk'ları dolaşır.
+
+    def search(self, query: str, k: int) -> List[Document]:
+        n = len(self.docs)
+        scores = Counter()
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for i, tf in plist:
+                norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avgdl)
+                scores[i] += idf * tf * (self.k1 + 1) / norm
+        return [self.docs[i] for i, _ in scores.most_common(k)]
+
+
+_bm25_cache = OrderedDict()
+_bm25_lock = threading.Lock()
+MAX_BM25_INDEXES = 32
+
+def get_bm25(vs) -> BM25Index:
+    key = vs.cache_key() if hasattr(vs, "cache_key") else (vs._persist_directory, vs._collection.count())
+    #NumPy deposu kendi anahtarını verir (manifest'teki segmentler).
+    #Koleksiyondaki kayıt sayısı değişince (belge eklendi/silindi) indeks yeniden kurulur.
+    with _bm25_lock:
+        idx = _bm25_cache.get(key)
+        if idx is not None:
+            _bm25_cache.move_to_end(key)
+            return idx
+    data = vs.get(include=["documents", "metadatas"])
+    docs = [Document(page_content=t, metadata=m or {}) for t, m in zip(data["documents"], data["metadatas"])]
+    idx = BM25Index(docs)
+    with _bm25_lock:
+        _bm25_cache[key] = idx
+        if len(_bm25_cache) > MAX_BM25_INDEXES:
+            _bm25_cache.popitem(last=False)
+    return idx
+#Aynı sohbeti açan tüm oturumlar aynı indeksi paylaşır.
+
+
+# --Fusion / rerank / budget--
+def _doc_key(d: Document):
+    return (d.metadata.get("document_id"), d.metadata.get("page"), d.page_content)
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Document]], k: int = RRF_K) -> List[Document]:
+    scores, docs = Counter(), {}
+    for ranked in ranked_lists:
+        for rank, d in enumerate(ranked):
+            key = _doc_key(d)
+            scores[key] += 1.0 / (k + rank + 1)
+            docs.setdefault(key, d)
+    return [docs[key] for key, _ in scores.most_common()]
+#RRF: skorlar yerine sıralar birleştirilir; iki listenin skor ölçekleri farklı olsa da adil sonuç verir.
+
+
+_reranker = None
+
+def rerank(query: str, docs: List[Document]) -> List[Document]:
+    global _reranker
+    if not (RERANKER_MODEL and CrossEncoder and docs):
+        return docs
+    if _reranker is None:
+        _reranker = CrossEncoder(RERANKER_MODEL)
+    scores = _reranker.predict([(query, d.page_content) for d in docs])
+    return [d for _, d in sorted(zip(scores, docs), key=lambda p: -p[0])]
+
+
+def trim_to_budget(docs: List[Document], budget: int = CONTEXT_TOKEN_BUDGET) -> List[Document]:
+    kept, used = [], 0
+    for d in docs:
+        n = count_tokens(d.page_content)
+        if kept and used + n > budget:
+            break
+        kept.append(d)
+        used += n
+    return kept
+#En alakalı chunk'lardan başlanarak bütçe dolana kadar eklenir (en az bir chunk her zaman kalır).
+
+
+# --Retriever--
+class HybridRetriever(BaseRetriever):
+    vectorstore: Any
+    vector_k: int = VECTOR_K
+    keyword_k: int = KEYWORD_K
+    token_budget: int = CONTEXT_TOKEN_BUDGET
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: Optional[CallbackManagerForRetrieverRun] = None
+    ) -> List[Document]:
+        vector_hits = self.vectorstore.similarity_search(query, k=self.vector_k)
+        keyword_hits = get_bm25(self.vectorstore).search(query, self.keyword_k)
+        fused = reciprocal_rank_fusion([vector_hits, keyword_hits])
+        return trim_to_budget(rerank(query, fused), self.token_budget)
+
+
+def build_retriever(vs):
+    if RETRIEVAL_MODE == "vector":
+        return vs.as_retriever(search_type="similarity", search_kwargs={"k": 10})
+    return HybridRetriever(vectorstore=vs)
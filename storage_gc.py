@@ -0,0 +1,309 @@
+#Kullanım: python -m storage_gc   (tek seferlik temizlik, rapor yazdırır)
+#Yüklenen dosyalar ve vektör klasörleri için referans sayımı ve arka plan temizliği (GC + sıkıştırma).
+#Referanslar veritabanındadır: documents.file_path / vector_dir, chats.vector_dir, aktif işlerin dosyaları;
+#NumPy segmentlerine sohbet manifest'leri referans verir. Hiçbir kaydın göstermediği dosya/klasör yetimdir.
+import os, re, json, shutil, sqlite3, threading, time, traceback
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from sqlalchemy import func
+
+from database import session_scope, init_db, Chat, Document, Job, LibraryDocument
+import ingest, ingest_worker, library, numpy_store, telemetry
+
+
+GC_INTERVAL      = int(os.getenv("GC_INTERVAL_SECONDS", 3600))
+GC_GRACE         = int(os.getenv("GC_GRACE_SECONDS", 600))
+COMPACT_MIN_BYTES = int(os.getenv("GC_COMPACT_MIN_BYTES", 8 * 1024 * 1024))
+#GC_GRACE: Bu süreden yeni dosya/klasöre dokunulmaz (kaydı henüz yazılmamış, yüklenmekte olan dosyalar).
+#COMPACT_MIN_BYTES: Chroma veritabanında en az bu kadar boş sayfa birikince VACUUM ile sıkıştırılır.
+
+_CHAT_DIR_RE = re.compile(r"chat_(\d+)(?:_[0-9a-f]+)?")
+#Sohbet koleksiyonları: chat_<id> ve ilk sürümün her yükleme için açtığı chat_<id>_<uuid> klasörleri.
+
+_lock = threading.Lock()
+_last = {"runs": 0, "bytes_freed": 0, "files": 0, "dirs": 0, "segments": 0, "compacted": 0, "seconds": 0.0}
+
+
+def _norm(path):
+    return os.path.normcase(os.path.abspath(path)) if path else None
+
+
+def _size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(r, f)) for r, _, fs in os.walk(path) for f in fs)
+
+
+def _old(path, now):
+    try:
+        newest = os.path.getmtime(path)
+        for r, _, fs in os.walk(path):
+            newest = max([newest] + [os.path.getmtime(os.path.join(r, f)) for f in fs])
+        return now - newest > GC_GRACE
+    except FileNotFoundError:
+        return False
+#Klasörlerde içindeki en yeni dosyaya bakılır: yazılmakta olan bir segment/koleksiyon yeni sayılır.
+
+
+def _remove(path):
+    #Silinen bayt sayısını döndürür; bu arada başka süreç sildiyse 0.
+    try:
+        size = _size(path)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
+
+
+# --Reference counts--
+def file_refs(path) -> int:
+    with session_scope() as db:
+        docs = db.query(func.count(Document.id)).filter(Document.file_path == path).scalar()
+        jobs = db.query(func.count(Job.id)).filter(
+            Job.file_path == path, Job.status.in_(ingest_worker.ACTIVE)
+        ).scalar()
+        libs = db.query(func.count(LibraryDocument.id)).filter(LibraryDocument.file_path == path).scalar()
+    return docs + jobs + libs
+#Kütüphane kaydı dosyayı tutar (yeniden işleme için); kayıt, hiçbir sohbet kullanmayınca collect() ile silinir.
+
+
+def release_file(path) -> int:
+    #Belge kaydı silindikten sonra çağrılır: dosyayı başka sohbet/iş kullanmıyorsa hemen siler.
+    if not path or file_refs(path):
+        return 0
+    return _remove(path)
+#Aynı içerik (aynı hash) birden fazla sohbete yüklenebilir; son referans gidene kadar dosya korunur.
+
+
+def release_vector_dir(cid, directory) -> int:
+    if not directory:
+        return 0
+    with session_scope() as db:
+        refs = db.query(func.count(Chat.id)).filter(Chat.vector_dir == directory).scalar() + \
+            db.query(func.count(Document.id)).filter(Document.vector_dir == directory).scalar() + \
+            db.query(func.count(LibraryDocument.id)).filter(LibraryDocument.vector_dir == directory).scalar()
+    if refs:
+        return 0
+    with ingest_worker.chat_write_lock(cid, directory):
+        freed = _remove(directory)
+    #Klasöre o sırada yazan bir işçi varsa bitmesi beklenir.
+    return freed + _remove(f"{directory}.lock")
+
+
+def _live_references():
+    with session_scope() as db:
+        files = {p for (p,) in db.query(Document.file_path).distinct()}
+        files |= {p for (p,) in db.query(Job.file_path).filter(Job.status.in_(ingest_worker.ACTIVE))}
+        dirs = {d for (d,) in db.query(Chat.vector_dir).filter(Chat.vector_dir.isnot(None))}
+        dirs |= {d for (d,) in db.query(Document.vector_dir).filter(Document.vector_dir.isnot(None))}
+        busy = {c for (c,) in db.query(Job.chat_id).filter(Job.status.in_(ingest_worker.ACTIVE))}
+        owners = {d: c for c, d in db.query(Chat.id, Chat.vector_dir).filter(Chat.vector_dir.isnot(None))}
+        libs = list(db.query(
+            LibraryDocument.id, LibraryDocument.file_path, LibraryDocument.vector_dir, LibraryDocument.status
+        ))
+    dirs |= {ingest.chat_vector_dir(c) for c in busy}
+    #İşlenmekte olan bir sohbetin klasörü, chats.vector_dir henüz yazılmamış olsa da canlıdır.
+    files |= {p for _, p, _, _ in libs}
+    dirs |= {d for _, _, d, _ in libs if d}
+    owners.update({d: f"lib-{i}" for i, _, d, _ in libs if d})
+    busy |= {f"lib-{i}" for i, _, _, status in libs if status in ingest_worker.ACTIVE}
+    #Kütüphane indeksleri kendi kilit anahtarıyla (lib-<id>) sıkıştırılır.
+    return {_norm(p) for p in files}, {_norm(d) for d in dirs}, {_norm(d): c for d, c in owners.items()}, busy
+
+
+def _deleted_chats(cids):
+    #Verilen sohbet id'lerinden kaydı artık olmayanlar.
+    cids = set(cids)
+    with session_scope() as db:
+        alive = {c for (c,) in db.query(Chat.id).filter(Chat.id.in_(cids))} if cids else set()
+    return cids - alive
+
+
+def _drop_unused_libraries(now):
+    #Hiçbir sohbetin referans vermediği (ve işlenmekte olmayan) kütüphane kayıtları silinir;
+    #dosyaları ve indeksleri aynı turda yetim olarak toplanır.
+    cutoff = datetime.utcnow() - timedelta(seconds=GC_GRACE)
+    with session_scope() as db:
+        used = db.query(Document.library_id).filter(Document.library_id.isnot(None))
+        rows = db.query(LibraryDocument.id, LibraryDocument.vector_dir).filter(
+            LibraryDocument.id.notin_(used),
+            LibraryDocument.status.notin_(ingest_worker.ACTIVE),
+            LibraryDocument.created_at < cutoff,
+        ).all()
+        if rows:
+            db.query(LibraryDocument).filter(LibraryDocument.id.in_([i for i, _ in rows])).delete(
+                synchronize_session=False
+            )
+    for _, d in rows:
+        library.forget_index(d)
+    return len(rows)
+
+
+def _segments_in_use(dirs):
+    used = set()
+    for d in dirs:
+        try:
+            with open(os.path.join(d, numpy_store.MANIFEST)) as f:
+                used.update(e["segment"] for e in json.load(f)["segments"])
+        except (FileNotFoundError, ValueError, KeyError):
+            continue
+    return used
+
+
+# --Compaction--
+def _compact(directory):
+    #Chroma'nın SQLite dosyasındaki boş sayfalar (silinen belgelerden kalan) VACUUM ile geri kazanılır.
+    path = os.path.join(directory, "chroma.sqlite3")
+    if not os.path.exists(path):
+        return 0
+    conn = sqlite3.connect(path, timeout=1)
+    try:
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+        if free < COMPACT_MIN_BYTES:
+            return 0
+        before = os.path.getsize(path)
+        conn.execute("VACUUM")
+        return max(0, before - os.path.getsize(path))
+    except sqlite3.OperationalError:
+        return 0
+        #Koleksiyon o an kullanımdaysa (kilitli) bu tur atlanır.
+    finally:
+        conn.close()
+
+
+# --Collect--
+def collect(now=None) -> dict:
+    #Tek bir temizlik turu. Sadece okuma sorguları yapar ve kısa sürer; dosya silme DB oturumu dışında yapılır.
+    now = now or time.time()
+    started = time.perf_counter()
+    report = {"bytes_freed": 0, "files": 0, "dirs": 0, "segments": 0, "compacted": 0}
+    report["libraries"] = _drop_unused_libraries(now)
+    files, dirs, owners, busy = _live_references()
+
+    if os.path.isdir(ingest.UPLOAD_DIR):
+        for entry in os.scandir(ingest.UPLOAD_DIR):
+            if entry.is_file() and _norm(entry.path) not in files and _old(entry.path, now):
+                report["bytes_freed"] += _remove(entry.path)
+                report["files"] += 1
+    #Yetim yüklemeler ve yarım kalmış .part dosyaları.
+
+    live_dirs, candidates = [], []
+    if os.path.isdir(ingest.VECTOR_ROOT):
+        for entry in os.scandir(ingest.VECTOR_ROOT):
+            path = _norm(entry.path)
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir():
+                m = _CHAT_DIR_RE.fullmatch(entry.name)
+                if path in dirs:
+                    live_dirs.append(entry.path)
+                elif m and _old(entry.path, now):
+                    candidates.append((int(m.group(1)), entry.path))
+            elif entry.name.endswith(".lock") and path[:-len(".lock")] not in dirs and _old(entry.path, now):
+                #Silinen sohbetlerin kilit dosyaları (.gc.lock gibi gizli dosyalar atlanır).
+                report["bytes_freed"] += _remove(entry.path)
+    deleted = _deleted_chats(c for c, _ in candidates)
+    for cid, path in candidates:
+        if cid in deleted:
+            report["bytes_freed"] += _remove(path)
+            report["dirs"] += 1
+    #Referanssız bir sohbet klasörü sadece sohbetin kaydı silinmişse toplanır: vector_dir'i yazılmamış eski
+    #sohbetlerin (chat_<id>_<uuid>) koleksiyonları korunur. Tanınmayan klasörlere dokunulmaz.
+
+    if os.path.isdir(library.LIBRARY_ROOT):
+        for entry in os.scandir(library.LIBRARY_ROOT):
+            if not entry.is_dir():
+                if entry.name.endswith(".lock") and _norm(entry.path)[:-len(".lock")] not in dirs \
+                        and _old(entry.path, now):
+                    report["bytes_freed"] += _remove(entry.path)
+                continue
+            if _norm(entry.path) in dirs:
+                live_dirs.append(entry.path)
+            elif _old(entry.path, now):
+                report["bytes_freed"] += _remove(entry.path)
+                report["dirs"] += 1
+    #Kütüphane indeksleri: kaydı silinmiş (kimsenin kullanmadığı) belgelerin klasörleri.
+
+    used = _segments_in_use(live_dirs)
+    if os.path.isdir(numpy_store.SEGMENT_ROOT):
+        for entry in os.scandir(numpy_store.SEGMENT_ROOT):
+            orphan = ".tmp-" in entry.name or entry.name not in used
+            if entry.is_dir() and orphan and _old(entry.path, now):
+                report["bytes_freed"] += _remove(entry.path)
+                report["segments"] += 1
+                numpy_store.forget_segment(entry.name)
+    #Hiçbir sohbetin manifest'inde geçmeyen segmentler; yarım kalmış .tmp- klasörleri de.
+
+    for d in live_dirs:
+        cid = owners.get(_norm(d))
+        if cid is None or cid in busy:
+            continue
+        with ingest_worker.chat_write_lock(cid, d):
+            freed = _compact(d)
+        if freed:
+            report["bytes_freed"] += freed
+            report["compacted"] += 1
+
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    with _lock:
+        _last.update(report)
+        _last["runs"] += 1
+    telemetry.inc("rag_storage_gc_bytes_freed_total", report["bytes_freed"])
+    return report
+
+
+def stats() -> dict:
+    with _lock:
+        return dict(_last)
+#Son turun raporu (/metrics'te rag_storage_gc_* gauge'ları).
+
+
+def run():
+    #Birden fazla süreç (Streamlit + api işçileri) aynı klasörleri paylaşır: aynı anda tek süreç temizlik yapar.
+    if fcntl is None:
+        return collect()
+    os.makedirs(ingest.VECTOR_ROOT, exist_ok=True)
+    with open(os.path.join(ingest.VECTOR_ROOT, ".gc.lock"), "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return None
+        try:
+            return collect()
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _loop():
+    while True:
+        threading.Event().wait(GC_INTERVAL)
+        try:
+            run()
+        except Exception:
+            traceback.print_exc()
+    #Sonuç telemetriye yazılır (rag_storage_gc_bytes_freed_total ve rag_storage_gc toplayıcısı); süreç çıktısına değil.
+
+
+_started = False
+
+def start():
+    global _started
+    with _lock:
+        if _started or GC_INTERVAL <= 0:
+            return
+        _started = True
+    threading.Thread(target=_loop, daemon=True, name="storage-gc").start()
+#Arka plan thread'i: kullanıcı isteklerini beklemez. GC_INTERVAL_SECONDS=0 ile kapatılır.
+
+
+if __name__ == "__main__":
+    init_db()
+    print(json.dumps(run() or {"skipped": "another process is collecting"}, indent=2))
@@ -0,0 +1,184 @@
+import os, time, threading, functools
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+#Hafif gecikme izleme: span'ler (retriever, LLM, SQLite, rerun) süre histogramlarına yazılır,
+#Prometheus formatında yerel bir uç noktadan sunulur ve istenirse mesaj başına hata ayıklama panelinde gösterilir.
+
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+METRICS_PORT    = int(os.getenv("METRICS_PORT", 9464))
+DEBUG_PANEL     = os.getenv("DEBUG_PANEL", "0") == "1"
+ENABLED         = METRICS_ENABLED or DEBUG_PANEL
+#Kapalıyken @traced fonksiyonu hiç sarmaz, span() paylaşılan boş bir context döndürür → ek maliyet yok denecek kadar az.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_NOOP = nullcontext()
+_collectors = {}
+_trace: ContextVar = ContextVar("trace", default=None)
+
+
+# --Metrics--
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    if not ENABLED:
+        return
+    k = _key(name, labels)
+    with _lock:
+        _counters[k] = _counters.get(k, 0) + value
+
+
+def observe(name, value, **labels):
+    if not ENABLED:
+        return
+    k = _key(name, labels)
+    with _lock:
+        h = _histograms.get(k)
+        if h is None:
+            h = _histograms[k] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        h[0][bisect_left(BUCKETS, value)] += 1
+        h[1] += value
+        h[2] += 1
+        #[kova sayaçları, toplam, adet]
+
+
+def record_tokens(kind, n):
+    inc("rag_tokens_total", n, kind=kind)
+    spans = _trace.get()
+    if spans is not None:
+        spans.append((f"tokens.{kind}", None, n))
+
+
+# --Spans--
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        observe("rag_span_seconds", elapsed, span=self.name)
+        spans = _trace.get()
+        if spans is not None:
+            spans.append((self.name, elapsed * 1000, None))
+        return False
+
+
+def span(name):
+    return _Span(name) if ENABLED else _NOOP
+
+
+def traced(name):
+    def deco(fn):
+        if not ENABLED:
+            return fn
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+#Fonksiyonu bir span ile sarar. Metrikler kapalıysa fonksiyon olduğu gibi döner.
+
+
+@contextmanager
+def trace():
+    #Bu blok içinde (aynı thread/context) açılan span'ler bir listeye toplanır → mesaj başına hata ayıklama paneli.
+    spans = []
+    token = _trace.set(spans)
+    try:
+        yield spans
+    finally:
+        _trace.reset(token)
+
+
+def register_collector(prefix, fn):
+    _collectors[prefix] = fn
+#fn() → {ad: sayı} sözlüğü döndürür; her /metrics isteğinde gauge olarak yazılır (ör. önbellek isabet oranları).
+#Aynı prefix tekrar kaydedilirse eskisinin yerine geçer (Streamlit her etkileşimde app.py'yi yeniden çalıştırır).
+
+
+# --Prometheus endpoint--
+def _labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}" if items else ""
+
+
+def render() -> str:
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: (list(v[0]), v[1], v[2]) for k, v in _histograms.items()}
+    for name in sorted({k[0] for k in counters}):
+        lines.append(f"# TYPE {name} counter")
+        for (n, labels), v in counters.items():
+            if n == name:
+                lines.append(f"{name}{_labels(labels)} {v}")
+    for name in sorted({k[0] for k in histograms}):
+        lines.append(f"# TYPE {name} histogram")
+        for (n, labels), (buckets, total, count) in histograms.items():
+            if n != name:
+                continue
+            cum = 0
+            for le, c in zip(list(BUCKETS) + ["+Inf"], buckets):
+                cum += c
+                lines.append(f"{name}_bucket{_labels(labels, [('le', le)])} {cum}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+    for prefix, fn in list(_collectors.items()):
+        try:
+            values = fn()
+        except Exception:
+            continue
+        for k, v in values.items():
+            if isinstance(v, (int, float)):
+                lines.append(f"# TYPE {prefix}_{k} gauge")
+                lines.append(f"{prefix}_{k} {v}")
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+
+def start_metrics_server(port=METRICS_PORT):
+    global _server
+    if not METRICS_ENABLED or _server is not None:
+        return _server
+    with _lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+            except OSError:
+                return None
+                #Port başka bir süreç tarafından kullanılıyorsa (ör. ikinci Streamlit süreci) uç nokta açılmaz.
+            threading.Thread(target=_server.serve_forever, daemon=True, name="metrics").start()
+    return _server
+#http://127.0.0.1:9464/metrics
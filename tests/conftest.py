@@ -0,0 +1,62 @@
+#Çevrimdışı test ortamı: sahte (deterministik) model, geçici veritabanı ve embedding önbelleği.
+#Ortam değişkenleri modüller import edilmeden önce ayarlanmalıdır (ayarlar modül yüklenirken okunur).
+import os, sys, tempfile
+
+_tmp = tempfile.mkdtemp(prefix="rag_tests_")
+os.environ["MODEL_PROVIDER"] = "fake"
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(_tmp, "embedding_cache.db")
+os.environ["FAKE_LLM_TOKEN_DELAY"] = "0"
+os.environ["BCRYPT_ROUNDS"] = "4"
+#En düşük bcrypt iş faktörü: giriş testleri saniyeler yerine milisaniyeler sürer.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(_tmp)
+#Yükleme ve vektör klasörleri (uploaded_files, chroma_db) göreli yollardır: testler depo klasörüne yazmaz.
+
+import uuid
+
+import pytest
+from langchain_core.documents import Document
+
+import database
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    #Testin süresince boş, ayrı bir veritabanı; sonra süreç genelindeki motor geri yüklenir.
+    previous = database.init_db()
+    monkeypatch.setattr(database, "DATABASE_URL", f"sqlite:///{tmp_path / 'fresh.db'}")
+    monkeypatch.setattr(database, "_engine", None)
+    engine = database.init_db()
+    yield engine
+    engine.dispose()
+    database._engine = previous
+    database.SessionLocal.configure(bind=previous)
+
+
+def make_chat(directory=None, user_id=None):
+    #Sohbet (gerekirse kullanıcısıyla); directory verilirse o vektör klasörüne bağlı bir belge kaydı da eklenir.
+    with database.session_scope() as db:
+        if user_id is None:
+            user = database.User(username=f"user_{uuid.uuid4().hex[:8]}", password_hash="x")
+            db.add(user)
+            db.flush()
+            user_id = user.id
+        chat = database.Chat(user_id=user_id, title="test", vector_dir=directory)
+        db.add(chat)
+        db.flush()
+        if directory:
+            db.add(database.Document(chat_id=chat.id, file_name="kurallar.txt",
+                                     file_path=f"uploaded_files/{uuid.uuid4().hex}.txt", vector_dir=directory))
+        return chat.id
+
+
+@pytest.fixture
+def chat_with_document(tmp_path):
+    import ingest
+    file_hash = uuid.uuid4().hex
+    chunks = [Document(page_content=f"MADDE {i}\nÖğrenci dönem başında {i}. dersi seçer.",
+                       metadata={"page": i, "file_hash": file_hash}) for i in range(3)]
+    directory = str(tmp_path / "chat")
+    assert ingest.add_to_vector_store(chunks, directory, document_id=1) is not None
+    return make_chat(directory)
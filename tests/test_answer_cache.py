@@ -0,0 +1,37 @@
+import uuid
+
+import pytest
+
+import answer_cache
+from providers import get_embeddings
+
+
+@pytest.fixture
+def doc_key():
+    return uuid.uuid4().hex
+
+
+def test_same_question_after_normalization_hits(doc_key):
+    answer, vec = answer_cache.lookup(doc_key, "Kayıt ne zaman?")
+    assert answer is None
+    answer_cache.store(doc_key, "Kayıt ne zaman?", vec, "Eylül'de.")
+    answer, _ = answer_cache.lookup(doc_key, "  KAYIT ne zaman ")
+    assert answer == "Eylül'de."
+
+
+def test_different_question_misses_below_threshold(doc_key):
+    _, vec = answer_cache.lookup(doc_key, "Kayıt ne zaman?")
+    answer_cache.store(doc_key, "Kayıt ne zaman?", vec, "Eylül'de.")
+    assert answer_cache.lookup(doc_key, "Harç ne kadar?")[0] is None
+    assert answer_cache.lookup(uuid.uuid4().hex, "Kayıt ne zaman?")[0] is None
+
+
+def test_threshold_controls_similarity(doc_key, monkeypatch):
+    _, vec = answer_cache.lookup(doc_key, "Kayıt ne zaman?")
+    answer_cache.store(doc_key, "Kayıt ne zaman?", vec, "Eylül'de.")
+    other = get_embeddings().embed_query(answer_cache.normalize_question("Harç ne kadar?"))
+    sim = answer_cache._cosine(other, answer_cache._from_bytes(answer_cache._to_bytes(vec)))
+    monkeypatch.setattr(answer_cache, "SIMILARITY_THRESHOLD", sim)
+    assert answer_cache.lookup(doc_key, "Harç ne kadar?")[0] == "Eylül'de."
+    monkeypatch.setattr(answer_cache, "SIMILARITY_THRESHOLD", sim + 1e-3)
+    assert answer_cache.lookup(doc_key, "Harç ne kadar?")[0] is None
@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+import pytest
+
+import api, auth, rag_service
+from conftest import make_chat
+from database import session_scope, Chat, Job
+
+
+class _Client:
+    #ASGI uygulamasına ağ olmadan istek gönderir. Lifespan çalıştırılmaz: iş kuyruğu ve GC thread'leri testte başlamaz.
+    def __getattr__(self, method):
+        def call(path, **kwargs):
+            async def go():
+                transport = httpx.ASGITransport(app=api.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+                    return await c.request(method.upper(), path, **kwargs)
+            return asyncio.run(go())
+        return call
+
+
+client = _Client()
+
+
+def _user_chat():
+    cid = make_chat()
+    with session_scope() as db:
+        user_id = db.query(Chat.user_id).filter(Chat.id == cid).scalar()
+    return cid, user_id, {"Authorization": f"Bearer {auth.create_session(user_id)}"}
+
+
+@pytest.fixture
+def alice():
+    return _user_chat()
+
+
+@pytest.fixture
+def bob():
+    return _user_chat()
+
+
+def test_requests_without_a_valid_token_are_rejected(alice):
+    cid, _, _ = alice
+    assert client.post(f"/chats/{cid}/ask", json={"question": "?"}).status_code == 401
+    bad = {"Authorization": "Bearer nope"}
+    assert client.post(f"/chats/{cid}/ask", json={"question": "?"}, headers=bad).status_code == 401
+    assert client.get("/library").status_code == 401
+
+
+def test_owner_can_use_own_chat(alice):
+    cid, _, headers = alice
+    r = client.post(f"/chats/{cid}/ask", json={"question": "Merhaba?"}, headers=headers)
+    assert r.status_code == 200 and r.json()["answer"] == rag_service.NO_DOCUMENT
+    assert client.get(f"/chats/{cid}/suggestions", headers=headers).json() == []
+
+
+@pytest.mark.parametrize("method, path, kwargs", [
+    ("post", "/chats/{cid}/ask", {"json": {"question": "?"}}),
+    ("post", "/chats/{cid}/ask/stream", {"json": {"question": "?"}}),
+    ("post", "/chats/{cid}/documents?name=a.txt", {"content": b"metin"}),
+    ("post", "/chats/{cid}/warm", {}),
+    ("get", "/chats/{cid}/suggestions", {}),
+    ("post", "/chats/{cid}/library/1", {}),
+])
+def test_other_users_chat_is_not_found(alice, bob, method, path, kwargs):
+    cid, _, _ = alice
+    _, _, bob_headers = bob
+    r = getattr(client, method)(path.format(cid=cid), headers=bob_headers, **kwargs)
+    assert r.status_code == 404
+    missing = getattr(client, method)(path.format(cid=10 ** 9), headers=bob_headers, **kwargs)
+    assert missing.status_code == 404 and missing.json() == r.json()
+    #Başkasının sohbeti ile var olmayan sohbet aynı cevabı alır.
+
+
+def test_jobs_are_visible_only_to_their_owner(alice, bob):
+    cid, user_id, headers = alice
+    _, _, bob_headers = bob
+    with session_scope() as db:
+        job = Job(chat_id=cid, user_id=user_id, file_name="a.txt", file_path="a.txt", status="queued")
+        db.add(job)
+        db.flush()
+        job_id = job.id
+    assert client.get(f"/jobs/{job_id}", headers=headers).json()["status"] == "queued"
+    assert client.get(f"/jobs/{job_id}", headers=bob_headers).status_code == 404
+
+
+def test_admin_routes_need_the_admin_token(alice, monkeypatch):
+    _, _, headers = alice
+    assert client.post("/admin/gc", headers=headers).status_code == 403
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "yonetici")
+    monkeypatch.setattr(api.storage_gc, "run", lambda: {"dirs": 0})
+    assert client.post("/admin/gc", headers={"Authorization": "Bearer yonetici"}).json() == {"dirs": 0}
@@ -0,0 +1,80 @@
+import uuid
+
+import pytest
+
+import auth
+
+
+def test_throttle_blocks_after_limit_until_window_ends():
+    t = auth._Throttle(limit=3, window=60)
+    for _ in range(3):
+        assert t.retry_after("ali", now=100) == 0
+        t.fail("ali", now=100)
+    assert t.retry_after("ali", now=110) == 50
+    assert t.retry_after("veli", now=110) == 0
+    assert t.retry_after("ali", now=160) == 0
+    t.fail("ali", now=161)
+    assert t.retry_after("ali", now=161) == 0
+
+
+def test_throttle_reset_and_lru_bound():
+    t = auth._Throttle(limit=1, window=60, size=2)
+    t.fail("a", now=0)
+    t.reset("a")
+    assert t.retry_after("a", now=1) == 0
+    for key in ("a", "b", "c"):
+        t.fail(key, now=0)
+    assert t.retry_after("a", now=1) == 0
+    assert t.retry_after("c", now=1) == 59
+
+
+@pytest.fixture
+def user():
+    name = f"user_{uuid.uuid4().hex[:8]}"
+    assert auth.register(name, "dogru-sifre") is True
+    return name
+
+
+def test_login_is_throttled_per_username(user, monkeypatch):
+    monkeypatch.setattr(auth, "_by_user", auth._Throttle(3, 300))
+    for _ in range(3):
+        assert auth.login(user, "yanlis") is None
+    assert auth.retry_after(user) > 0
+    assert auth.login(user, "dogru-sifre") is None
+    #Sınır aşıldıktan sonra doğru şifre de kontrol edilmez.
+    assert auth.retry_after(user.upper()) > 0
+
+
+def test_login_is_throttled_per_ip(user, monkeypatch):
+    monkeypatch.setattr(auth, "_by_ip", auth._Throttle(2, 300))
+    for _ in range(2):
+        assert auth.login(f"yok_{uuid.uuid4().hex[:6]}", "x", ip="10.0.0.7") is None
+    assert auth.login(user, "dogru-sifre", ip="10.0.0.7") is None
+    assert auth.login(user, "dogru-sifre", ip="10.0.0.8") is not None
+
+
+def test_successful_login_resets_user_counter(user, monkeypatch):
+    monkeypatch.setattr(auth, "_by_user", auth._Throttle(3, 300))
+    auth.login(user, "yanlis")
+    auth.login(user, "yanlis")
+    assert auth.login(user, "dogru-sifre") is not None
+    auth.login(user, "yanlis")
+    auth.login(user, "yanlis")
+    assert auth.retry_after(user) == 0
+
+
+def test_session_token_round_trip(user):
+    uid = auth.login(user, "dogru-sifre").id
+    token = auth.create_session(uid)
+    assert auth.resume_session(token) == uid
+    auth.end_session(token)
+    assert auth.resume_session(token) is None
+    assert auth.resume_session("") is None
+
+
+def test_expired_session_is_not_resumed(user, monkeypatch):
+    uid = auth.login(user, "dogru-sifre").id
+    monkeypatch.setattr(auth, "SESSION_TTL", -auth.SESSION_TTL)
+    token = auth.create_session(uid)
+    assert auth.resume_session(token) is None
+    #Sayfa yenilemesinde çerezden gelen süresi dolmuş token yeni giriş ister.
@@ -0,0 +1,75 @@
+from langchain_core.documents import Document
+
+from chunking import StructuredChunker, count_tokens
+
+
+TEXT = (
+    "1. Giriş\n"
+    "Bu yönetmelik lisans öğrencilerinin kayıt işlemlerini düzenler. Kayıtlar dönem başında yapılır. "
+    "Geç kayıt için bölüm başkanlığının onayı gerekir. Onay verilmezse kayıt yapılamaz.\n"
+    "\n"
+    "2. Dersler\n"
+    "Her öğrenci dönem başında en fazla kırk beş AKTS ders alabilir. Not ortalaması yüksek olanlar ek ders alabilir. "
+    "Ders bırakma işlemi ilk iki hafta içinde yapılır.\n"
+)
+
+
+def _page(text, page=1):
+    return Document(page_content=text, metadata={"source": "yonetmelik.pdf", "page": page})
+
+
+def test_chunks_respect_budget_and_offsets():
+    chunks = StructuredChunker(chunk_tokens=25, overlap_tokens=8).split_page(_page(TEXT))
+    assert len(chunks) > 2
+    for c in chunks:
+        m = c.metadata
+        assert TEXT[m["start_offset"]:m["end_offset"]].strip() == c.page_content
+        assert m["token_count"] == count_tokens(c.page_content) <= 25
+        assert m["page"] == 1 and m["source"] == "yonetmelik.pdf"
+    assert [c.metadata["chunk_index"] for c in chunks] == list(range(len(chunks)))
+
+
+def test_chunks_do_not_cross_headings():
+    chunks = StructuredChunker(chunk_tokens=25, overlap_tokens=8).split_page(_page(TEXT))
+    headings = {c.metadata["heading"] for c in chunks}
+    assert headings == {"1. Giriş", "2. Dersler"}
+    for c in chunks:
+        assert not ("kayıt" in c.page_content.lower() and "AKTS" in c.page_content)
+
+
+def test_overlap_carries_last_sentence():
+    text = " ".join(f"Kural {i} geçerlidir." for i in range(12))
+    chunks = StructuredChunker(chunk_tokens=20, overlap_tokens=8).split_page(_page(text))
+    assert len(chunks) >= 2
+    for prev, nxt in zip(chunks, chunks[1:]):
+        assert prev.metadata["end_offset"] > nxt.metadata["start_offset"]
+        assert nxt.page_content.startswith(prev.page_content.split(". ")[-1])
+
+
+def test_boilerplate_and_duplicates_are_skipped():
+    chunker = StructuredChunker(chunk_tokens=300, overlap_tokens=0)
+    pages = [
+        _page(f"ÜNİVERSİTE YÖNETMELİĞİ\nGiriş\nSayfa içeriği numara {i} burada.\nSon satır {i}.\nSayfa {i}", page=i)
+        for i in range(1, 5)
+    ] + [_page("ÜNİVERSİTE YÖNETMELİĞİ\nGiriş\nSayfa içeriği numara 4 burada.\nSon satır 4.\nSayfa 5", page=5)]
+    chunks = list(chunker.iter_chunks(pages))
+    assert {c.metadata["page"] for c in chunks} == {1, 2, 3, 4}
+    for c in chunks:
+        assert c.page_content == f"Sayfa içeriği numara {c.metadata['page']} burada."
+    #İlk iki sayfanın üst/alt bilgisi de sonraki sayfalarla karşılaştırılarak ayıklanır.
+    assert chunker.skipped_duplicates == 1
+
+
+def test_boilerplate_needs_repetition():
+    chunker = StructuredChunker(chunk_tokens=300, overlap_tokens=0)
+    pages = [_page(f"BAŞLIK {i}\nİçerik {i} burada.\nSon satır.", page=i) for i in range(1, 3)]
+    chunks = list(chunker.iter_chunks(pages))
+    assert all(c.page_content.startswith("BAŞLIK") for c in chunks)
+    #İki sayfalık belgede hiçbir satır üç sayfada tekrarlanmaz: içerik silinmez.
+
+
+def test_digit_only_lines_are_not_headings():
+    text = "GİRİŞ\nYönetmelik 2020 yılında yürürlüğe girdi.\n2024\nDeğişiklikler aşağıdadır.\n17\n"
+    chunks = StructuredChunker(chunk_tokens=300, overlap_tokens=0).split_page(_page(text))
+    assert len(chunks) == 1 and chunks[0].metadata["heading"] == "GİRİŞ"
+    assert "2024" in chunks[0].page_content
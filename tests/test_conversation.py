@@ -0,0 +1,74 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import answer_cache, conversation, rag_service
+from chunking import count_tokens
+from conftest import make_chat
+from database import session_scope, Chat, Message
+
+
+WORDS = "öğrenci ders sınav not kredi yönetmelik dönem başarıyla tamamlanmalıdır BIL304 madde".split()
+
+
+def _messages(rng, n):
+    return [SimpleNamespace(role=rng.choice(["user", "assistant"]),
+                            content=" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 120))))
+            for _ in range(n)]
+
+
+@pytest.mark.parametrize("cap", [1, 10, 50, conversation.HISTORY_TOKEN_CAP])
+def test_build_history_never_exceeds_cap(cap):
+    rng = random.Random(cap)
+    for _ in range(200):
+        summary = " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 400)))
+        history = conversation.build_history(summary, _messages(rng, rng.randint(0, 30)), cap=cap)
+        assert count_tokens(history) <= cap
+
+
+def test_build_history_keeps_newest_messages():
+    msgs = [SimpleNamespace(role="user", content=f"soru {i}") for i in range(12)]
+    history = conversation.build_history("", msgs, cap=conversation.HISTORY_TOKEN_CAP)
+    assert history.endswith("User: soru 11")
+    assert "soru 1\n" not in history
+
+
+def _add(cid, n):
+    with session_scope() as db:
+        db.add_all(Message(chat_id=cid, role="user" if i % 2 == 0 else "assistant", content=f"mesaj {i}")
+                   for i in range(n))
+
+
+class _CountingLLM(FakeListChatModel):
+    calls: int = 0
+
+    def _call(self, *args, **kwargs):
+        self.calls += 1
+        return super()._call(*args, **kwargs)
+
+
+def test_fold_waits_for_backlog_threshold():
+    cid = make_chat()
+    llm = _CountingLLM(responses=["özet"])
+    _add(cid, conversation.RECENT_MESSAGES + conversation.FOLD_MIN_MESSAGES - 1)
+    assert conversation.fold_history(cid, llm) is False
+    assert llm.calls == 0
+    _add(cid, 1)
+    assert conversation.fold_history(cid, llm) is True
+    assert llm.calls == 1
+    with session_scope() as db:
+        assert db.query(Chat.summary).filter(Chat.id == cid).scalar() == "özet"
+    assert conversation.fold_history(cid, llm) is False
+    assert llm.calls == 1
+
+
+def test_answers_built_with_history_are_not_cached(chat_with_document, monkeypatch):
+    stored = []
+    monkeypatch.setattr(answer_cache, "store", lambda *args: stored.append(args))
+    list(rag_service.iter_answer(chat_with_document, "Ders seçimi ne zaman?"))
+    assert len(stored) == 1
+    list(rag_service.iter_answer(chat_with_document, "Peki sınavlar?"))
+    assert len(stored) == 1
+    #İkinci cevap sohbetin geçmişiyle üretildi: ortak önbelleğe yazılmaz.
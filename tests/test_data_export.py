@@ -0,0 +1,107 @@
+import gzip, json
+
+import pytest
+
+import auth, data_export, database
+from database import session_scope, Chat, Document, Feedback, LibraryDocument, Message, User
+
+
+def _seed():
+    with session_scope() as db:
+        user = User(username="export_user", password_hash=auth.hash_password("dogru-sifre"))
+        chat = Chat(user=user, title="Dışa aktarım")
+        db.add_all([user, chat])
+        db.flush()
+        lib = LibraryDocument(file_hash="f" * 40, file_name="yonetmelik.pdf", owner_id=user.id, status="ready")
+        db.add(lib)
+        db.flush()
+        db.add(Document(chat_id=chat.id, library_id=lib.id, file_name="yonetmelik.pdf"))
+        msg = Message(chat_id=chat.id, role="assistant", content="Cevap")
+        db.add(msg)
+        db.flush()
+        db.add(Feedback(message_id=msg.id, is_helpful=True, comment="👍"))
+
+
+def _snapshot():
+    with session_scope() as db:
+        return {
+            "users": [(u.id, u.username) for u in db.query(User).order_by(User.id)],
+            "chats": [(c.id, c.user_id, c.title, c.created_at) for c in db.query(Chat).order_by(Chat.id)],
+            "library": [(l.id, l.file_hash, l.owner_id) for l in db.query(LibraryDocument).order_by(LibraryDocument.id)],
+            "documents": [(d.id, d.chat_id, d.library_id) for d in db.query(Document).order_by(Document.id)],
+            "messages": [(m.id, m.chat_id, m.content) for m in db.query(Message).order_by(Message.id)],
+            "feedback": [(f.id, f.message_id, f.comment) for f in db.query(Feedback).order_by(Feedback.id)],
+        }
+
+
+@pytest.fixture
+def exported(tmp_path, fresh_db):
+    _seed()
+    before = _snapshot()
+    counts = data_export.export(tmp_path / "out")
+    assert counts == {name: 1 for name in data_export.TABLES}
+    return tmp_path / "out", before
+
+
+def test_round_trip_into_empty_database(exported, tmp_path, monkeypatch):
+    out, before = exported
+    monkeypatch.setattr(database, "DATABASE_URL", f"sqlite:///{tmp_path / 'restored.db'}")
+    monkeypatch.setattr(database, "_engine", None)
+    counts = data_export.import_(out)
+    assert counts == {name: 1 for name in data_export.TABLES}
+    assert _snapshot() == before
+    database._engine.dispose()
+
+
+def test_import_refuses_non_empty_database(exported):
+    out, before = exported
+    with pytest.raises(SystemExit, match="not empty"):
+        data_export.import_(out)
+    assert _snapshot() == before
+
+
+def _rows(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_password_hashes_are_left_out_by_default(exported, tmp_path, monkeypatch):
+    out, _ = exported
+    assert "password_hash" not in _rows(out / "users.jsonl.gz")[0]
+    monkeypatch.setattr(database, "DATABASE_URL", f"sqlite:///{tmp_path / 'restored.db'}")
+    monkeypatch.setattr(database, "_engine", None)
+    data_export.import_(out)
+    assert auth.login("export_user", "dogru-sifre") is None
+    assert auth.login("export_user", "!") is None
+    #Hash'siz içe aktarılan kullanıcı hiçbir şifreyle giriş yapamaz (hata da vermez).
+    database._engine.dispose()
+
+
+def test_password_hashes_exported_only_on_request(tmp_path, fresh_db, monkeypatch):
+    _seed()
+    data_export.export(tmp_path / "out", include_password_hashes=True)
+    assert _rows(tmp_path / "out" / "users.jsonl.gz")[0]["password_hash"].startswith("$2")
+    monkeypatch.setattr(database, "DATABASE_URL", f"sqlite:///{tmp_path / 'restored.db'}")
+    monkeypatch.setattr(database, "_engine", None)
+    data_export.import_(tmp_path / "out")
+    assert auth.login("export_user", "dogru-sifre") is not None
+    database._engine.dispose()
+
+
+def test_export_is_one_snapshot(tmp_path, fresh_db, monkeypatch):
+    _seed()
+    pages = data_export._pages
+
+    def write_during_export(conn, table, columns):
+        if table.name == "chats":
+            with session_scope() as db:
+                chat = Chat(user_id=1, title="Sonradan")
+                db.add(chat)
+                db.flush()
+                db.add(Message(chat_id=chat.id, role="user", content="Geç gelen"))
+        return pages(conn, table, columns)
+
+    monkeypatch.setattr(data_export, "_pages", write_during_export)
+    counts = data_export.export(tmp_path / "out")
+    assert counts == {name: 1 for name in data_export.TABLES}
+    #Dışa aktarma sürerken eklenen sohbet ve mesaj dosyalara girmez: mesajlar dosyası sohbetlerle tutarlıdır.
@@ -0,0 +1,21 @@
+from embedding_cache import SQLiteLRUByteStore
+
+
+def test_lru_eviction_keeps_recently_read_entries(tmp_path):
+    store = SQLiteLRUByteStore(str(tmp_path / "cache.db"), max_bytes=100)
+    for key in "abc":
+        store.mset([(key, b"x" * 30)])
+    assert store.mget(["a", "zz"]) == [b"x" * 30, None]
+    store.mset([("d", b"x" * 30)])
+    assert sorted(store.yield_keys()) == ["a", "c", "d"]
+    assert store.stats()["evictions"] == 1
+
+
+def test_size_total_is_tracked_across_writes_and_reopen(tmp_path):
+    path = str(tmp_path / "cache.db")
+    store = SQLiteLRUByteStore(path, max_bytes=1000)
+    store.mset([("a", b"x" * 10), ("b", b"x" * 20)])
+    store.mset([("a", b"x" * 5)])
+    store.mdelete(["b", "missing"])
+    assert (store.stats()["entries"], store.stats()["bytes"]) == (1, 6)
+    assert SQLiteLRUByteStore(path, max_bytes=1000).stats()["bytes"] == 6
@@ -0,0 +1,79 @@
+import threading, time
+
+import pytest
+
+from embedding_scheduler import ScheduledEmbeddings, TokenBucket, is_rate_limit_error
+from providers import FakeEmbeddings
+
+
+TEXTS = [f"chunk {i}" for i in range(100)]
+
+
+class _Tracking(FakeEmbeddings):
+    #Aynı anda havada olan istek sayısını ölçen sahte uç nokta.
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self.inflight = self.peak = 0
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.inflight += 1
+            self.peak = max(self.peak, self.inflight)
+        try:
+            return super().embed_documents(texts)
+        finally:
+            with self._lock:
+                self.inflight -= 1
+
+
+def test_batches_keep_text_order():
+    endpoint = FakeEmbeddings(size=8)
+    vectors = ScheduledEmbeddings(endpoint, batch_size=7, max_concurrency=4, rate=1000).embed_documents(TEXTS)
+    assert vectors == [endpoint._vector(t) for t in TEXTS]
+    assert endpoint.calls == 15
+
+
+def test_concurrency_is_bounded():
+    endpoint = _Tracking(size=8, latency=0.02)
+    ScheduledEmbeddings(endpoint, batch_size=5, max_concurrency=3, rate=1000).embed_documents(TEXTS)
+    assert endpoint.peak == 3
+
+
+def test_rate_limit_errors_are_retried_with_backoff():
+    endpoint = FakeEmbeddings(size=8, error_rate=0.3, seed=4)
+    sched = ScheduledEmbeddings(endpoint, batch_size=4, max_concurrency=4, rate=1000, max_retries=20, base_delay=0.001)
+    vectors = sched.embed_documents(TEXTS)
+    assert vectors == [endpoint._vector(t) for t in TEXTS]
+    stats = sched.stats()
+    assert stats["retries"] > 0
+    assert stats["requests"] == 25 + stats["retries"]
+
+
+def test_retries_are_bounded_and_other_errors_are_not_retried():
+    sched = ScheduledEmbeddings(FakeEmbeddings(size=8, error_rate=1.0), rate=1000, max_retries=2, base_delay=0.001)
+    with pytest.raises(RuntimeError, match="429"):
+        sched.embed_query("soru")
+    assert sched.stats()["requests"] == 3
+
+    class Broken(FakeEmbeddings):
+        def embed_query(self, text):
+            raise ValueError("bad input")
+
+    sched = ScheduledEmbeddings(Broken(), rate=1000, max_retries=5)
+    with pytest.raises(ValueError):
+        sched.embed_query("soru")
+    assert sched.stats() == {"requests": 1, "retries": 0, "throttled_seconds": 0.0}
+
+
+def test_token_bucket_limits_request_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    assert time.monotonic() - start >= 10 / 50 * 0.9
+
+
+def test_rate_limit_error_detection():
+    assert is_rate_limit_error(RuntimeError("429 Resource has been exhausted (e.g. check quota)."))
+    assert not is_rate_limit_error(ValueError("invalid argument"))
@@ -0,0 +1,110 @@
+import threading, time
+from datetime import datetime, timedelta
+
+import pytest
+
+import ingest, ingest_worker
+from conftest import make_chat
+from database import session_scope, Chat, Job
+
+
+def _job(status="queued", worker=None, age=0, cid=None, path="missing.txt"):
+    with session_scope() as db:
+        job = Job(chat_id=cid or make_chat(), user_id=None, file_name="a.txt", file_path=path, file_hash="h",
+                  status=status, worker=worker, updated_at=datetime.utcnow() - timedelta(seconds=age))
+        db.add(job)
+        db.flush()
+        return job.id
+
+
+def _row(job_id):
+    with session_scope() as db:
+        return db.query(Job).filter(Job.id == job_id).first()
+
+
+class _Recorder:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(args)
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    rec = _Recorder()
+    monkeypatch.setattr(ingest_worker, "_executor", rec)
+    return rec
+
+
+def test_update_requires_the_lease():
+    job_id = _job("running", worker="a")
+    assert ingest_worker._update(job_id, "b", progress=0.5) == 0
+    assert ingest_worker._update(job_id, "a", progress=0.5) == 1
+    assert _row(job_id).progress == 0.5
+
+
+def test_sweep_submits_only_jobs_it_requeued(executor):
+    stale = _job("running", worker="dead", age=ingest_worker.STALE_AFTER.total_seconds() + 60)
+    fresh = _job("running", worker="alive")
+    waiting = _job("queued")
+    ingest_worker._sweep_once()
+    assert (stale,) in executor.submitted
+    assert (fresh,) not in executor.submitted and (waiting,) not in executor.submitted
+    assert (_row(stale).status, _row(stale).worker) == ("queued", None)
+    assert _row(fresh).status == "running" and _row(waiting).status == "queued"
+    before = len(executor.submitted)
+    ingest_worker._sweep_once()
+    assert len(executor.submitted) == before
+    #İkinci tur: kuyruktaki işler havuzda zaten bekliyor, tekrar gönderilmez.
+
+
+def test_startup_resubmits_queued_jobs(executor):
+    waiting = _job("queued")
+    ingest_worker._resume_interrupted()
+    assert (waiting,) in executor.submitted
+
+
+def test_heartbeat_renews_lease_until_lost(monkeypatch):
+    monkeypatch.setattr(ingest_worker, "HEARTBEAT", 0.01)
+    job_id = _job("running", worker="a", age=3600)
+    stop = threading.Event()
+    beat = threading.Thread(target=ingest_worker._heartbeat, args=(job_id, "a", stop))
+    beat.start()
+    time.sleep(0.1)
+    assert datetime.utcnow() - _row(job_id).updated_at < timedelta(seconds=5)
+    with session_scope() as db:
+        db.query(Job).filter(Job.id == job_id).update({Job.worker: "b"})
+    beat.join(timeout=2)
+    assert not beat.is_alive()
+    stop.set()
+
+
+def test_job_runs_to_done_and_records_vector_dir(tmp_path):
+    path = tmp_path / "kurallar.txt"
+    path.write_text("MADDE 1\nÖğrenci dönem başında ders seçer.\n", encoding="utf-8")
+    cid = make_chat()
+    job_id = _job(cid=cid, path=str(path))
+    ingest_worker.run_job(job_id)
+    job = _row(job_id)
+    assert (job.status, job.progress) == ("done", 1.0)
+    with session_scope() as db:
+        assert db.query(Chat.vector_dir).filter(Chat.id == cid).scalar() == ingest.chat_vector_dir(cid)
+
+
+def test_taken_over_job_is_left_to_the_new_owner(tmp_path, monkeypatch):
+    path = tmp_path / "kurallar.txt"
+    path.write_text("metin", encoding="utf-8")
+    job_id = _job(path=str(path))
+
+    def add(chunks, directory, document_id, on_progress):
+        with session_scope() as db:
+            db.query(Job).filter(Job.id == job_id).update({Job.worker: "other"})
+        on_progress(1, 10, 0)
+        #Kira başka bir işçiye geçti: ilk ilerleme yazısı LeaseLost ile durdurulur.
+        raise AssertionError("unreachable")
+    monkeypatch.setattr(ingest, "add_to_vector_store", add)
+
+    ingest_worker.run_job(job_id)
+    job = _row(job_id)
+    assert (job.status, job.worker, job.error) == ("running", "other", None)
@@ -0,0 +1,40 @@
+import os
+
+from sqlalchemy import create_engine, text
+
+import database
+
+
+def _touch(root, name, mtime):
+    path = root / name
+    path.mkdir()
+    (path / "chroma.sqlite3").write_bytes(b"")
+    os.utime(path, (mtime, mtime))
+    return os.path.join(str(root), name)
+
+
+def test_legacy_chat_dirs_are_backfilled(tmp_path, monkeypatch):
+    root = tmp_path / "chroma_db"
+    root.mkdir()
+    monkeypatch.setattr(database, "LEGACY_VECTOR_ROOT", str(root))
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    migrations = database.MIGRATIONS
+    monkeypatch.setattr(database, "MIGRATIONS", migrations[:-1])
+    database.migrate(engine)
+    monkeypatch.setattr(database, "MIGRATIONS", migrations)
+    #Sohbetler backfill'den önceki sürümde vardır (yükseltilen kurulum).
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO chats (id, title) VALUES (1, 'eski'), (2, 'iki yükleme'), (3, 'yeni')"))
+        conn.execute(text("UPDATE chats SET vector_dir = 'chroma_db/chat_3' WHERE id = 3"))
+
+    _touch(root, "chat_1_0a1b2c3d", 1000)
+    _touch(root, "chat_2_aaaaaaaa", 1000)
+    newest = _touch(root, "chat_2_bbbbbbbb", 2000)
+    _touch(root, "chat_3_cccccccc", 3000)
+    _touch(root, "chat_9_dddddddd", 3000)
+    (root / "chat_1_notadir0").write_bytes(b"")
+
+    database.migrate(engine)
+    with engine.connect() as conn:
+        dirs = dict(conn.execute(text("SELECT id, vector_dir FROM chats ORDER BY id")).all())
+    assert dirs == {1: os.path.join(str(root), "chat_1_0a1b2c3d"), 2: newest, 3: "chroma_db/chat_3"}
@@ -0,0 +1,75 @@
+import uuid
+
+import pytest
+
+import library
+from conftest import make_chat
+from database import session_scope, Chat, Document, LibraryDocument
+
+
+def _user_of(cid):
+    with session_scope() as db:
+        return db.get(Chat, cid).user_id
+
+
+def _library_doc(owner_id, shared=False):
+    lib, created = library.get_or_create(uuid.uuid4().hex, "uploaded_files/a.pdf", "a.pdf", owner_id)
+    assert created
+    library.set_shared(lib.id, owner_id, shared)
+    with session_scope() as db:
+        db.query(LibraryDocument).filter(LibraryDocument.id == lib.id).update({LibraryDocument.status: "done"})
+    return lib.id
+#İndeksi hazır kütüphane belgesi: erişim kontrolü dışındaki her koşul sağlanır.
+
+
+@pytest.fixture
+def two_users():
+    mine = make_chat()
+    theirs = make_chat()
+    return (mine, _user_of(mine)), (theirs, _user_of(theirs))
+
+
+def _attached(cid):
+    with session_scope() as db:
+        return [lid for (lid,) in db.query(Document.library_id).filter(Document.chat_id == cid)]
+
+
+def test_owns_chat_only_for_the_owner(two_users):
+    (mine, me), (theirs, _) = two_users
+    assert library.owns_chat(mine, me)
+    assert not library.owns_chat(theirs, me)
+    assert not library.owns_chat(10**9, me)
+
+
+def test_attach_rejects_another_users_private_document(two_users):
+    (mine, me), (_, other) = two_users
+    private = _library_doc(other)
+    assert library.attach_by_id(mine, me, private) is None
+    assert _attached(mine) == []
+    assert private not in [lib.id for lib in library.visible(me)]
+    assert private in [lib.id for lib in library.visible(other)]
+
+
+def test_attach_accepts_own_and_shared_documents(two_users):
+    (mine, me), (_, other) = two_users
+    own, shared = _library_doc(me), _library_doc(other, shared=True)
+    assert library.attach_by_id(mine, me, own) is not None
+    assert library.attach_by_id(mine, me, shared) is not None
+    assert library.attach_by_id(mine, me, shared) == library.attach_by_id(mine, me, shared)
+    #Aynı belge ikinci kez eklenmez.
+    assert sorted(_attached(mine)) == sorted([own, shared])
+
+
+def test_attach_rejects_a_chat_the_user_does_not_own(two_users):
+    (_, me), (theirs, _) = two_users
+    shared = _library_doc(me, shared=True)
+    assert library.attach_by_id(theirs, me, shared) is None
+    assert _attached(theirs) == []
+
+
+def test_only_the_owner_can_change_sharing(two_users):
+    (_, me), (_, other) = two_users
+    lid = _library_doc(other)
+    assert not library.set_shared(lid, me, True)
+    assert library.owned(me, [lid]) == {}
+    assert library.owned(other, [lid]) == {lid: False}
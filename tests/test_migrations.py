@@ -0,0 +1,84 @@
+import sqlite3
+
+from sqlalchemy import create_engine, inspect, text
+
+import database
+
+
+LEGACY_SCHEMA = """
+CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR(50) NOT NULL UNIQUE, password_hash VARCHAR(128) NOT NULL);
+CREATE TABLE chats (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users (id), title VARCHAR(100), created_at DATETIME);
+CREATE TABLE messages (id INTEGER PRIMARY KEY, chat_id INTEGER REFERENCES chats (id), role VARCHAR(10), content TEXT,
+                       created_at DATETIME);
+CREATE TABLE feedback (id INTEGER PRIMARY KEY, message_id INTEGER REFERENCES messages (id), is_helpful BOOLEAN,
+                       comment TEXT, created_at DATETIME);
+CREATE TABLE documents (id INTEGER PRIMARY KEY, chat_id INTEGER REFERENCES chats (id), file_name VARCHAR(255),
+                        file_path VARCHAR(500), uploaded_at DATETIME);
+INSERT INTO users VALUES (1, 'ayse', 'x');
+INSERT INTO chats VALUES (1, 1, 'Eski sohbet', '2024-01-01 10:00:00');
+INSERT INTO messages VALUES (1, 1, 'user', 'Merhaba', '2024-01-01 10:00:01');
+INSERT INTO documents VALUES (1, 1, 'a.pdf', 'uploaded_files/a.pdf', '2024-01-01 10:00:02');
+"""
+#İlk sürümün şeması (sürüm tablosu ve sonradan eklenen kolonlar yok).
+
+
+def _legacy_engine(tmp_path):
+    path = tmp_path / "legacy.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(LEGACY_SCHEMA)
+    return create_engine(f"sqlite:///{path}")
+
+
+def _columns(engine, table):
+    return {c["name"] for c in inspect(engine).get_columns(table)}
+
+
+def test_legacy_database_is_migrated_in_place(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    latest = database.migrate(engine)
+    assert latest == database.MIGRATIONS[-1][0]
+    with engine.connect() as conn:
+        assert database.schema_version(conn) == latest
+        assert conn.execute(text("SELECT title FROM chats")).scalar() == "Eski sohbet"
+        assert conn.execute(text("SELECT content FROM messages")).scalar() == "Merhaba"
+    assert {"summary", "summary_upto"} <= _columns(engine, "chats")
+    assert {"library_id"} <= _columns(engine, "documents")
+    assert {"library_id", "worker"} <= _columns(engine, "jobs")
+    assert {"suggestions", "prime_window", "prime_count"} <= _columns(engine, "library_documents")
+    assert "auth_sessions" in inspect(engine).get_table_names()
+
+
+def test_migrate_is_idempotent(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    database.migrate(engine)
+    database.migrate(engine)
+    with engine.connect() as conn:
+        versions = [v for (v,) in conn.execute(text("SELECT version FROM schema_version ORDER BY version"))]
+    assert versions == [v for v, _, _ in database.MIGRATIONS]
+
+
+def test_partially_migrated_database_resumes(tmp_path, monkeypatch):
+    engine = _legacy_engine(tmp_path)
+    monkeypatch.setattr(database, "MIGRATIONS", database.MIGRATIONS[:2])
+    assert database.migrate(engine) == 2
+    monkeypatch.undo()
+    assert database.migrate(engine) == database.MIGRATIONS[-1][0]
+    with engine.connect() as conn:
+        assert database.schema_version(conn) == database.MIGRATIONS[-1][0]
+    assert "worker" in _columns(engine, "jobs")
+
+
+def _indexes(engine):
+    insp = inspect(engine)
+    return {(t, i["name"], tuple(i["column_names"])) for t in insp.get_table_names() for i in insp.get_indexes(t)}
+
+
+def test_migrated_legacy_schema_matches_fresh_schema(tmp_path):
+    legacy = _legacy_engine(tmp_path)
+    database.migrate(legacy)
+    fresh = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    database.migrate(fresh)
+    assert _indexes(legacy) == _indexes(fresh)
+    for table in ("chats", "documents", "jobs", "library_documents", "auth_sessions"):
+        assert _columns(legacy, table) == _columns(fresh, table)
+    #Açık DDL ile yazılan migration'lar modellerle aynı şemayı kurar.
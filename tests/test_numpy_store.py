@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+import numpy_store
+from numpy_store import NumpyVectorStore
+
+
+class _Table(Embeddings):
+    #Metin → önceden üretilmiş vektör ("doc 12" → 12. satır); sorgular için ayrıca kaydedilir.
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.queries = {}
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [self.vectors[int(t.split()[1])].tolist() for t in texts]
+
+    def embed_query(self, text):
+        return self.queries[text].tolist()
+
+
+@pytest.fixture(autouse=True)
+def segment_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(numpy_store, "SEGMENT_ROOT", str(tmp_path / "segments"))
+
+
+def _batches(n, size=256, page_of=lambda i: i // 10):
+    docs = [Document(page_content=f"doc {i}", metadata={"page": page_of(i)}) for i in range(n)]
+    return [docs[i:i + size] for i in range(0, n, size)]
+
+
+def _corpus(n=3000, dim=96, clusters=40, seed=3):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(clusters, size=n)] + 0.6 * rng.normal(size=(n, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.integers(n, size=50)] + 0.3 * rng.normal(size=(50, dim))
+    return vectors.astype(np.float32), queries.astype(np.float32)
+#Kümeli veri: komşular birbirine yakın skorlar alır, nicemleme hatası sıralamayı gerçekten etkileyebilir.
+
+
+def _dtype(key):
+    return numpy_store.open_segment(key).dtype.name
+
+
+@pytest.mark.parametrize("dtype, min_recall", [("int8", 0.95), ("float16", 0.99)])
+def test_quantised_recall_matches_exact_search(tmp_path, monkeypatch, dtype, min_recall):
+    monkeypatch.setattr(numpy_store.SegmentWriter.__init__, "__defaults__", (dtype,))
+    vectors, queries = _corpus()
+    emb = _Table(vectors)
+    store = NumpyVectorStore(str(tmp_path / dtype), emb).add_document(_batches(len(vectors)), 1, f"seg-{dtype}")
+    assert _dtype(f"seg-{dtype}") == dtype
+    k, found = 10, 0
+    for j, q in enumerate(queries):
+        emb.queries[f"q{j}"] = q
+        exact = set(np.argsort(-(vectors @ (q / np.linalg.norm(q))))[:k])
+        hits = {int(d.page_content.split()[1]) for d in store.similarity_search(f"q{j}", k=k)}
+        found += len(exact & hits)
+    assert found / (k * len(queries)) >= min_recall
+
+
+def test_existing_segment_skips_chunking_and_embedding(tmp_path):
+    vectors, _ = _corpus(n=300)
+    emb = _Table(vectors)
+    first = NumpyVectorStore(str(tmp_path / "chat1"), emb).add_document(_batches(300), 1, "shared")
+    calls = emb.calls
+    os.utime(numpy_store.segment_path("shared"), (0, 0))
+
+    def never():
+        raise AssertionError("batches must not be read")
+        yield
+
+    progress = []
+    second = NumpyVectorStore(str(tmp_path / "chat2"), emb).add_document(
+        never(), 7, "shared", on_progress=lambda *a: progress.append(a)
+    )
+    assert emb.calls == calls
+    assert progress == [(1, 300, 29)]
+    assert os.path.getmtime(numpy_store.segment_path("shared")) > 0
+    assert second.get()["ids"][:1] == ["7:0"] and len(second.get()["ids"]) == 300
+    assert first.get()["documents"] == second.get()["documents"]
@@ -0,0 +1,59 @@
+from langchain_core.documents import Document
+
+from retrieval import BM25Index, HybridRetriever, reciprocal_rank_fusion, trim_to_budget
+
+
+def _doc(text, doc_id=1, page=1):
+    return Document(page_content=text, metadata={"document_id": doc_id, "page": page})
+
+
+A, B, C, D = (_doc(t, page=i) for i, t in enumerate(["alfa", "beta", "gama", "delta"]))
+
+
+def test_rrf_rewards_documents_ranked_by_both_lists():
+    fused = reciprocal_rank_fusion([[A, B, C], [C, D, A]])
+    assert fused[:2] == [A, C]
+    assert set(map(id, fused)) == set(map(id, [A, B, C, D]))
+
+
+def test_rrf_merges_equal_documents_from_different_lists():
+    copy = _doc("beta", page=1)
+    fused = reciprocal_rank_fusion([[B], [copy, A]])
+    assert len(fused) == 2 and fused[0] is B
+
+
+def test_bm25_finds_exact_terms():
+    docs = [_doc("BIL304 dersi salı günü yapılır", page=1),
+            _doc("Madde 12 sınav kurallarını düzenler", page=2),
+            _doc("kayıt takvimi ve harç ödemeleri", page=3)]
+    index = BM25Index(docs)
+    assert index.search("BIL304 ne zaman", k=2)[0] is docs[0]
+    assert index.search("MADDE 12", k=1) == [docs[1]]
+    assert index.search("bulunmayan terim", k=3) == []
+
+
+def test_trim_to_budget_keeps_at_least_one_chunk():
+    long = _doc("kelime " * 50)
+    assert trim_to_budget([long, A], budget=5) == [long]
+    assert trim_to_budget([A, B, C], budget=2) == [A, B]
+
+
+class _Store:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def similarity_search(self, query, k):
+        return self.docs[::-1][:k]
+
+    def cache_key(self):
+        return ("test-store", id(self))
+
+    def get(self, include=None):
+        return {"documents": [d.page_content for d in self.docs], "metadatas": [d.metadata for d in self.docs]}
+
+
+def test_hybrid_retriever_fuses_vector_and_keyword_hits():
+    docs = [_doc("yemekhane menüsü", page=1), _doc("BIL304 sınav tarihi", page=2), _doc("kütüphane saatleri", page=3)]
+    retr = HybridRetriever(vectorstore=_Store(docs), vector_k=1, keyword_k=1, token_budget=100)
+    hits = retr.invoke("BIL304")
+    assert [d.metadata["page"] for d in hits] == [3, 2]
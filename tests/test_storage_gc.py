@@ -0,0 +1,103 @@
+import json, os, time
+
+import pytest
+
+import ingest, library, numpy_store, storage_gc
+from conftest import make_chat
+from database import session_scope, Chat, Document
+
+
+@pytest.fixture
+def roots(tmp_path, monkeypatch):
+    paths = {name: tmp_path / name for name in ("uploads", "chroma_db", "library_index", "segments")}
+    for p in paths.values():
+        p.mkdir()
+    monkeypatch.setattr(ingest, "UPLOAD_DIR", str(paths["uploads"]))
+    monkeypatch.setattr(ingest, "VECTOR_ROOT", str(paths["chroma_db"]))
+    monkeypatch.setattr(library, "LIBRARY_ROOT", str(paths["library_index"]))
+    monkeypatch.setattr(numpy_store, "SEGMENT_ROOT", str(paths["segments"]))
+    return paths
+
+
+def _dir(root, name):
+    path = root / name
+    path.mkdir()
+    (path / "chroma.sqlite3").write_bytes(b"x" * 100)
+    return str(path)
+
+
+def _file(root, name):
+    path = root / name
+    path.write_bytes(b"x" * 10)
+    return str(path)
+
+
+LATER = lambda: time.time() + storage_gc.GC_GRACE + 60
+#Grace süresi geçmiş gibi: yeni dosyalar da "eski" sayılır.
+
+
+def test_release_file_waits_for_last_reference(roots):
+    path = _file(roots["uploads"], "abc.txt")
+    cid = make_chat()
+    with session_scope() as db:
+        db.add(Document(chat_id=cid, file_name="abc.txt", file_path=path))
+    assert storage_gc.file_refs(path) == 1
+    assert storage_gc.release_file(path) == 0 and os.path.exists(path)
+    with session_scope() as db:
+        db.query(Document).filter(Document.file_path == path).delete()
+    assert storage_gc.release_file(path) == 10 and not os.path.exists(path)
+
+
+def test_release_vector_dir_waits_for_last_reference(roots):
+    directory = _dir(roots["chroma_db"], "chat_shared")
+    cid = make_chat(directory)
+    assert storage_gc.release_vector_dir(cid, directory) == 0 and os.path.isdir(directory)
+    with session_scope() as db:
+        db.query(Document).filter(Document.chat_id == cid).delete()
+        db.query(Chat).filter(Chat.id == cid).delete()
+    assert storage_gc.release_vector_dir(cid, directory) > 0 and not os.path.exists(directory)
+
+
+def test_collect_keeps_legacy_dirs_of_existing_chats(roots):
+    cid = make_chat()
+    gone = make_chat()
+    with session_scope() as db:
+        db.query(Chat).filter(Chat.id == gone).delete()
+    legacy = _dir(roots["chroma_db"], f"chat_{cid}_0a1b2c3d")
+    current = _dir(roots["chroma_db"], f"chat_{cid}")
+    orphan_legacy = _dir(roots["chroma_db"], f"chat_{gone}_deadbeef")
+    orphan = _dir(roots["chroma_db"], f"chat_{gone}")
+    unknown = _dir(roots["chroma_db"], "elle_kopyalanan")
+
+    report = storage_gc.collect(now=LATER())
+    assert os.path.isdir(legacy) and os.path.isdir(current) and os.path.isdir(unknown)
+    assert not os.path.exists(orphan_legacy) and not os.path.exists(orphan)
+    assert report["dirs"] == 2
+
+
+def test_collect_respects_grace_and_references(roots):
+    cid, gone = make_chat(), make_chat()
+    kept = _file(roots["uploads"], "kept.txt")
+    with session_scope() as db:
+        db.add(Document(chat_id=cid, file_name="kept.txt", file_path=kept))
+        db.query(Chat).filter(Chat.id == gone).delete()
+    young = _dir(roots["chroma_db"], f"chat_{gone}")
+    stray = _file(roots["uploads"], "stray.txt")
+
+    storage_gc.collect()
+    assert os.path.isdir(young) and os.path.exists(stray)
+    #Grace süresi dolmadan hiçbir şey silinmez (kaydı henüz yazılmamış yüklemeler).
+    storage_gc.collect(now=LATER())
+    assert not os.path.exists(young) and not os.path.exists(stray) and os.path.exists(kept)
+
+
+def test_collect_drops_segments_no_manifest_uses(roots):
+    used, unused = (_dir(roots["segments"], k) for k in ("seg-used", "seg-unused"))
+    directory = str(roots["chroma_db"] / "chat_np")
+    os.makedirs(directory)
+    with open(os.path.join(directory, numpy_store.MANIFEST), "w") as f:
+        json.dump({"segments": [{"document_id": 1, "segment": "seg-used"}]}, f)
+    make_chat(directory)
+
+    storage_gc.collect(now=LATER())
+    assert os.path.isdir(used) and not os.path.exists(unused)
@@ -0,0 +1,43 @@
+import streamlit as st
+
+import rag_service
+from conftest import make_chat
+from providers import FakeProvider
+
+
+def test_iter_answer_streams_tokens_before_done(chat_with_document):
+    events = list(rag_service.iter_answer(chat_with_document, "Ders seçimi ne zaman?"))
+    tokens = [e["text"] for e in events if e["type"] == "token"]
+    assert len(tokens) > 1
+    assert "".join(tokens) == FakeProvider.ANSWER
+    assert events[-1]["type"] == "done" and all(e["type"] != "done" for e in events[:-1])
+    done = events[-1]
+    assert done["answer"] == FakeProvider.ANSWER and done["cached"] is False and done["message_id"]
+
+
+def test_repeated_question_streams_cached_answer(chat_with_document):
+    list(rag_service.iter_answer(chat_with_document, "Ders seçimi ne zaman?"))
+    events = list(rag_service.iter_answer(chat_with_document, "Ders seçimi ne zaman?"))
+    assert [e["type"] for e in events] == ["token", "done"]
+    assert events[-1]["cached"] is True and events[0]["text"] == FakeProvider.ANSWER
+
+
+def test_chat_without_document_streams_notice():
+    events = list(rag_service.iter_answer(make_chat(), "Merhaba?"))
+    assert events[0] == {"type": "token", "text": rag_service.NO_DOCUMENT}
+    assert events[-1]["answer"] == rag_service.NO_DOCUMENT
+
+
+def test_write_stream_renders_token_events(chat_with_document):
+    result = {}
+
+    def tokens():
+        for event in rag_service.iter_answer(chat_with_document, "Kayıt kuralı nedir?"):
+            if event["type"] == "token":
+                yield event["text"]
+            else:
+                result[event["type"]] = event
+    #chat.py ile aynı köprü: token olayları ekrana, diğerleri sonuca.
+
+    assert st.write_stream(tokens()) == FakeProvider.ANSWER
+    assert result["done"]["answer"] == FakeProvider.ANSWER
@@ -0,0 +1,91 @@
+import os, sqlite3, subprocess, sys, textwrap
+
+import pytest
+
+import telemetry, write_buffer
+from conftest import make_chat
+from database import session_scope, Feedback, Message
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    #Arka plan yazıcısı MAX_BATCH öğe birikene kadar (en fazla 5 sn) bekler: grup sınırları zamanlamadan bağımsızdır.
+    monkeypatch.setattr(write_buffer, "FLUSH_INTERVAL", 5)
+    sizes, counters = [], []
+    write = write_buffer._write
+    monkeypatch.setattr(write_buffer, "_write", lambda batch: sizes.append(len(batch)) or write(batch))
+    monkeypatch.setattr(telemetry, "inc", lambda name, value=1, **labels: counters.append((name, labels)))
+    return sizes, counters
+
+
+def _contents(cid):
+    with session_scope() as db:
+        return [(m.role, m.content) for m in db.query(Message).filter(Message.chat_id == cid).order_by(Message.id)]
+
+
+def test_writes_are_grouped_into_batches(batches, monkeypatch):
+    sizes, _ = batches
+    monkeypatch.setattr(write_buffer, "MAX_BATCH", 3)
+    cid = make_chat()
+    futs = [write_buffer.add_messages(cid, [("user", f"soru {i}"), ("assistant", f"cevap {i}")]) for i in range(6)]
+    ids = [f.result(timeout=5) for f in futs]
+    assert sizes == [3, 3]
+    #Altı oturumun yazmaları iki transaction'da.
+    assert all(len(pair) == 2 and pair[0] < pair[1] for pair in ids)
+    assert [pair[0] for pair in ids] == sorted(pair[0] for pair in ids)
+    assert _contents(cid)[-2:] == [("user", "soru 5"), ("assistant", "cevap 5")]
+
+
+def test_feedback_votes_in_one_batch_keep_the_last(batches, monkeypatch):
+    monkeypatch.setattr(write_buffer, "MAX_BATCH", 2)
+    with session_scope() as db:
+        msg = Message(chat_id=make_chat(), role="assistant", content="cevap")
+        db.add(msg)
+        db.flush()
+        mid = msg.id
+    votes = [write_buffer.add_feedback(mid, ok, comment) for ok, comment in ((True, "iyi"), (False, None))]
+    assert [v.result(timeout=5) for v in votes] == [None, None]
+    with session_scope() as db:
+        fb = db.query(Feedback).filter(Feedback.message_id == mid).one()
+        assert (fb.is_helpful, fb.comment) == (False, "iyi")
+    #Son oy yazılır; yorumsuz oy önceki yorumu silmez.
+
+
+def test_one_bad_write_does_not_fail_the_batch(batches, monkeypatch):
+    sizes, counters = batches
+    monkeypatch.setattr(write_buffer, "MAX_BATCH", 3)
+    cid = make_chat()
+    good = write_buffer.add_messages(cid, [("user", "geçerli")])
+    bad = write_buffer.add_messages(cid, [("user", object())])
+    later = write_buffer.add_messages(cid, [("assistant", "yine geçerli")])
+    assert len(good.result(timeout=5)) == 1 and len(later.result(timeout=5)) == 1
+    with pytest.raises(Exception):
+        bad.result(timeout=5)
+    assert sizes == [3, 1, 1, 1]
+    #Grup geri alınır, öğeler tek tek yeniden yazılır; sadece bozuk olan hata alır.
+    assert _contents(cid) == [("user", "geçerli"), ("assistant", "yine geçerli")]
+    assert ("rag_write_batch_retries_total", {}) in counters
+    assert ("rag_write_failures_total", {"kind": "messages"}) in counters
+
+
+def test_pending_writes_are_drained_at_exit(tmp_path):
+    db_path = tmp_path / "drain.db"
+    script = textwrap.dedent("""
+        import write_buffer
+        from database import init_db, session_scope, User, Chat
+        init_db()
+        with session_scope() as db:
+            chat = Chat(user=User(username="u", password_hash="x"), title="t")
+            db.add(chat)
+        for i in range(5):
+            write_buffer.add_messages(chat.id, [("user", f"soru {i}")])
+        write_buffer.add_feedback(1, True)
+    """)
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", WRITE_FLUSH_MS="60000", WRITE_MAX_BATCH="100")
+    #Arka plan yazıcısı 60 sn bekleyecekken süreç çıkar: yazmaları sadece atexit'teki flush() kaydedebilir.
+    subprocess.run([sys.executable, "-c", script], cwd=REPO, env=env, check=True, timeout=60)
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT count(*) FROM messages").fetchone() == (5,)
+        assert conn.execute("SELECT message_id, is_helpful FROM feedback").fetchall() == [(1, 1)]
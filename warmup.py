@@ -0,0 +1,77 @@
+import threading, traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from providers import get_embeddings, get_documents_chain
+from retrieval import RETRIEVAL_MODE, get_bm25
+import answer_cache, library, rag_service, telemetry
+#Sohbet açıldığında (veya belgesi hazır olduğunda) ilk sorunun ödeyeceği kurulum maliyeti önceden, arka planda ödenir:
+#vektör deposu + BM25 indeksi, embedding ve LLM istemcileri. SUGGESTED_QUESTIONS_ENABLED=1 ise belgenin (ingest işinde
+#üretilmiş) önerilen sorularının cevapları, belge başına bütçeyle, cevap önbelleğine yazılır.
+
+
+MAX_WARMED = 256
+
+_lock = threading.Lock()
+_inflight = set()
+_warmed = OrderedDict()
+_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warmup")
+#Tek arka plan thread'i: ısıtma cevap üretimiyle LLM kotası için yarışmaz; aynı sohbet aynı anda bir kez ısıtılır.
+
+
+# --Warm-up--
+def warm_chat(cid):
+    gen = rag_service._generation(cid)
+    with _lock:
+        if gen is None or _warmed.get(cid) == gen:
+            return False
+    #Sohbetin belge kümesi son ısıtmadan beri değişmediyse hiçbir şey yapılmaz (tekrar açmak ücretsiz).
+
+    with telemetry.span("warmup"):
+        retr = rag_service.get_retriever(cid)
+        if retr is None:
+            return False
+        #Vektör depoları (kütüphane indeksleri) açılır ve süreç genelindeki retriever önbelleğine girer.
+        if RETRIEVAL_MODE != "vector":
+            get_bm25(retr.vectorstore)
+        #Hibrit aramada anahtar kelime indeksi ilk soruda değil şimdi kurulur.
+        get_embeddings().embed_query("warm-up")
+        get_documents_chain()
+        #Embedding istemcisi ve bağlantısı kurulur; LLM istemcisi ve cevap zinciri oluşturulur (ücretli LLM çağrısı yok).
+
+        if library.SUGGESTIONS_ENABLED:
+            doc_key = answer_cache.doc_key_for_chat(cid)
+            primed = 0
+            for library_id, questions in library.chat_suggestions(cid):
+                budget = lambda: library.take_prime_budget(library_id)
+                primed += sum(rag_service.prime_answer(cid, retr, q, doc_key, budget) for q in questions)
+            telemetry.inc("rag_warmup_primed_total", primed)
+        #Sorular açılışta üretilmez (ingest işinde bir kez). Cevaplar belge kümesinin hash'ine (doc_key) bağlıdır: belge
+        #eklenip silinince eski cevaplar kullanılmaz. Bütçe bittiğinde kalan sorular ilk sorulduklarında cevaplanır.
+
+    with _lock:
+        _warmed[cid] = gen
+        _warmed.move_to_end(cid)
+        if len(_warmed) > MAX_WARMED:
+            _warmed.popitem(last=False)
+    return True
+
+
+def schedule(cid):
+    if not cid:
+        return
+    with _lock:
+        if cid in _inflight:
+            return
+        _inflight.add(cid)
+
+    def run():
+        try:
+            warm_chat(cid)
+        except Exception:
+            traceback.print_exc()
+            #Isıtma başarısız olursa ilk soru her şeyi normal yoldan kurar; sohbet etkilenmez.
+        finally:
+            with _lock:
+                _inflight.discard(cid)
+    _pool.submit(run)
@@ -0,0 +1,125 @@
+import os, atexit, threading, traceback
+from concurrent.futures import Future
+
+from database import session_scope, Message, Feedback
+import telemetry
+#Write-behind tampon (group commit): mesaj ve geri bildirim yazmaları tek bir arka plan thread'inde toplanır ve
+#birlikte tek bir transaction ile yazılır. Aynı anda cevap alan N oturum N ayrı commit (fsync) yerine bir commit yapar.
+
+
+FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_MS", 20)) / 1000
+MAX_BATCH      = int(os.getenv("WRITE_MAX_BATCH", 500))
+#FLUSH_INTERVAL: İlk yazma geldikten sonra diğerleri için en fazla beklenen süre. MAX_BATCH: Tek transaction'daki en fazla iş.
+
+_cond = threading.Condition()
+_pending = []
+_thread = None
+
+
+def _start():
+    global _thread
+    if _thread is None:
+        _thread = threading.Thread(target=_loop, daemon=True, name="write-buffer")
+        _thread.start()
+
+
+def _submit(kind, payload) -> Future:
+    fut = Future()
+    with _cond:
+        _start()
+        _pending.append((kind, payload, fut))
+        _cond.notify()
+    return fut
+
+
+def add_messages(cid, rows) -> Future:
+    #rows: [(rol, içerik), ...] → Future: eklenen mesajların id listesi (aynı sırayla).
+    return _submit("messages", (cid, list(rows)))
+
+
+def add_feedback(mid, ok, comment=None) -> Future:
+    #Beklenmesi gerekmez (fire-and-forget); aynı mesaja art arda verilen oylardan sonuncusu yazılır.
+    return _submit("feedback", (mid, ok, comment))
+
+
+# --Writer--
+def _write(batch):
+    with session_scope() as db:
+        added = []
+        for kind, payload, fut in batch:
+            if kind == "messages":
+                cid, rows = payload
+                msgs = [Message(chat_id=cid, role=role, content=content) for role, content in rows]
+                db.add_all(msgs)
+                added.append((fut, msgs))
+        db.flush()
+        #Tek flush: tüm mesajların id'leri tek seferde atanır.
+
+        votes = {}
+        for kind, payload, _ in batch:
+            if kind == "feedback":
+                mid, ok, comment = payload
+                prev = votes.get(mid)
+                votes[mid] = (ok, comment or (prev[1] if prev else None))
+        if votes:
+            existing = {f.message_id: f for f in db.query(Feedback).filter(Feedback.message_id.in_(list(votes)))}
+            #Grup başına tek okuma sorgusu (tıklama başına okuma + yazma yerine).
+            for mid, (ok, comment) in votes.items():
+                fb = existing.get(mid)
+                if fb:
+                    fb.is_helpful = ok
+                    fb.comment = comment or fb.comment
+                else:
+                    db.add(Feedback(message_id=mid, is_helpful=ok, comment=comment))
+        results = [(fut, [m.id for m in msgs]) for fut, msgs in added]
+    return results
+
+
+def _loop():
+    while True:
+        with _cond:
+            while not _pending:
+                _cond.wait()
+            _cond.wait_for(lambda: len(_pending) >= MAX_BATCH, timeout=FLUSH_INTERVAL)
+            batch = _pending[:MAX_BATCH]
+            del _pending[:MAX_BATCH]
+        _flush(batch)
+
+
+def _flush(batch):
+    try:
+        with telemetry.span("db.write_buffer"):
+            results = _write(batch)
+    except Exception as e:
+        if len(batch) > 1:
+            telemetry.inc("rag_write_batch_retries_total")
+            for item in batch:
+                _flush([item])
+            return
+        #Tek bozuk yazma (ör. geçersiz içerik) gruptaki diğer oturumların yazmalarını düşürmez: grup geri alınır ve
+        #öğeler tek tek yeniden yazılır; sadece gerçekten yazılamayanların Future'ı hata alır.
+        kind, _, fut = batch[0]
+        traceback.print_exc()
+        telemetry.inc("rag_write_failures_total", kind=kind)
+        fut.set_exception(e)
+        return
+    telemetry.inc("rag_write_batches_total")
+    telemetry.inc("rag_write_items_total", len(batch))
+    for fut, ids in results:
+        fut.set_result(ids)
+    for kind, _, fut in batch:
+        if kind == "feedback":
+            fut.set_result(None)
+
+
+def flush():
+    #Bekleyen tüm yazmaları çağıran thread'de hemen yazar (kapanışta veri kaybolmasın).
+    while True:
+        with _cond:
+            batch = _pending[:MAX_BATCH]
+            del _pending[:MAX_BATCH]
+        if not batch:
+            return
+        _flush(batch)
+
+atexit.register(flush)